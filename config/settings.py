@@ -33,6 +33,16 @@ if DEBUG:
         if host not in ALLOWED_HOSTS:
             ALLOWED_HOSTS.append(host)
 MAX_FILE_MB = int(os.getenv("MAX_FILE_MB", "20"))
+# Subida por partes (core.uploads): tope por archivo y por parte.
+CHUNKED_UPLOAD_MAX_MB = int(os.getenv("CHUNKED_UPLOAD_MAX_MB", "500"))
+CHUNKED_UPLOAD_CHUNK_MB = int(os.getenv("CHUNKED_UPLOAD_CHUNK_MB", "8"))
+# Sesiones abiertas sin actividad en estas horas se cancelan (cleanup_attachments).
+CHUNKED_UPLOAD_EXPIRE_HOURS = int(os.getenv("CHUNKED_UPLOAD_EXPIRE_HOURS", "24"))
+# Recompresion de fotos adjuntas en segundo plano (core.image_ingest).
+ATTACHMENT_IMAGE_INGEST = str(os.getenv("ATTACHMENT_IMAGE_INGEST", "0")).lower() in ("true", "1", "yes")
+ATTACHMENT_IMAGE_MAX_PX = int(os.getenv("ATTACHMENT_IMAGE_MAX_PX", "2560"))
+ATTACHMENT_IMAGE_QUALITY = int(os.getenv("ATTACHMENT_IMAGE_QUALITY", "82"))
+ATTACHMENT_INGEST_WORKERS = int(os.getenv("ATTACHMENT_INGEST_WORKERS", "2"))
 
 # CSRF comunes; puedes ampliar por env
 CSRF_TRUSTED_ORIGINS = [
@@ -57,12 +67,19 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # /healthz, /readyz y /metrics: antes de SSL redirect, sesiones y auth.
+    "core.health.HealthCheckMiddleware",
+    "core.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Tiempos, consultas y Server-Timing por vista (core.perf).
+    "core.perf.PerfMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # ?_profile=1 / X-Profile: 1 de un superusuario (core.profiling).
+    "core.profiling.ProfilerMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -108,6 +125,56 @@ else:
         }
     }
 
+# --- Respaldos (core.backups / backup_integrasys) ---
+BACKUP_ROOT = Path(os.getenv("BACKUP_ROOT", BASE_DIR / "backups"))
+BACKUP_JOBS = int(os.getenv("BACKUP_JOBS", "0"))  # 0 = segun CPUs
+BACKUP_KEEP_DAILY = int(os.getenv("BACKUP_KEEP_DAILY", "7"))
+BACKUP_KEEP_WEEKLY = int(os.getenv("BACKUP_KEEP_WEEKLY", "4"))
+BACKUP_KEEP_MONTHLY = int(os.getenv("BACKUP_KEEP_MONTHLY", "6"))
+# /readyz marca "degraded" si el ultimo respaldo es mas viejo que esto.
+READYZ_BACKUP_MAX_AGE_HOURS = int(os.getenv("READYZ_BACKUP_MAX_AGE_HOURS", "36"))
+
+# Instrumentacion por request (core.perf).
+PERF_ENABLED = str(os.getenv("PERF_ENABLED", "1")).lower() in ("true", "1", "yes")
+PERF_LOG_SAMPLE_RATE = float(os.getenv("PERF_LOG_SAMPLE_RATE", "0.05"))
+PERF_SLOW_MS = int(os.getenv("PERF_SLOW_MS", "1000"))
+PERF_WINDOW = int(os.getenv("PERF_WINDOW", "500"))
+# "staff" o "all": a quien se manda Server-Timing ("all" solo en servidores de prueba, p. ej. para load_test).
+PERF_SERVER_TIMING = os.getenv("PERF_SERVER_TIMING", "staff")
+
+# /metrics (core.metrics). Sin token solo lo protege Nginx (localhost).
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_CACHE_SECONDS = int(os.getenv("METRICS_CACHE_SECONDS", "60"))
+
+# Presupuesto de consultas y N+1 (core.querybudget). Los tests siempre fallan al excederlo.
+QUERY_BUDGET_MAX_QUERIES = int(os.getenv("QUERY_BUDGET_MAX_QUERIES") or 0) or None
+QUERY_BUDGET_MAX_REPEATS = int(os.getenv("QUERY_BUDGET_MAX_REPEATS", "10"))
+QUERY_BUDGET_RAISE = "test" in sys.argv or str(os.getenv("QUERY_BUDGET_RAISE", "0")).lower() in ("true", "1", "yes")
+QUERY_BUDGETS = {}
+
+# Consultas lentas con EXPLAIN (core.slowqueries); 0 lo desactiva.
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_DIR = Path(os.getenv("SLOW_QUERY_DIR", BASE_DIR / "logs"))
+SLOW_QUERY_KEEP_DAYS = int(os.getenv("SLOW_QUERY_KEEP_DAYS", "14"))
+SLOW_QUERY_EXPLAIN = str(os.getenv("SLOW_QUERY_EXPLAIN", "1")).lower() in ("true", "1", "yes")
+
+# Perfilado bajo demanda (core.profiling).
+PROFILER_ENABLED = str(os.getenv("PROFILER_ENABLED", "1")).lower() in ("true", "1", "yes")
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "2"))
+
+# Cache compartido por los workers de Gunicorn (reportes cerrados, metricas,
+# versiones de media): con LocMemCache cada worker invalidaria solo el suyo.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("CACHE_DIR", str(BASE_DIR / "cache")),
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "20000"))},
+    }
+}
+if "test" in sys.argv:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 # --- Static / Media ---
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
@@ -125,6 +192,10 @@ STORAGES = {
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Con Nginx delante, los adjuntos se entregan con X-Accel-Redirect hacia esta
+# location interna (ver deploy/nginx.integrasys.conf); sin ella, FileResponse.
+MEDIA_ACCEL_REDIRECT = str(os.getenv("MEDIA_ACCEL_REDIRECT", "0")).lower() in ("true", "1", "yes")
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected-media/")
 
 SECURE_HSTS_SECONDS = int(os.getenv("SECURE_HSTS_SECONDS", "31536000"))
 SECURE_HSTS_INCLUDE_SUBDOMAINS = False
@@ -1,11 +1,10 @@
 from django.contrib import admin
-from django.urls import path, include, re_path  # INTEGRASYS, , re_path
+from django.urls import path, include  # INTEGRASYS
 from core import views as core_views  # INTEGRASYS, re_path, include
 from django.views.generic import RedirectView
 from core import views
 from core import views_exports
-from django.conf import settings
-from django.conf.urls.static import static
+from core import views_uploads
 
 urlpatterns = [
     path("recepcion/", core_views.reception_home, name="reception_home"),
@@ -24,6 +23,12 @@ urlpatterns = [
     path("panel/exports/", views_exports.exports_home, name="panel_exports"),
     path("panel/exports/orders/", views_exports.export_orders_csv, name="panel_export_orders"),
     path("panel/exports/payments/", views_exports.export_payments_csv, name="panel_export_payments"),
+    path("panel/exports/attachments/", views_exports.export_attachments_zip, name="panel_export_attachments"),
+    path("panel/reportes/caja/", views_exports.cash_close_report, name="cash_close_report"),
+    path("panel/reportes/ingresos/", views_exports.revenue_report, name="revenue_report"),
+    path("panel/reportes/rendimiento/", views_exports.perf_report, name="perf_report"),
+    path("panel/reportes/perfiles/", views_exports.profiles_list, name="profiles_list"),
+    path("panel/reportes/perfiles/<str:name>", views_exports.profile_download, name="profile_download"),
     path("panel/clientes/", views.customer_list, name="customer_list"),
     path("panel/clientes/<int:pk>/editar/", views.customer_edit, name="customer_edit"),
 
@@ -51,6 +56,7 @@ urlpatterns = [
     # Inventario
     path("inventario/", views.inventory_list, name="inventory_list"),
     path("inventario/entrada/", views.receive_stock, name="receive_stock"),
+    path("inventario/importar/", views.inventory_import, name="inventory_import"),
     path("inventario/nuevo/", views.inventory_create, name="inventory_create"),
     path("inventario/<int:pk>/editar/", views.inventory_update, name="inventory_update"),
     path("inventario/<int:pk>/eliminar/", views.inventory_delete, name="inventory_delete"),
@@ -64,18 +70,13 @@ urlpatterns = [
     path("cotizacion/<uuid:token>/aprobar/", views.estimate_approve, name="estimate_approve"),
     path("cotizacion/<uuid:token>/rechazar/", views.estimate_decline, name="estimate_decline"),
     path("recepcion/orden/<int:pk>/adjuntos/", views.order_attachments, name="order_attachments"),  # INTEGRASYS
+    path("recepcion/orden/<int:pk>/adjuntos/zip/", views.order_attachments_zip, name="order_attachments_zip"),
+    path("recepcion/orden/<int:pk>/adjuntos/<int:att_id>/archivo/", views.attachment_file, name="attachment_file"),
+    path("recepcion/orden/<int:pk>/adjuntos/<int:att_id>/miniatura/", views.attachment_thumbnail, name="attachment_thumbnail"),
+    path("recepcion/orden/<int:pk>/adjuntos/subidas/", views_uploads.attachment_upload_start, name="attachment_upload_start"),
+    path("recepcion/orden/<int:pk>/adjuntos/subidas/<uuid:upload_id>/", views_uploads.attachment_upload_chunk, name="attachment_upload_chunk"),
+    path("recepcion/orden/<int:pk>/adjuntos/subidas/<uuid:upload_id>/finalizar/", views_uploads.attachment_upload_finish, name="attachment_upload_finish"),
     path("notificaciones/", views.notifications_list, name="notifications_list"),
     path("notificaciones/marcar-todas/", views.notifications_mark_all_read, name="notifications_mark_all_read"),
 ]
 
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-
-from django.views.static import serve  # INTEGRASYS
-
-# INTEGRASYS: fallback para /media/ (dev) aunque DEBUG sea False
-urlpatterns += [re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT})]
-
-# Fallback para /media/ en dev aunque DEBUG sea False
-urlpatterns += [re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT})]
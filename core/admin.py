@@ -7,7 +7,7 @@ from django.http import HttpResponse
 
 from .models import (
     Customer, Device, ServiceOrder, StatusHistory,
-    InventoryItem, InventoryMovement, Notification
+    InventoryItem, InventoryMovement, Notification, StockReservation
 )
 from .utils import build_device_label, log_status_snapshot, send_order_status_email, format_csv_datetime
 
@@ -151,3 +151,11 @@ class AttachmentAdmin(admin.ModelAdmin):
     list_display = ("id", "service_order", "file", "caption", "uploaded_at")
     search_fields = ("caption", "file")
     list_filter = ("uploaded_at",)
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ("id", "item", "order", "qty", "status", "created_at")
+    list_filter = ("status",)
+    search_fields = ("item__sku", "order__folio")
+    raw_id_fields = ("item", "order", "estimate_item")
@@ -0,0 +1,102 @@
+"""ZIP de adjuntos generado al vuelo.
+
+``zipfile`` escribe sobre un buffer que no admite ``seek``: cada entrada
+lleva descriptor de datos y lo escrito se entrega al cliente en cuanto sale
+del compresor, asi que la memoria no depende del tamano de los archivos ni
+se usa un temporal. Al final va ``manifest.csv`` con folio, nombre,
+comentario, tamano y SHA-256 de cada archivo.
+"""
+import csv
+import hashlib
+import io
+import logging
+import zipfile
+from pathlib import PurePosixPath
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK_SIZE = 256 * 1024
+# Formatos ya comprimidos: se guardan tal cual para no gastar CPU.
+STORED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".docx", ".xlsx", ".zip"}
+MANIFEST_HEADER = ["Folio", "Archivo", "Comentario", "Bytes", "SHA256", "Subido", "Estado"]
+
+
+class _StreamSink(io.RawIOBase):
+    """Buffer de solo escritura que se vacia tras cada bloque."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _unique_name(name, used):
+    candidate = name
+    stem, suffix = PurePosixPath(name).stem, PurePosixPath(name).suffix
+    counter = 2
+    while candidate.lower() in used:
+        candidate = str(PurePosixPath(name).with_name(f"{stem} ({counter}){suffix}"))
+        counter += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def _zip_info(arcname, uploaded_at, suffix):
+    moment = timezone.localtime(uploaded_at) if uploaded_at else timezone.localtime()
+    info = zipfile.ZipInfo(arcname, date_time=moment.timetuple()[:6])
+    info.compress_type = zipfile.ZIP_STORED if suffix in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def iter_attachments_zip(attachments, *, folder_per_order=False):
+    """Genera los bytes del ZIP para ``attachments`` (iterable de ``Attachment``).
+
+    Con ``folder_per_order`` cada orden va en una carpeta con su folio. Los
+    archivos que faltan en disco se omiten y se anotan en el manifiesto.
+    """
+    sink = _StreamSink()
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(MANIFEST_HEADER)
+    used = set()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for attachment in attachments:
+            order = attachment.service_order
+            display = attachment.display_name or f"adjunto-{attachment.pk}"
+            base = f"{order.folio or order.pk}/{display}" if folder_per_order else display
+            arcname = _unique_name(base, used)
+            suffix = PurePosixPath(display).suffix.lower()
+            uploaded = timezone.localtime(attachment.uploaded_at).strftime("%Y-%m-%d %H:%M") if attachment.uploaded_at else ""
+            hasher = hashlib.sha256()
+            size = 0
+            try:
+                handle = attachment.file.storage.open(attachment.file.name, "rb")
+            except (OSError, ValueError):
+                logger.warning("Adjunto %s sin archivo en disco", attachment.pk)
+                writer.writerow([order.folio, arcname, attachment.caption, "", "", uploaded, "Falta archivo"])
+                continue
+            with handle, archive.open(_zip_info(arcname, attachment.uploaded_at, suffix), "w", force_zip64=True) as dest:
+                for block in iter(lambda: handle.read(READ_BLOCK_SIZE), b""):
+                    hasher.update(block)
+                    dest.write(block)
+                    size += len(block)
+                    data = sink.pop()
+                    if data:
+                        yield data
+            yield sink.pop()
+            writer.writerow([order.folio, arcname, attachment.caption, size, hasher.hexdigest(), uploaded, "OK"])
+        archive.writestr(_zip_info("manifest.csv", None, ".csv"), "\ufeff" + manifest.getvalue())
+    yield sink.pop()
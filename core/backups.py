@@ -0,0 +1,449 @@
+"""Respaldos incrementales de base de datos y media.
+
+Estructura de ``BACKUP_ROOT``::
+
+    objects/aa/bb/<sha256>[.gz]   archivos de media, uno por contenido
+    snapshots/<AAAAmmdd_HHMMSS>/  un respaldo: base de datos + manifest.json
+
+La base se respalda con ``pg_dump`` en formato directorio con ``--jobs``
+(PostgreSQL) o con la API de respaldo en linea de SQLite. De media solo se
+copian los contenidos que no estan ya en ``objects/``: el manifiesto guarda
+ruta, tamano, mtime y SHA-256, y en la siguiente corrida se reutiliza el hash
+de los archivos que no cambiaron. Copia y compresion corren en un pool de
+hilos. El manifiesto tambien guarda filas y SHA-256 por tabla para verificar
+restauraciones (``core.restore``). ``prune_snapshots`` aplica la retencion
+diaria/semanal/mensual y borra los objetos que ya no usa ningun respaldo;
+respaldar y podar toman el mismo lock sobre ``BACKUP_ROOT``.
+"""
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.storage import digest_from_name
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos.
+    fcntl = None
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+SNAPSHOT_FORMAT = "%Y%m%d_%H%M%S"
+COPY_BLOCK_SIZE = 1024 * 1024
+# Derivados o temporales que no vale la pena respaldar.
+MEDIA_EXCLUDES = ("uploads/", "blobs/tmp/", ".thumbs/", "profiles/")
+# Ya comprimidos: se guardan sin gzip.
+# Temporales de ``objects/`` mas nuevos que esto pueden ser de una copia en curso.
+TMP_GRACE_SECONDS = 6 * 60 * 60
+COMPRESSED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".zip", ".gz", ".docx", ".xlsx", ".pdf"}
+
+
+class BackupError(Exception):
+    """Fallo al generar, podar o leer respaldos."""
+
+
+def backup_root():
+    return Path(getattr(settings, "BACKUP_ROOT", Path(settings.BASE_DIR) / "backups"))
+
+
+@contextlib.contextmanager
+def backup_lock(root):
+    """Lock exclusivo (entre procesos) sobre ``root``: respaldar y podar no se cruzan."""
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / ".lock", "a") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def backup_jobs():
+    return int(getattr(settings, "BACKUP_JOBS", 0) or 0) or min(8, os.cpu_count() or 2)
+
+
+def default_retention():
+    return {
+        "daily": int(getattr(settings, "BACKUP_KEEP_DAILY", 7)),
+        "weekly": int(getattr(settings, "BACKUP_KEEP_WEEKLY", 4)),
+        "monthly": int(getattr(settings, "BACKUP_KEEP_MONTHLY", 6)),
+    }
+
+
+def object_path(root, digest, compressed):
+    return Path(root) / "objects" / digest[:2] / digest[2:4] / (digest + (".gz" if compressed else ""))
+
+
+def find_object(root, digest):
+    for compressed in (True, False):
+        path = object_path(root, digest, compressed)
+        if path.exists():
+            return path
+    return None
+
+
+def _hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(COPY_BLOCK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _tmp_sibling(path):
+    return path.with_name(f"{path.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+
+
+def _copy_into(source, target, compress):
+    """Copia ``source`` a ``target`` (con gzip si ``compress``) via temporal + rename."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_sibling(target)
+    try:
+        with open(source, "rb") as src:
+            opener = gzip.open(tmp, "wb", compresslevel=6) if compress else open(tmp, "wb")
+            with opener as dst:
+                shutil.copyfileobj(src, dst, COPY_BLOCK_SIZE)
+        os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return target.stat().st_size
+
+
+def store_object(root, source, digest=None):
+    """Guarda ``source`` en ``objects/`` si falta; regresa ``(digest, bytes_nuevos)``."""
+    digest = digest or _hash_file(source)
+    if find_object(root, digest):
+        return digest, 0
+    compress = Path(source).suffix.lower() not in COMPRESSED_EXTENSIONS
+    return digest, _copy_into(source, object_path(root, digest, compress), compress)
+
+
+# --- Base de datos ---------------------------------------------------------
+
+
+def pg_connection_args(settings_dict):
+    args = []
+    if settings_dict.get("HOST"):
+        args += ["--host", str(settings_dict["HOST"])]
+    if settings_dict.get("PORT"):
+        args += ["--port", str(settings_dict["PORT"])]
+    if settings_dict.get("USER"):
+        args += ["--username", str(settings_dict["USER"])]
+    return args
+
+
+def pg_env(settings_dict):
+    env = os.environ.copy()
+    if settings_dict.get("PASSWORD"):
+        env["PGPASSWORD"] = str(settings_dict["PASSWORD"])
+    return env
+
+
+def pg_dump_command(settings_dict, output, jobs, snapshot=None):
+    # --jobs solo funciona con formato directorio; pg_restore lo acepta igual que -Fc.
+    return [
+        getattr(settings, "BACKUP_PG_DUMP", "pg_dump"),
+        "--format=directory",
+        f"--jobs={max(1, jobs)}",
+        "--compress=6",
+        *([f"--snapshot={snapshot}"] if snapshot else []),
+        "--file",
+        str(output),
+        *pg_connection_args(settings_dict),
+        str(settings_dict["NAME"]),
+    ]
+
+
+def open_database(connection, name):
+    """Conexion independiente a otra base (``name``) con la config de ``connection``."""
+    settings_dict = {**connection.settings_dict, "NAME": str(name)}
+    return connection.__class__(settings_dict, alias=f"{connection.alias}_backup")
+
+
+def _row_bytes(row):
+    values = []
+    for value in row:
+        if value is None:
+            values.append("\\N")
+        elif isinstance(value, (bytes, memoryview)):
+            values.append(bytes(value).hex())
+        else:
+            values.append(str(value))
+    return ("\x1f".join(values) + "\x1e").encode("utf-8")
+
+
+def table_checksums(connection):
+    """Filas y SHA-256 por tabla, recorriendo cada tabla por su llave primaria."""
+    result = {}
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for table in sorted(connection.introspection.table_names(cursor)):
+            if table.startswith("sqlite_"):
+                continue
+            primary_key = connection.introspection.get_primary_key_columns(cursor, table)
+            if primary_key:
+                order = ", ".join(quote(column) for column in primary_key)
+            else:
+                cursor.execute(f"SELECT * FROM {quote(table)} LIMIT 0")
+                order = ", ".join(str(index) for index in range(1, len(cursor.description) + 1))
+            cursor.execute(f"SELECT * FROM {quote(table)} ORDER BY {order}")
+            hasher = hashlib.sha256()
+            rows = 0
+            while True:
+                batch = cursor.fetchmany(2000)
+                if not batch:
+                    break
+                for row in batch:
+                    hasher.update(_row_bytes(row))
+                rows += len(batch)
+            result[table] = {"rows": rows, "sha256": hasher.hexdigest()}
+    return result
+
+
+def run_command(command, env):
+    try:
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise BackupError(f"No se encontro {command[0]}; instala el cliente de PostgreSQL.")
+    if result.returncode != 0:
+        raise BackupError(f"{command[0]} fallo ({result.returncode}): {result.stderr.strip()}")
+
+
+def _sqlite_backup(settings_dict, target):
+    # Conexion propia: no comparte la transaccion de quien llama.
+    name = str(settings_dict["NAME"])
+    source = sqlite3.connect(name, uri=name.startswith("file:"))
+    destination = sqlite3.connect(target)
+    try:
+        # Copia por paginas: no bloquea la base durante todo el respaldo.
+        source.backup(destination, pages=1024)
+    finally:
+        destination.close()
+        source.close()
+
+
+def dump_database(dest_dir, *, jobs, using="default"):
+    """Respaldo consistente de la base en ``dest_dir``; regresa su descripcion."""
+    connection = connections[using]
+    vendor = connection.vendor
+    if vendor == "postgresql":
+        output = Path(dest_dir) / "database.pgdump"
+        # pg_dump y las sumas por tabla leen la misma instantanea exportada.
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                cursor.execute("SELECT pg_export_snapshot()")
+                snapshot = cursor.fetchone()[0]
+            command = pg_dump_command(connection.settings_dict, output, jobs, snapshot=snapshot)
+            run_command(command, pg_env(connection.settings_dict))
+            tables = table_checksums(connection)
+        return {"vendor": vendor, "format": "pg_directory", "path": output.name, "tables": tables}
+    if vendor == "sqlite":
+        raw = Path(dest_dir) / "database.sqlite3"
+        _sqlite_backup(connection.settings_dict, raw)
+        return {"vendor": vendor, "format": "sqlite", "path": raw.name}
+    raise BackupError(f"Motor de base de datos no soportado para respaldo: {vendor}.")
+
+
+def _finish_database(dest_dir, info, using="default"):
+    """Sumas por tabla y gzip de la copia SQLite (PostgreSQL ya sale comprimido)."""
+    if info["format"] != "sqlite":
+        return info
+    raw = Path(dest_dir) / info["path"]
+    copy = open_database(connections[using], raw)
+    try:
+        info = {**info, "tables": table_checksums(copy)}
+    finally:
+        copy.close()
+    digest = _hash_file(raw)
+    target = raw.with_name(raw.name + ".gz")
+    _copy_into(raw, target, True)
+    raw.unlink()
+    return {**info, "path": target.name, "sha256": digest, "bytes": target.stat().st_size}
+
+
+# --- Media -------------------------------------------------------------------
+
+
+def _excluded(relative):
+    return any(relative.startswith(prefix) or f"/{prefix}" in relative for prefix in MEDIA_EXCLUDES)
+
+
+def iter_media_files(media_root):
+    media_root = Path(media_root)
+    if not media_root.exists():
+        return
+    for dirpath, dirnames, filenames in os.walk(media_root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = Path(dirpath) / filename
+            relative = path.relative_to(media_root).as_posix()
+            if not _excluded(relative):
+                yield relative, path
+
+
+def _known_digest(relative, stat, previous):
+    digest = digest_from_name(relative)
+    if digest:
+        return digest
+    entry = previous.get(relative)
+    if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+        return entry["sha256"]
+    return None
+
+
+# --- Snapshots ---------------------------------------------------------------
+
+
+def snapshots_dir(root):
+    return Path(root) / "snapshots"
+
+
+def list_snapshots(root=None):
+    """Nombres de respaldos completos, del mas viejo al mas nuevo."""
+    base = snapshots_dir(root or backup_root())
+    if not base.exists():
+        return []
+    return sorted(p.name for p in base.iterdir() if p.is_dir() and not p.name.startswith(".") and (p / MANIFEST_NAME).exists())
+
+
+def load_manifest(name, root=None):
+    path = snapshots_dir(root or backup_root()) / name / MANIFEST_NAME
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError) as exc:
+        raise BackupError(f"Manifiesto ilegible en {path}: {exc}")
+
+
+def run_backup(*, root=None, media=True, jobs=None, using="default", now=None):
+    """Genera un respaldo nuevo y regresa su manifiesto."""
+    root = Path(root or backup_root())
+    with backup_lock(root):
+        jobs = jobs or backup_jobs()
+        now = now or timezone.localtime()
+        name = now.strftime(SNAPSHOT_FORMAT)
+        final_dir = snapshots_dir(root) / name
+        if final_dir.exists():
+            raise BackupError(f"Ya existe el respaldo {name}.")
+        work_dir = snapshots_dir(root) / f".tmp-{name}"
+        shutil.rmtree(work_dir, ignore_errors=True)
+        work_dir.mkdir(parents=True)
+
+        previous = {}
+        existing = list_snapshots(root)
+        if existing:
+            previous = {entry["path"]: entry for entry in load_manifest(existing[-1], root).get("files", [])}
+
+        try:
+            database = dump_database(work_dir, jobs=jobs, using=using)
+            files = []
+            new_objects = new_bytes = 0
+            with ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="backup") as pool:
+                db_future = pool.submit(_finish_database, work_dir, database, using)
+                pending = []
+                if media:
+                    for relative, path in iter_media_files(settings.MEDIA_ROOT):
+                        stat = path.stat()
+                        digest = _known_digest(relative, stat, previous)
+                        entry = {"path": relative, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                        pending.append((entry, pool.submit(store_object, root, path, digest)))
+                for entry, future in pending:
+                    digest, written = future.result()
+                    entry["sha256"] = digest
+                    files.append(entry)
+                    if written:
+                        new_objects += 1
+                        new_bytes += written
+                database = db_future.result()
+
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "name": name,
+                "created_at": now.isoformat(),
+                "database": database,
+                "media": media,
+                "files": files,
+                "stats": {
+                    "files": len(files),
+                    "media_bytes": sum(entry["size"] for entry in files),
+                    "new_objects": new_objects,
+                    "new_bytes": new_bytes,
+                },
+            }
+            with open(work_dir / MANIFEST_NAME, "w", encoding="utf-8") as handle:
+                json.dump(manifest, handle, ensure_ascii=False, indent=1)
+            os.replace(work_dir, final_dir)
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+        return manifest
+
+
+def select_retained(names, *, daily, weekly, monthly):
+    """Respaldos a conservar: el mas nuevo de cada dia, semana ISO y mes."""
+    stamps = sorted(((datetime.strptime(n, SNAPSHOT_FORMAT), n) for n in names), reverse=True)
+    keep = {stamps[0][1]} if stamps else set()
+    buckets = (
+        (daily, lambda d: d.date()),
+        (weekly, lambda d: d.isocalendar()[:2]),
+        (monthly, lambda d: (d.year, d.month)),
+    )
+    for limit, key in buckets:
+        seen = []
+        for stamp, name in stamps:
+            bucket = key(stamp)
+            if bucket in seen:
+                continue
+            if len(seen) >= limit:
+                break
+            seen.append(bucket)
+            keep.add(name)
+    return keep
+
+
+def prune_snapshots(*, root=None, daily, weekly, monthly):
+    """Borra respaldos fuera de la retencion y objetos sin referencias."""
+    root = Path(root or backup_root())
+    with backup_lock(root):
+        names = list_snapshots(root)
+        keep = select_retained(names, daily=daily, weekly=weekly, monthly=monthly)
+        removed = [name for name in names if name not in keep]
+        for name in removed:
+            shutil.rmtree(snapshots_dir(root) / name)
+
+        referenced = set()
+        for name in sorted(keep):
+            referenced.update(entry["sha256"] for entry in load_manifest(name, root).get("files", []))
+        freed = 0
+        cutoff = time.time() - TMP_GRACE_SECONDS
+        objects = root / "objects"
+        if objects.exists():
+            for path in objects.glob("*/*/*"):
+                digest = path.name.split(".", 1)[0]
+                if ".tmp-" in path.name:
+                    if path.stat().st_mtime > cutoff:
+                        continue
+                elif digest in referenced:
+                    continue
+                freed += path.stat().st_size
+                path.unlink()
+        return {"removed": removed, "kept": sorted(keep), "freed_bytes": freed}
@@ -0,0 +1,275 @@
+"""Benchmarks de las vistas mas usadas sobre el set de ``generate_load_data``.
+
+Cada escenario es un request real con el ``Client`` de pruebas de Django
+(middlewares, plantillas y ORM incluidos) como un usuario de Gerencia. Se
+miden latencias (p50/p90/p95/p99), consultas por request y, en una pasada
+aparte con ``tracemalloc`` para no inflar los tiempos, el pico de memoria.
+
+Todo corre dentro de una transaccion que se revierte al final (el usuario
+del benchmark y su sesion no quedan en la base) y cada POST se revierte con
+un savepoint, asi que todas las iteraciones ven los mismos datos. El
+resultado es un JSON que ``compare`` contrasta contra una linea base.
+"""
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.db import connection, transaction
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Customer, Estimate, Payment, ServiceOrder
+from core.perf import percentile
+from core.permissions import ROLE_GERENCIA, ROLE_RECEPCION
+
+FORMAT_VERSION = 1
+BENCH_USERNAME = "benchmark"
+PERCENTILES = (50, 90, 95, 99)
+# Diferencias menores no cuentan como regresion: es ruido de medicion.
+NOISE_FLOOR_MS = 2.0
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+class Scenario:
+    def __init__(self, name, url_name, *, method="get", args=(), params=None, data=None, expect=(200,)):
+        self.name = name
+        self.url_name = url_name
+        self.method = method
+        self.args = args
+        self.params = params or {}
+        self.data = data
+        self.expect = expect
+
+    @property
+    def path(self):
+        return reverse(self.url_name, args=self.args)
+
+    def request(self, client):
+        if self.method == "post":
+            return client.post(self.path, self.data or {}, secure=True)
+        return client.get(self.path, self.params, secure=True)
+
+
+def _targets():
+    """Ordenes y terminos de busqueda representativos del set cargado."""
+    last_checkin = ServiceOrder.objects.aggregate(last=Max("checkin_at"))["last"]
+    if last_checkin is None:
+        raise BenchmarkError("No hay ordenes; corre generate_load_data primero.")
+    paid_order_id = Payment.objects.order_by("-pk").values_list("order_id", flat=True).first()
+    order = ServiceOrder.objects.select_related("customer").get(
+        pk=paid_order_id or ServiceOrder.objects.order_by("-pk").values_list("pk", flat=True)[0]
+    )
+    # Para cobrar hace falta saldo: una orden lista con cotizacion aceptada y sin pagos.
+    # Sin ella no se mide add_payment (otra orden responderia con error y no con el cobro).
+    payable = (
+        ServiceOrder.objects.filter(
+            status=ServiceOrder.Status.READY_PICKUP,
+            paid_amount=0,
+            estimate__status__in=(Estimate.Status.CLOSED_ACCEPTED, Estimate.Status.CLOSED_PARTIAL),
+        )
+        .order_by("-pk")
+        .values_list("pk", flat=True)
+        .first()
+    )
+    technician_id = (
+        ServiceOrder.objects.filter(assigned_to__isnull=False)
+        .order_by("-pk")
+        .values_list("assigned_to_id", flat=True)
+        .first()
+    )
+    customer = order.customer or Customer.objects.order_by("-pk").first()
+    name_parts = (customer.name if customer else "").split()
+    end = timezone.localdate(last_checkin)
+    return {
+        "order": order,
+        "payable_id": payable,
+        "technician_id": technician_id or "",
+        "last_name": name_parts[1] if len(name_parts) > 1 else (name_parts[0] if name_parts else "a"),
+        "start": (end - timedelta(days=6)).isoformat(),
+        "end": end.isoformat(),
+    }
+
+
+def build_scenarios(targets):
+    order = targets["order"]
+    week = {"from": targets["start"], "to": targets["end"]}
+    new_order = {
+        "customer_name": "Cliente Benchmark",
+        "customer_phone": "6140000000",
+        "notes": "Orden de benchmark",
+        "devices-TOTAL_FORMS": "1",
+        "devices-INITIAL_FORMS": "0",
+        "devices-MIN_NUM_FORMS": "1",
+        "devices-MAX_NUM_FORMS": "20",
+        "devices-0-brand": "HP",
+        "devices-0-model": "Pavilion 15",
+        "devices-0-notes": "No enciende",
+    }
+    scenarios = [
+        Scenario("list_orders", "list_orders"),
+        Scenario("list_orders_search", "list_orders", params={"q": targets["last_name"]}),
+        Scenario("list_orders_filters", "list_orders", params={"status": ServiceOrder.Status.DELIVERED, **week}),
+        Scenario(
+            "list_orders_assignee",
+            "list_orders",
+            params={"assignee": targets["technician_id"], "status": ServiceOrder.Status.IN_REVIEW},
+        ),
+        Scenario("dashboard", "dashboard"),
+        Scenario("order_detail", "order_detail", args=(order.pk,)),
+        Scenario("reception_new_order", "reception_new_order", method="post", data=new_order, expect=(302,)),
+    ]
+    if targets["payable_id"]:
+        scenarios.append(
+            Scenario(
+                "add_payment",
+                "add_payment",
+                method="post",
+                args=(targets["payable_id"],),
+                data={"amount": "1.00", "method": "Efectivo"},
+                expect=(302,),
+            )
+        )
+    scenarios += [
+        Scenario("export_orders_csv", "export_orders_csv", params={"start": targets["start"], "end": targets["end"]}),
+        Scenario("receipt_pdf", "receipt_pdf", args=(order.token,)),
+        Scenario("public_status", "public_status", args=(order.token,)),
+        Scenario("reception_customer_search", "reception_customer_search", params={"q": targets["last_name"]}),
+    ]
+    return scenarios
+
+
+def _consume(response):
+    # Las exportaciones son streaming: las consultas ocurren al leer el cuerpo.
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def _measure(client, scenario):
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = scenario.request(client)
+            size = _consume(response)
+            elapsed = (time.perf_counter() - started) * 1000
+        transaction.set_rollback(True)
+    if response.status_code not in scenario.expect:
+        raise BenchmarkError(f"{scenario.name}: respuesta {response.status_code}, se esperaba {scenario.expect}.")
+    return elapsed, len(queries), size
+
+
+def _peak_memory_kb(client, scenario):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        _measure(client, scenario)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024)
+
+
+def run_scenario(client, scenario, *, iterations, warmup):
+    for _ in range(warmup):
+        _measure(client, scenario)
+    timings, query_counts = [], []
+    for _ in range(iterations):
+        elapsed, queries, size = _measure(client, scenario)
+        timings.append(elapsed)
+        query_counts.append(queries)
+    timings.sort()
+    result = {
+        "method": scenario.method.upper(),
+        "path": scenario.path,
+        "samples": iterations,
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "min_ms": round(timings[0], 2),
+        "max_ms": round(timings[-1], 2),
+        "queries": max(query_counts),
+        "bytes": size,
+        "peak_kb": _peak_memory_kb(client, scenario),
+    }
+    for pct in PERCENTILES:
+        result[f"p{pct}_ms"] = round(percentile(timings, pct), 2)
+    return result
+
+
+def _dataset():
+    return {
+        "customers": Customer.objects.count(),
+        "orders": ServiceOrder.objects.count(),
+        "payments": Payment.objects.count(),
+    }
+
+
+def run(*, iterations=20, warmup=3, only=None, log=None):
+    """Corre los escenarios (todos o los de ``only``) y regresa el resultado."""
+    log = log or (lambda message: None)
+    results = {
+        "version": FORMAT_VERSION,
+        "created_at": timezone.now().isoformat(timespec="seconds"),
+        "database": connection.vendor,
+        "python": platform.python_version(),
+        "iterations": iterations,
+        "warmup": warmup,
+        "scenarios": {},
+    }
+    test_settings = override_settings(
+        ALLOWED_HOSTS=["testserver"],
+        EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    )
+    with test_settings, transaction.atomic():
+        results["dataset"] = _dataset()
+        targets = _targets()
+        scenarios = build_scenarios(targets)
+        if not targets["payable_id"]:
+            if only and "add_payment" in only:
+                raise BenchmarkError("add_payment: no hay orden lista con saldo por cobrar en los datos.")
+            if not only:
+                log("add_payment: omitido, no hay orden lista con saldo por cobrar.")
+        if only:
+            unknown = set(only) - {scenario.name for scenario in scenarios}
+            if unknown:
+                raise BenchmarkError(f"Escenarios desconocidos: {', '.join(sorted(unknown))}.")
+            scenarios = [scenario for scenario in scenarios if scenario.name in only]
+
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        for name in (ROLE_RECEPCION, ROLE_GERENCIA):
+            user.groups.add(Group.objects.get_or_create(name=name)[0])
+        client = Client()
+        client.force_login(user)
+        for scenario in scenarios:
+            result = run_scenario(client, scenario, iterations=iterations, warmup=warmup)
+            results["scenarios"][scenario.name] = result
+            log(
+                f"{scenario.name}: p50 {result['p50_ms']}ms, p95 {result['p95_ms']}ms, "
+                f"{result['queries']} consultas, {result['peak_kb']} KB"
+            )
+        transaction.set_rollback(True)
+    return results
+
+
+def compare(current, baseline, *, tolerance=0.2):
+    """Regresiones contra la linea base: tiempos y memoria +``tolerance``, o mas consultas."""
+    regressions = []
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if result[metric] > base[metric] * (1 + tolerance) and result[metric] - base[metric] > NOISE_FLOOR_MS:
+                regressions.append((name, metric, base[metric], result[metric]))
+        if result["queries"] > base["queries"]:
+            regressions.append((name, "queries", base["queries"], result["queries"]))
+        if result["peak_kb"] > base["peak_kb"] * (1 + tolerance):
+            regressions.append((name, "peak_kb", base["peak_kb"], result["peak_kb"]))
+    return regressions
@@ -0,0 +1,108 @@
+"""``/healthz`` (vida) y ``/readyz`` (dependencias) para el watchdog.
+
+Los atiende ``HealthCheckMiddleware``, primero en la cadena: no pasan por
+redireccion SSL, sesiones, CSRF ni autenticacion. ``/healthz`` no toca la
+base; ``/readyz`` mide la ida y vuelta a la base, prueba que ``MEDIA_ROOT``
+acepte escrituras y reporta colas pendientes y la edad del ultimo respaldo.
+Responde 503 solo si falla la base o media; lo demas marca ``degraded``.
+"""
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+LIVENESS_PATH = "/healthz"
+READINESS_PATH = "/readyz"
+
+
+def _timed(check):
+    started = time.perf_counter()
+    try:
+        result = check() or {}
+        result.setdefault("ok", True)
+    except Exception as exc:  # el reporte debe salir aunque falle la dependencia
+        result = {"ok": False, "error": f"{type(exc).__name__}: {exc}"[:200]}
+    result["ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def _check_database():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+
+def _check_media():
+    media_root = Path(settings.MEDIA_ROOT)
+    media_root.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=media_root, prefix=".readyz-"):
+        pass
+
+
+def _queues():
+    from core.image_ingest import queue_depth
+    from core.models import Notification, UploadSession
+
+    since = timezone.now() - timedelta(hours=24)
+    return {
+        "notifications_failed_24h": Notification.objects.filter(ok=False, created_at__gte=since).count(),
+        "image_ingest_pending": queue_depth(),
+        "uploads_open": UploadSession.objects.filter(status=UploadSession.Status.OPEN).count(),
+    }
+
+
+def _last_backup():
+    from core.backups import SNAPSHOT_FORMAT, list_snapshots
+
+    names = list_snapshots()
+    if not names:
+        return {"ok": False, "name": None, "age_hours": None}
+    taken = timezone.make_aware(datetime.strptime(names[-1], SNAPSHOT_FORMAT))
+    age = (timezone.now() - taken).total_seconds() / 3600
+    limit = float(getattr(settings, "READYZ_BACKUP_MAX_AGE_HOURS", 36))
+    return {"ok": age <= limit, "name": names[-1], "age_hours": round(age, 1)}
+
+
+def liveness(request):
+    response = HttpResponse("ok", content_type="text/plain")
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+def readiness(request):
+    checks = {
+        "database": _timed(_check_database),
+        "media": _timed(_check_media),
+        "queues": _timed(_queues),
+        "backup": _timed(_last_backup),
+    }
+    critical_ok = checks["database"]["ok"] and checks["media"]["ok"]
+    if not critical_ok:
+        status = "fail"
+    elif all(check["ok"] for check in checks.values()):
+        status = "ok"
+    else:
+        status = "degraded"
+    response = JsonResponse({"status": status, "checks": checks}, status=200 if critical_ok else 503)
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+class HealthCheckMiddleware:
+    """Responde los health checks antes que cualquier otro middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        path = request.path_info.rstrip("/")
+        if path == LIVENESS_PATH and request.method in ("GET", "HEAD"):
+            return liveness(request)
+        if path == READINESS_PATH and request.method in ("GET", "HEAD"):
+            return readiness(request)
+        return self.get_response(request)
@@ -0,0 +1,203 @@
+"""Recompresion de fotos adjuntas.
+
+Opcional (``ATTACHMENT_IMAGE_INGEST``). Despues de subir, un pool de hilos
+reduce la imagen a ``ATTACHMENT_IMAGE_MAX_PX`` por lado, la recomprime con
+``ATTACHMENT_IMAGE_QUALITY`` y la vuelve a guardar sin EXIF (GPS incluido);
+la orientacion se aplica antes de descartarlo. El blob nuevo reemplaza al
+original en todas las filas que lo compartian y se registran los tamanos
+original y guardado. Solo se procesan JPEG, PNG y WebP, sin cambiar de
+formato para no alterar la extension del archivo.
+
+Lo que se pierde en la cola (reinicio del worker, error) queda con
+``original_size`` nulo; ``ingest_pending_images`` lo reintenta.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from core.models import Attachment
+from core.storage import digest_from_name, release_attachment_file
+from core.thumbnails import delete_thumbnails_for_name, ensure_thumbnail
+
+logger = logging.getLogger(__name__)
+
+INGEST_FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+
+
+def ingest_enabled():
+    return bool(getattr(settings, "ATTACHMENT_IMAGE_INGEST", False))
+
+
+def _max_px():
+    return int(getattr(settings, "ATTACHMENT_IMAGE_MAX_PX", 2560))
+
+
+def _quality():
+    return int(getattr(settings, "ATTACHMENT_IMAGE_QUALITY", 82))
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = max(1, int(getattr(settings, "ATTACHMENT_INGEST_WORKERS", 2)))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-ingest")
+        return _executor
+
+
+def queue_depth():
+    """Adjuntos en espera de procesarse en el pool."""
+    with _executor_lock:
+        return _pending
+
+
+def _count_pending(delta):
+    global _pending
+    with _executor_lock:
+        _pending += delta
+
+
+def recompress_image(handle, fmt, *, max_px, quality):
+    """Regresa ``(bytes, cambio_dimension, tenia_metadatos)`` de la imagen procesada."""
+    with Image.open(handle) as image:
+        had_metadata = bool(image.getexif()) or any(key in image.info for key in ("exif", "xmp", "XML:com.adobe.xmp"))
+        original_dims = image.size
+        if fmt == "JPEG":
+            image.draft("RGB", (max_px, max_px))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_px, max_px), Image.Resampling.LANCZOS)
+        resized = max(image.size) < max(original_dims)
+        # Sin exif=/pnginfo= Pillow no copia metadatos; el perfil ICC si se conserva.
+        options = {"icc_profile": image.info.get("icc_profile")}
+        if fmt == "JPEG":
+            image = image.convert("RGB")
+            options.update(quality=quality, optimize=True, progressive=True)
+        elif fmt == "WEBP":
+            options.update(quality=quality, method=4)
+        else:
+            options.update(optimize=True)
+        buffer = BytesIO()
+        image.save(buffer, fmt, **{key: value for key, value in options.items() if value is not None})
+        return buffer.getvalue(), resized, had_metadata
+
+
+def ingest_attachment(attachment_id):
+    """Procesa el adjunto; regresa ``True`` si se reemplazo el archivo."""
+    attachment = Attachment.objects.filter(pk=attachment_id).first()
+    if attachment is None or attachment.original_size is not None:
+        return False
+    old_name = attachment.file.name
+    storage = attachment.file.storage
+    fmt = INGEST_FORMATS.get(PurePosixPath(attachment.display_name).suffix.lower())
+    try:
+        original_size = storage.size(old_name)
+    except OSError:
+        logger.warning("No existe el archivo %s del adjunto %s", old_name, attachment_id)
+        return False
+    data = None
+    if fmt:
+        try:
+            with storage.open(old_name, "rb") as handle:
+                data, resized, had_metadata = recompress_image(handle, fmt, max_px=_max_px(), quality=_quality())
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            logger.warning("No se pudo recomprimir %s", old_name)
+        else:
+            # Se conserva el original si no hubo que reducir ni limpiar y no se gana espacio.
+            if not (resized or had_metadata) and len(data) >= original_size:
+                data = None
+
+    new_name = old_name
+    if data is not None:
+        new_name = storage.save(old_name, ContentFile(data))
+    with transaction.atomic():
+        shared = Attachment.objects.select_for_update().filter(file=old_name, original_size__isnull=True)
+        changes = {
+            "file": new_name,
+            "original_size": original_size,
+            "size": len(data) if data is not None else original_size,
+        }
+        digest = digest_from_name(new_name)
+        if digest:
+            changes["sha256"] = digest
+        updated = shared.update(**changes)
+    if new_name != old_name:
+        if not updated:
+            # Otro proceso ya lo atendio; el blob nuevo puede quedar sin filas.
+            release_attachment_file(new_name, storage)
+            return False
+        delete_thumbnails_for_name(storage, old_name)
+        release_attachment_file(old_name, storage)
+    if fmt:
+        attachment.refresh_from_db()
+        ensure_thumbnail(attachment.file)
+    return new_name != old_name
+
+
+def pending_attachments(*, older_than=timedelta(minutes=10)):
+    """Fotos sin procesar (``original_size`` nulo) subidas hace mas de ``older_than``."""
+    suffixes = Q()
+    for suffix in INGEST_FORMATS:
+        suffixes |= Q(file__iendswith=suffix)
+    return Attachment.objects.filter(
+        suffixes, original_size__isnull=True, uploaded_at__lt=timezone.now() - older_than
+    ).exclude(file="")
+
+
+def retry_pending(*, older_than=timedelta(minutes=10), limit=None):
+    """Procesa en este hilo las fotos pendientes; regresa ``(procesadas, fallidas)``."""
+    ids = list(pending_attachments(older_than=older_than).order_by("pk").values_list("pk", flat=True)[:limit])
+    failed = []
+    for attachment_id in ids:
+        try:
+            ingest_attachment(attachment_id)
+        except Exception:
+            logger.exception("Fallo el procesamiento de la imagen del adjunto %s", attachment_id)
+            failed.append(attachment_id)
+    return [pk for pk in ids if pk not in failed], failed
+
+
+def _run(attachment_id):
+    close_old_connections()
+    try:
+        ingest_attachment(attachment_id)
+    except Exception:
+        logger.exception("Fallo el procesamiento de la imagen del adjunto %s", attachment_id)
+    finally:
+        _count_pending(-1)
+        close_old_connections()
+
+
+def _submit(attachment_id):
+    executor = _get_executor()
+    _count_pending(1)
+    try:
+        executor.submit(_run, attachment_id)
+    except RuntimeError:
+        _count_pending(-1)
+        raise
+
+
+def schedule_ingest(attachment):
+    """Encola el adjunto al confirmar la transaccion; ``False`` si no aplica."""
+    if not ingest_enabled() or PurePosixPath(attachment.display_name).suffix.lower() not in INGEST_FORMATS:
+        return False
+    attachment_id = attachment.pk
+    if int(getattr(settings, "ATTACHMENT_INGEST_WORKERS", 2)) <= 0:
+        transaction.on_commit(lambda: ingest_attachment(attachment_id))
+    else:
+        transaction.on_commit(lambda: _submit(attachment_id))
+    return True
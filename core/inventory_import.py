@@ -0,0 +1,335 @@
+"""Importacion masiva de inventario desde CSV.
+
+El archivo se lee fila por fila, se valida completo antes de tocar la base y
+despues se aplica en una sola transaccion: upsert de ``InventoryItem`` con
+``bulk_create(update_conflicts=True)`` y ``InventoryMovement`` por lotes para
+cada cambio de existencias. Como ``bulk_create`` no dispara signals, la
+alerta de stock bajo (una sola por importacion) se emite al confirmar la
+transaccion.
+
+La vista previa guarda el archivo en cache con un token (``stash_upload``)
+para aplicarlo despues sin volver a subirlo.
+"""
+import csv
+import io
+import secrets
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import InventoryItem, InventoryMovement, notify_low_stock_summary
+
+
+MODE_DELTA = "delta"
+MODE_ABSOLUTE = "absolute"
+IMPORT_MODES = (
+    (MODE_DELTA, "Sumar/restar a la existencia actual"),
+    (MODE_ABSOLUTE, "Reemplazar existencia (conteo fisico)"),
+)
+IMPORT_COLUMNS = ("sku", "name", "qty", "min_qty", "location")
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_REASON = "Importacion CSV"
+STASH_TIMEOUT = 30 * 60
+
+_NAME_MAX = InventoryItem._meta.get_field("name").max_length
+_SKU_MAX = InventoryItem._meta.get_field("sku").max_length
+_LOCATION_MAX = InventoryItem._meta.get_field("location").max_length
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _as_text_stream(stream):
+    if isinstance(stream, io.TextIOBase):
+        return stream, False
+    raw = getattr(stream, "file", stream)
+    if hasattr(raw, "seek"):
+        raw.seek(0)
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""), True
+
+
+def _parse_int(value):
+    value = (value or "").strip()
+    if not value:
+        return None
+    return int(value)
+
+
+def parse_inventory_csv(stream, *, mode=MODE_DELTA):
+    """Lee y valida el CSV completo; regresa ``(rows, errors)``.
+
+    Cada fila valida es un dict con ``line``, ``sku``, ``name``, ``qty``,
+    ``min_qty`` y ``location``. Una celda vacia conserva el valor actual.
+    """
+    if mode not in dict(IMPORT_MODES):
+        return [], [f"Modo de importacion invalido: {mode}."]
+
+    text_stream, wrapped = _as_text_stream(stream)
+    rows = []
+    errors = []
+    seen = {}
+    try:
+        reader = csv.DictReader(text_stream)
+        headers = [(h or "").strip().lower() for h in (reader.fieldnames or [])]
+        if "sku" not in headers:
+            return [], ["El archivo debe incluir al menos la columna 'sku'."]
+        unknown = [h for h in headers if h and h not in IMPORT_COLUMNS]
+        if unknown:
+            errors.append(f"Columnas no reconocidas: {', '.join(unknown)}.")
+        reader.fieldnames = headers
+
+        for line, raw in enumerate(reader, start=2):
+            values = {key: (raw.get(key) or "").strip() for key in IMPORT_COLUMNS}
+            if not any(values.values()):
+                continue
+            sku = values["sku"].upper()
+            if not sku:
+                errors.append(f"Fila {line}: SKU requerido.")
+                continue
+            if len(sku) > _SKU_MAX:
+                errors.append(f"Fila {line}: SKU {sku} excede {_SKU_MAX} caracteres.")
+                continue
+            if sku in seen:
+                errors.append(f"Fila {line}: SKU {sku} repetido (ya aparece en la fila {seen[sku]}).")
+                continue
+            seen[sku] = line
+            try:
+                qty = _parse_int(values["qty"])
+            except ValueError:
+                errors.append(f"Fila {line}: cantidad invalida.")
+                continue
+            if mode == MODE_ABSOLUTE and qty is not None and qty < 0:
+                errors.append(f"Fila {line}: la existencia no puede ser negativa.")
+                continue
+            try:
+                min_qty = _parse_int(values["min_qty"])
+            except ValueError:
+                errors.append(f"Fila {line}: minimo invalido.")
+                continue
+            if min_qty is not None and min_qty < 0:
+                errors.append(f"Fila {line}: el minimo no puede ser negativo.")
+                continue
+            name = values["name"]
+            if len(name) > _NAME_MAX:
+                errors.append(f"Fila {line}: el nombre excede {_NAME_MAX} caracteres.")
+                continue
+            location = values["location"] or None
+            if location and len(location) > _LOCATION_MAX:
+                errors.append(f"Fila {line}: la ubicacion excede {_LOCATION_MAX} caracteres.")
+                continue
+            rows.append(
+                {
+                    "line": line,
+                    "sku": sku,
+                    "name": name,
+                    "qty": qty,
+                    "min_qty": min_qty,
+                    "location": location,
+                }
+            )
+    except UnicodeDecodeError:
+        return [], ["El archivo debe estar codificado en UTF-8."]
+    except csv.Error as exc:
+        return [], [f"CSV invalido: {exc}"]
+    finally:
+        if wrapped:
+            text_stream.detach()
+
+    if not rows and not errors:
+        errors.append("El archivo no contiene filas.")
+    return rows, errors
+
+
+def diff_inventory_rows(rows, *, mode=MODE_DELTA, lock=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Compara las filas contra el inventario actual; regresa ``(changes, errors)``.
+
+    Con ``lock=True`` los items existentes se leen con ``select_for_update``
+    (debe llamarse dentro de una transaccion).
+    """
+    existing = {}
+    skus = [row["sku"] for row in rows]
+    base_qs = InventoryItem.objects.all()
+    if lock:
+        base_qs = base_qs.select_for_update()
+    for chunk in _chunks(skus, batch_size):
+        for item in base_qs.filter(sku__in=chunk):
+            existing[item.sku] = item
+
+    changes = []
+    errors = []
+    for row in rows:
+        item = existing.get(row["sku"])
+        if item is None:
+            if not row["name"]:
+                errors.append(f"Fila {row['line']}: nombre requerido para el SKU nuevo {row['sku']}.")
+                continue
+            qty_before = 0
+            name = row["name"]
+            min_qty = row["min_qty"] if row["min_qty"] is not None else 0
+            location = row["location"] or ""
+        else:
+            qty_before = item.qty
+            name = row["name"] or item.name
+            min_qty = row["min_qty"] if row["min_qty"] is not None else item.min_qty
+            location = row["location"] if row["location"] is not None else item.location
+
+        if row["qty"] is None:
+            qty_after = qty_before
+        elif mode == MODE_ABSOLUTE:
+            qty_after = row["qty"]
+        else:
+            qty_after = qty_before + row["qty"]
+        if qty_after < 0:
+            errors.append(
+                f"Fila {row['line']}: {row['sku']} quedaria con existencia negativa ({qty_after})."
+            )
+            continue
+
+        if item is None:
+            action = "create"
+        elif (
+            qty_after != item.qty
+            or name != item.name
+            or min_qty != item.min_qty
+            or location != item.location
+        ):
+            action = "update"
+        else:
+            action = "unchanged"
+        changes.append(
+            {
+                "line": row["line"],
+                "sku": row["sku"],
+                "name": name,
+                "min_qty": min_qty,
+                "location": location,
+                "qty_before": qty_before,
+                "qty_after": qty_after,
+                "delta": qty_after - qty_before,
+                "action": action,
+            }
+        )
+    return changes, errors
+
+
+def _summarize(changes):
+    summary = {"create": 0, "update": 0, "unchanged": 0, "movements": 0, "units_in": 0, "units_out": 0}
+    for change in changes:
+        summary[change["action"]] += 1
+        if change["delta"]:
+            summary["movements"] += 1
+            if change["delta"] > 0:
+                summary["units_in"] += change["delta"]
+            else:
+                summary["units_out"] -= change["delta"]
+    return summary
+
+
+def _apply_changes(changes, *, author, reason, batch_size):
+    pending = [change for change in changes if change["action"] != "unchanged"]
+    if not pending:
+        return
+    InventoryItem.objects.bulk_create(
+        [
+            InventoryItem(
+                sku=change["sku"],
+                name=change["name"],
+                qty=change["qty_after"],
+                min_qty=change["min_qty"],
+                location=change["location"],
+            )
+            for change in pending
+        ],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["sku"],
+        update_fields=["name", "qty", "min_qty", "location"],
+    )
+
+    moved = [change for change in pending if change["delta"]]
+    item_ids = {}
+    for chunk in _chunks([change["sku"] for change in moved], batch_size):
+        item_ids.update(InventoryItem.objects.filter(sku__in=chunk).values_list("sku", "id"))
+    InventoryMovement.objects.bulk_create(
+        [
+            InventoryMovement(
+                item_id=item_ids[change["sku"]],
+                delta=change["delta"],
+                reason=reason,
+                author=author,
+            )
+            for change in moved
+        ],
+        batch_size=batch_size,
+    )
+
+    low_stock = [change["sku"] for change in moved if change["qty_after"] <= change["min_qty"]]
+    if low_stock:
+        transaction.on_commit(lambda: _notify_low_stock(low_stock, batch_size))
+
+
+def _notify_low_stock(skus, batch_size):
+    items = []
+    for chunk in _chunks(skus, batch_size):
+        items.extend(InventoryItem.objects.filter(sku__in=chunk))
+    notify_low_stock_summary(sorted(items, key=lambda item: item.sku), title="Stock bajo tras importacion")
+
+
+def _stash_key(token):
+    return f"inventory-import:{token}"
+
+
+def stash_upload(data, *, mode, user_id):
+    """Guarda el CSV de una vista previa; regresa el token para aplicarlo."""
+    token = secrets.token_urlsafe(16)
+    cache.set(_stash_key(token), {"data": data, "mode": mode, "user_id": user_id}, STASH_TIMEOUT)
+    return token
+
+
+def load_stash(token, *, user_id):
+    """Regresa ``(data, mode)`` de la vista previa; ``None`` si expiro o es de otro usuario."""
+    stashed = cache.get(_stash_key(token)) if token else None
+    if not stashed or stashed["user_id"] != user_id:
+        return None
+    return stashed["data"], stashed["mode"]
+
+
+def drop_stash(token):
+    cache.delete(_stash_key(token))
+
+
+def import_inventory_csv(
+    stream,
+    *,
+    mode=MODE_DELTA,
+    author=None,
+    dry_run=False,
+    reason=DEFAULT_REASON,
+    batch_size=DEFAULT_BATCH_SIZE,
+):
+    """Valida y (si no es ``dry_run``) aplica un CSV de inventario.
+
+    Regresa un dict con ``changes`` (diff por SKU), ``errors`` y ``summary``.
+    Si hay cualquier error no se escribe nada.
+    """
+    rows, errors = parse_inventory_csv(stream, mode=mode)
+    result = {"changes": [], "errors": errors, "summary": _summarize([]), "applied": False}
+    if errors:
+        return result
+
+    changes, errors = diff_inventory_rows(rows, mode=mode, batch_size=batch_size)
+    result.update(changes=changes, errors=errors, summary=_summarize(changes))
+    if errors or dry_run:
+        return result
+
+    with transaction.atomic():
+        # Se recalcula con los items bloqueados para no perder entradas concurrentes.
+        changes, errors = diff_inventory_rows(rows, mode=mode, lock=True, batch_size=batch_size)
+        if errors:
+            result.update(changes=changes, errors=errors, summary=_summarize(changes))
+            return result
+        _apply_changes(changes, author=author, reason=reason or DEFAULT_REASON, batch_size=batch_size)
+    result.update(changes=changes, summary=_summarize(changes), applied=True)
+    return result
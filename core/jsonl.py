@@ -0,0 +1,196 @@
+"""Volcado y carga de datos en JSONL por modelo, en streaming.
+
+``dump_jsonl`` escribe un archivo ``<app>.<modelo>.jsonl`` por modelo (una
+fila por linea, columnas crudas como ``customer_id``) mas ``manifest.json``
+con el orden de dependencias y los conteos. ``load_jsonl`` lee por lotes y usa
+``bulk_create``: no llama ``save()`` ni senales, y respeta fechas
+``auto_now``. Los M2M se vuelcan como sus tablas intermedias (p. ej.
+``ServiceOrder.devices``) y las FK a la misma tabla (``warranty_parent``) se
+aplican en una segunda pasada. La memoria depende del lote, no del tamano
+de los datos.
+"""
+import datetime
+import json
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.apps import apps
+from django.contrib.auth.models import Group, User
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 1
+DEFAULT_BATCH_SIZE = 2000
+
+
+class JsonlError(Exception):
+    """Volcado JSONL invalido o base destino no apta."""
+
+
+class _Encoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder recorta a milisegundos; aqui se conservan los microsegundos.
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def _self_fk_fields(model):
+    return [f for f in model._meta.concrete_fields if f.is_relation and f.related_model is model]
+
+
+def default_models():
+    """Modelos de ``core`` mas usuarios y grupos, con sus M2M intermedios."""
+    models = [Group, User, User.groups.through]
+    for model in apps.get_app_config("core").get_models():
+        models.append(model)
+        for field in model._meta.local_many_to_many:
+            if field.remote_field.through._meta.auto_created:
+                models.append(field.remote_field.through)
+    return sort_models(models)
+
+
+def sort_models(models):
+    """Ordena para que cada modelo vaya despues de los que referencia por FK."""
+    pending = list(dict.fromkeys(models))
+    included = set(pending)
+    ordered = []
+    while pending:
+        for model in pending:
+            deps = {
+                f.related_model
+                for f in model._meta.concrete_fields
+                if f.is_relation and f.related_model is not model and f.related_model in included
+            }
+            if deps.issubset(ordered):
+                ordered.append(model)
+                pending.remove(model)
+                break
+        else:
+            raise JsonlError(f"Dependencia circular entre {', '.join(model_label(m) for m in pending)}.")
+    return ordered
+
+
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def dump_jsonl(directory, *, models=None, batch_size=DEFAULT_BATCH_SIZE, using="default"):
+    """Escribe un JSONL por modelo en ``directory``; regresa el manifiesto."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    encoder = _Encoder(ensure_ascii=False, separators=(",", ":"))
+    entries = []
+    for model in models or default_models():
+        columns = _columns(model)
+        filename = f"{model_label(model)}.jsonl"
+        rows = 0
+        queryset = model._base_manager.using(using).order_by("pk").values_list(*columns)
+        with open(directory / filename, "w", encoding="utf-8") as handle:
+            for row in queryset.iterator(chunk_size=batch_size):
+                handle.write(encoder.encode(row))
+                handle.write("\n")
+                rows += 1
+        entries.append({"model": model_label(model), "file": filename, "columns": columns, "rows": rows})
+    manifest = {"version": FORMAT_VERSION, "models": entries}
+    with open(directory / MANIFEST_NAME, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, ensure_ascii=False, indent=1)
+    return manifest
+
+
+@contextmanager
+def raw_timestamps(models):
+    """Desactiva ``auto_now``/``auto_now_add`` para conservar las fechas volcadas."""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _iter_batches(path, size):
+    batch = []
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _load_model(model, directory, entry, batch_size, using):
+    fields = {field.attname: field for field in model._meta.concrete_fields}
+    columns = entry["columns"]
+    unknown = set(columns) - set(fields)
+    if unknown:
+        raise JsonlError(f"{entry['model']}: columnas desconocidas {', '.join(sorted(unknown))}.")
+    self_fks = {field.attname for field in _self_fk_fields(model)}
+    pk_name = model._meta.pk.attname
+    deferred = []
+    loaded = 0
+    for batch in _iter_batches(Path(directory) / entry["file"], batch_size):
+        objects = []
+        for row in batch:
+            values = {name: fields[name].to_python(value) for name, value in zip(columns, row)}
+            for name in self_fks:
+                if values.get(name) is not None:
+                    deferred.append((values[pk_name], name, values[name]))
+                    values[name] = None
+            objects.append(model(**values))
+        model._base_manager.using(using).bulk_create(objects, batch_size=batch_size)
+        loaded += len(objects)
+    for pk, name, value in deferred:
+        model._base_manager.using(using).filter(pk=pk).update(**{name: value})
+    return loaded
+
+
+def load_jsonl(directory, *, batch_size=DEFAULT_BATCH_SIZE, using="default"):
+    """Carga un volcado de ``dump_jsonl`` en una base vacia; regresa ``{modelo: filas}``."""
+    directory = Path(directory)
+    try:
+        with open(directory / MANIFEST_NAME, encoding="utf-8") as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError) as exc:
+        raise JsonlError(f"No se pudo leer {directory / MANIFEST_NAME}: {exc}")
+    if manifest.get("version") != FORMAT_VERSION:
+        raise JsonlError(f"Version de volcado no soportada: {manifest.get('version')}.")
+
+    models = []
+    for entry in manifest["models"]:
+        try:
+            models.append(apps.get_model(entry["model"]))
+        except LookupError:
+            raise JsonlError(f"Modelo desconocido: {entry['model']}.")
+    for model in models:
+        if model._base_manager.using(using).exists():
+            raise JsonlError(f"La tabla de {model_label(model)} ya tiene datos; usa una base vacia.")
+
+    counts = {}
+    connection = connections[using]
+    with transaction.atomic(using=using), raw_timestamps(models):
+        for model, entry in zip(models, manifest["models"]):
+            counts[entry["model"]] = _load_model(model, directory, entry, batch_size, using)
+            if counts[entry["model"]] != entry["rows"]:
+                raise JsonlError(f"{entry['model']}: {counts[entry['model']]} filas, se esperaban {entry['rows']}.")
+        # Las PK vienen del volcado: las secuencias (PostgreSQL) deben continuar despues.
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+    return counts
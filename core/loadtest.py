@@ -0,0 +1,540 @@
+"""Prueba de carga concurrente del flujo de recepcion contra un servidor vivo.
+
+Usuarios virtuales (hilos, cada uno con su sesion y cookies) repiten el
+flujo real por HTTP, en cadena como en el taller:
+
+1. Recepcion busca al cliente, da de alta la orden y la asigna a un tecnico.
+2. El tecnico la pasa a revision.
+3. Recepcion captura la cotizacion (con una refaccion de inventario) y la
+   envia; el cliente, sin sesion, la acepta desde la liga publica.
+4. El tecnico la marca lista (descuenta stock).
+5. Recepcion cobra, entrega y genera el recibo PDF.
+
+Cada request se mide y se clasifica por nombre de URL; si el servidor corre
+con ``PERF_SERVER_TIMING = "all"``, el ``Server-Timing`` de ``core.perf`` da
+ademas el tiempo en base, que sube cuando hay espera por locks. El alta
+(folio consecutivo), la aceptacion (apartado de stock), el paso a listo
+(descuento de stock) y el pago (``select_for_update`` de la orden) se
+reportan aparte como puntos de contencion. Las refacciones salen de unos pocos SKUs "calientes" para que
+los tecnicos compitan por las mismas filas.
+"""
+import itertools
+import json
+import queue
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from http.cookiejar import Cookie, CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urljoin, urlsplit
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.test import Client
+from django.urls import Resolver404, resolve, reverse
+
+from core.models import IVA_RATE, InventoryItem, ServiceOrder
+from core.perf import percentile
+from core.permissions import ROLE_RECEPCION, ROLE_TECNICO
+from core.synthetic import LAST_NAMES
+
+RECEPTION_PREFIX = "carga_recep"
+TECHNICIAN_PREFIX = "carga_tecnico"
+# Endpoints que toman locks: (etiqueta, que se disputa).
+CONTENTION_POINTS = (
+    ("reception_new_order", "folio consecutivo"),
+    ("estimate_update_items", "apartado de stock"),
+    ("change_status:READY", "descuento de stock"),
+    ("add_payment", "saldo de la orden"),
+)
+TWO_PLACES = Decimal("0.01")
+_ORDER_TOKEN = re.compile(r"/t/([0-9a-f-]{36})/")
+_ESTIMATE_TOKEN = re.compile(r"/cotizacion/([0-9a-f-]{36})/")
+_ESTIMATE_ITEM = re.compile(r'name="item-(\d+)-status"')
+_DB_TIMING = re.compile(r"db;dur=([\d.]+)")
+
+
+class FlowError(Exception):
+    """Un paso no dejo la orden como se esperaba; el flujo se abandona."""
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+@dataclass
+class Response:
+    status: int
+    url: str
+    body: bytes
+    location: str = ""
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+
+class Stats:
+    """Tiempos por endpoint, errores HTTP y flujos; compartido entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.flow_errors = {}
+        self.started = time.monotonic()
+        self.finished = None
+
+    def record(self, label, ms, status, db_ms=None, error=None):
+        with self._lock:
+            bucket = self.samples.setdefault(label, {"ms": [], "db_ms": [], "errors": 0})
+            bucket["ms"].append(ms)
+            if db_ms is not None:
+                bucket["db_ms"].append(db_ms)
+            if error:
+                bucket["errors"] += 1
+                key = f"{label}: {error}"
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def flow_error(self, stage, detail):
+        with self._lock:
+            key = f"{stage}: {detail}"
+            self.flow_errors[key] = self.flow_errors.get(key, 0) + 1
+
+    def endpoints(self):
+        rows = []
+        for label, bucket in self.samples.items():
+            timings = sorted(bucket["ms"])
+            db = sorted(bucket["db_ms"])
+            rows.append(
+                {
+                    "endpoint": label,
+                    "requests": len(timings),
+                    "errors": bucket["errors"],
+                    "error_rate": round(bucket["errors"] / len(timings), 4),
+                    "p50_ms": round(percentile(timings, 50), 1),
+                    "p95_ms": round(percentile(timings, 95), 1),
+                    "p99_ms": round(percentile(timings, 99), 1),
+                    "max_ms": round(timings[-1], 1),
+                    "db_p95_ms": round(percentile(db, 95), 1) if db else None,
+                }
+            )
+        rows.sort(key=lambda row: row["p95_ms"], reverse=True)
+        return rows
+
+
+class Session:
+    """Cliente HTTP con cookies y CSRF; no sigue redirects por su cuenta."""
+
+    def __init__(self, base_url, stats, timeout=30):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), _NoRedirect())
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == "csrftoken":
+                return cookie.value
+        return ""
+
+    def request(self, path, data=None, *, label=None, follow=True):
+        url = urljoin(self.base_url, path)
+        label = label or _url_label(url)
+        headers = {"Referer": url}
+        body = None
+        if data is not None:
+            body = urlencode(data, doseq=True).encode()
+            headers["X-CSRFToken"] = self._csrf_token()
+        started = time.perf_counter()
+        try:
+            raw = self.opener.open(Request(url, data=body, headers=headers), timeout=self.timeout)
+        except HTTPError as exc:
+            raw = exc
+        except (URLError, OSError) as exc:
+            self.stats.record(label, (time.perf_counter() - started) * 1000, None, error=type(exc).__name__)
+            raise FlowError(f"{label}: {type(exc).__name__}")
+        with raw:
+            content = raw.read()
+            elapsed = (time.perf_counter() - started) * 1000
+            status = raw.getcode()
+            timing = _DB_TIMING.search(raw.headers.get("Server-Timing", ""))
+            location = raw.headers.get("Location", "")
+        self.stats.record(
+            label,
+            elapsed,
+            status,
+            db_ms=float(timing.group(1)) if timing else None,
+            error=f"HTTP {status}" if status >= 400 else None,
+        )
+        response = Response(status, url, content, urljoin(url, location) if location else "")
+        if status >= 400:
+            raise FlowError(f"{label}: HTTP {status}")
+        if follow and response.location:
+            return self.request(response.location)
+        return response
+
+    def get(self, path, params=None, **kwargs):
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        return self.request(path, **kwargs)
+
+    def post(self, path, data, **kwargs):
+        return self.request(path, data, **kwargs)
+
+    def login(self, username, session_key):
+        """Adopta una sesion ya abierta en la base y trae el token CSRF."""
+        host = urlsplit(self.base_url).hostname
+        if "." not in host:
+            host += ".local"  # asi nombra CookieJar a "localhost" y hosts sin dominio
+        self.cookies.set_cookie(
+            Cookie(
+                0, settings.SESSION_COOKIE_NAME, session_key, None, False, host, False, False,
+                "/", True, False, None, False, None, None, {},
+            )
+        )
+        response = self.get(reverse("notifications_list"), label="login", follow=False)
+        if response.status != 200:
+            raise FlowError(f"login: {username} no pudo iniciar sesion (HTTP {response.status})")
+
+
+def _url_label(url):
+    try:
+        return resolve(urlsplit(url).path).url_name or "otro"
+    except Resolver404:
+        return "otro"
+
+
+def _money(value):
+    return value.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+
+
+@dataclass
+class Flow:
+    number: int
+    technician: str
+    pk: int = None
+    token: str = ""
+    total: Decimal = Decimal("0.00")
+    finished: bool = False
+
+
+class LoadTest:
+    def __init__(self, base_url, *, receptionists, technicians, duration, drain, think_time, hot_skus, seed):
+        self.base_url = base_url
+        self.receptionists = receptionists
+        self.technicians = technicians
+        self.duration = duration
+        self.drain = drain
+        self.think_time = think_time
+        self.hot_skus = hot_skus
+        self.seed = seed
+        self.sessions = {}
+        self.stats = Stats()
+        self.quote_queue = queue.Queue()
+        self.deliver_queue = queue.Queue()
+        self.tech_queues = {}
+        self.flows = []
+        self.completed = 0
+        self._lock = threading.Lock()
+        self._numbers = itertools.count(1)
+        self._stop_new = threading.Event()
+        self._stop = threading.Event()
+        # La duracion corre cuando todos iniciaron sesion.
+        self._logged_in = threading.Semaphore(0)
+        self._go = threading.Event()
+
+    # --- preparacion ------------------------------------------------------
+
+    def _ensure_users(self, prefix, count, role, *, staff=False):
+        """Usuarios sin contrasena; cada uno entra con una sesion abierta aqui."""
+        group, _ = Group.objects.get_or_create(name=role)
+        users = []
+        for index in range(1, count + 1):
+            user, _ = User.objects.get_or_create(username=f"{prefix}{index:02d}")
+            user.is_staff = staff
+            user.set_unusable_password()
+            user.save(update_fields=["is_staff", "password"])
+            user.groups.add(group)
+            client = Client()
+            client.force_login(user)
+            self.sessions[user.username] = client.cookies[settings.SESSION_COOKIE_NAME].value
+            users.append(user)
+        return users
+
+    def prepare(self):
+        self.reception_users = self._ensure_users(RECEPTION_PREFIX, self.receptionists, ROLE_RECEPCION)
+        # assign_tech solo acepta usuarios staff como tecnico asignado.
+        self.technician_users = self._ensure_users(TECHNICIAN_PREFIX, self.technicians, ROLE_TECNICO, staff=True)
+        self.tech_queues = {user.username: queue.Queue() for user in self.technician_users}
+        self._assign_cycle = itertools.cycle([(user.pk, user.username) for user in self.technician_users])
+        self.parts = list(
+            InventoryItem.objects.filter(qty__gt=0).order_by("-qty", "pk").values_list("sku", "name")[: self.hot_skus]
+        )
+
+    # --- usuarios virtuales ----------------------------------------------
+
+    def _pause(self, rng):
+        if self.think_time:
+            time.sleep(rng.uniform(0, 2 * self.think_time))
+
+    def _run_stage(self, stage, step, flow):
+        try:
+            step(flow)
+        except FlowError as exc:
+            self.stats.flow_error(stage, str(exc))
+            self._finish(flow, ok=False)
+        except Exception as exc:  # un hilo caido no debe parar la prueba
+            self.stats.flow_error(stage, f"{type(exc).__name__}: {exc}"[:200])
+            self._finish(flow, ok=False)
+
+    def _finish(self, flow, ok):
+        with self._lock:
+            flow.finished = True
+            if ok:
+                self.completed += 1
+            pending = any(not item.finished for item in self.flows)
+        if not pending and self._stop_new.is_set():
+            self._stop.set()
+
+    def _reception_worker(self, index):
+        rng = random.Random(self.seed * 1000 + index)
+        session = Session(self.base_url, self.stats)
+        try:
+            username = self.reception_users[index].username
+            session.login(username, self.sessions[username])
+        except FlowError as exc:
+            self.stats.flow_error("login", str(exc))
+            return
+        finally:
+            self._logged_in.release()
+        self._go.wait()
+        while not self._stop.is_set():
+            for work_queue, stage, step in (
+                (self.deliver_queue, "entrega", lambda flow: self._deliver(session, flow)),
+                (self.quote_queue, "cotizacion", lambda flow: self._quote(session, rng, flow)),
+            ):
+                try:
+                    flow = work_queue.get_nowait()
+                except queue.Empty:
+                    continue
+                self._run_stage(stage, step, flow)
+                break
+            else:
+                if self._stop_new.is_set():
+                    time.sleep(0.05)
+                    continue
+                flow = Flow(number=next(self._numbers), technician="")
+                with self._lock:
+                    self.flows.append(flow)
+                self._run_stage("alta", lambda flow: self._new_order(session, rng, flow), flow)
+            self._pause(rng)
+
+    def _technician_worker(self, index):
+        rng = random.Random(self.seed * 1000 + 500 + index)
+        user = self.technician_users[index]
+        session = Session(self.base_url, self.stats)
+        try:
+            session.login(user.username, self.sessions[user.username])
+        except FlowError as exc:
+            self.stats.flow_error("login", str(exc))
+            return
+        finally:
+            self._logged_in.release()
+        self._go.wait()
+        work_queue = self.tech_queues[user.username]
+        while not self._stop.is_set():
+            try:
+                stage, flow = work_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if stage == "revision":
+                self._run_stage(stage, lambda flow: self._review(session, flow), flow)
+            else:
+                self._run_stage(stage, lambda flow: self._repair(session, flow), flow)
+            self._pause(rng)
+
+    # --- pasos del flujo --------------------------------------------------
+
+    def _new_order(self, session, rng, flow):
+        results = json.loads(
+            session.get(reverse("reception_customer_search"), {"q": rng.choice(LAST_NAMES)}).text
+        ).get("results", [])
+        session.get(reverse("reception_new_order"))
+        data = {
+            "customer_name": f"Cliente Carga {flow.number}",
+            "customer_phone": f"614{rng.randrange(10**7):07d}",
+            "customer_email": f"carga{flow.number}@example.com",
+            "notes": "Prueba de carga",
+            "devices-TOTAL_FORMS": "1",
+            "devices-INITIAL_FORMS": "0",
+            "devices-MIN_NUM_FORMS": "1",
+            "devices-MAX_NUM_FORMS": "20",
+            "devices-0-brand": rng.choice(("HP", "Dell", "Lenovo", "Acer")),
+            "devices-0-model": "Laptop",
+            "devices-0-notes": "No enciende",
+        }
+        if results and rng.random() < 0.5:
+            data["customer_id"] = str(results[0]["id"])
+        response = session.post(reverse("reception_new_order"), data, follow=False)
+        flow.pk = _order_pk(response.location)
+        if flow.pk is None:
+            raise FlowError("reception_new_order: no se creo la orden")
+        token = _ORDER_TOKEN.search(session.get(response.location).text)
+        if not token:
+            raise FlowError("order_detail: sin liga publica")
+        flow.token = token.group(1)
+        tech_pk, flow.technician = next(self._assign_cycle)
+        session.post(reverse("assign_tech", args=[flow.pk]), {"user_id": tech_pk})
+        self.tech_queues[flow.technician].put(("revision", flow))
+
+    # Los tecnicos no tienen acceso a order_detail: trabajan desde sus
+    # notificaciones y el ticket, y no siguen el redirect del cambio de estado.
+
+    def _review(self, session, flow):
+        session.get(reverse("notifications_list"))
+        session.get(reverse("order_ticket", args=[flow.pk]))
+        self._change_status(session, flow, ServiceOrder.Status.IN_REVIEW, follow=False)
+        self.quote_queue.put(flow)
+
+    def _quote(self, session, rng, flow):
+        session.get(reverse("estimate_edit", args=[flow.pk]))
+        rows = [("Mano de obra diagnostico", 1, Decimal("350.00"), "")]
+        if self.parts:
+            sku, name = rng.choice(self.parts)
+            rows.append((name, 1, Decimal("900.00"), sku))
+        session.post(
+            reverse("estimate_edit", args=[flow.pk]),
+            {
+                "description": [row[0] for row in rows],
+                "qty": [str(row[1]) for row in rows],
+                "unit_price": [str(row[2]) for row in rows],
+                "inventory_sku": [row[3] for row in rows],
+                "item_device": ["" for _ in rows],
+                "note": "",
+            },
+        )
+        subtotal = _money(sum((row[2] * row[1] for row in rows), Decimal("0.00")))
+        flow.total = subtotal + _money(subtotal * IVA_RATE)
+        session.post(reverse("estimate_send", args=[flow.pk]), {})
+        token = _ESTIMATE_TOKEN.search(session.get(reverse("order_detail", args=[flow.pk])).text)
+        if not token:
+            raise FlowError("order_detail: sin liga de cotizacion")
+
+        customer = Session(self.base_url, self.stats)
+        public_path = reverse("estimate_public", args=[token.group(1)])
+        item_ids = _ESTIMATE_ITEM.findall(customer.get(public_path).text)
+        if not item_ids:
+            raise FlowError("estimate_public: sin partidas por decidir")
+        customer.post(
+            reverse("estimate_update_items", args=[token.group(1)]),
+            {f"item-{item_id}-status": "ACC" for item_id in item_ids},
+        )
+        self.tech_queues[flow.technician].put(("reparacion", flow))
+
+    def _repair(self, session, flow):
+        session.get(reverse("order_ticket", args=[flow.pk]))
+        self._change_status(session, flow, ServiceOrder.Status.READY_PICKUP, follow=False)
+        self.deliver_queue.put(flow)
+
+    def _deliver(self, session, flow):
+        session.get(reverse("order_detail", args=[flow.pk]))
+        session.post(
+            reverse("add_payment", args=[flow.pk]),
+            {"amount": str(flow.total), "method": "Efectivo", "idempotency_key": f"carga-{flow.pk}"},
+        )
+        self._change_status(session, flow, ServiceOrder.Status.DELIVERED)
+        session.get(reverse("receipt_pdf", args=[flow.token]))
+        self._finish(flow, ok=True)
+
+    def _change_status(self, session, flow, target, follow=True):
+        session.post(
+            reverse("change_status", args=[flow.pk]),
+            {"target": target},
+            label=f"change_status:{target}",
+            follow=follow,
+        )
+
+    # --- ejecucion --------------------------------------------------------
+
+    def run(self, log=None):
+        log = log or (lambda message: None)
+        self.prepare()
+        threads = [
+            threading.Thread(target=self._reception_worker, args=(index,), name=f"recepcion-{index}", daemon=True)
+            for index in range(self.receptionists)
+        ] + [
+            threading.Thread(target=self._technician_worker, args=(index,), name=f"tecnico-{index}", daemon=True)
+            for index in range(self.technicians)
+        ]
+        for thread in threads:
+            thread.start()
+        for _ in threads:
+            self._logged_in.acquire()
+        self.stats.started = time.monotonic()
+        self._go.set()
+        log(f"{self.receptionists} recepcionistas y {self.technicians} tecnicos durante {self.duration}s...")
+        self._stop.wait(self.duration)
+        self._stop_new.set()
+        with self._lock:
+            if all(flow.finished for flow in self.flows):
+                self._stop.set()
+        if not self._stop.wait(self.drain):
+            log(f"Flujos sin terminar despues de {self.drain}s de espera; se cortan.")
+        self._stop.set()
+        for thread in threads:
+            thread.join(timeout=self.drain + 30)
+        self.stats.finished = time.monotonic()
+        return self.report()
+
+    def _verify(self):
+        """Estado final en la base de las ordenes creadas (sin depender de mensajes)."""
+        pks = [flow.pk for flow in self.flows if flow.pk]
+        final = {}
+        for status in ServiceOrder.objects.filter(pk__in=pks).values_list("status", flat=True):
+            final[status] = final.get(status, 0) + 1
+        return final
+
+    def report(self):
+        elapsed = (self.stats.finished or time.monotonic()) - self.stats.started
+        endpoints = self.stats.endpoints()
+        total = sum(row["requests"] for row in endpoints)
+        errors = sum(row["errors"] for row in endpoints)
+        by_label = {row["endpoint"]: row for row in endpoints}
+        return {
+            "base_url": self.base_url,
+            "receptionists": self.receptionists,
+            "technicians": self.technicians,
+            "seconds": round(elapsed, 1),
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0,
+            "flows": {
+                "started": len(self.flows),
+                "completed": self.completed,
+                "orders_by_status": self._verify(),
+                "errors": dict(sorted(self.stats.flow_errors.items(), key=lambda item: -item[1])),
+            },
+            "endpoints": endpoints,
+            "contention": [
+                {"what": what, **by_label[label]} for label, what in CONTENTION_POINTS if label in by_label
+            ],
+            "http_errors": dict(sorted(self.stats.errors.items(), key=lambda item: -item[1])),
+        }
+
+
+def _order_pk(location):
+    if not location:
+        return None
+    try:
+        match = resolve(urlsplit(location).path)
+    except Resolver404:
+        return None
+    return match.kwargs.get("pk") if match.url_name == "order_detail" else None
@@ -0,0 +1,56 @@
+from pathlib import PurePosixPath
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.media import file_sha256
+from core.models import Attachment
+from core.uploads import attachment_metadata
+
+FIELDS = ["original_name", "size", "content_type", "sha256", "is_image"]
+
+
+class Command(BaseCommand):
+    help = "Completa tamano, tipo, SHA-256 y bandera de imagen de los adjuntos que no los tienen."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Filas por actualizacion (default: 500).")
+        parser.add_argument("--dry-run", action="store_true", help="Solo cuenta, no guarda cambios.")
+
+    def handle(self, *args, **options):
+        pending = (
+            Attachment.objects.exclude(file="")
+            .filter(Q(size__isnull=True) | Q(sha256="") | Q(content_type=""))
+            .only("pk", "file", "original_name", "size", "content_type", "sha256", "is_image")
+        )
+        total = pending.count()
+        if options["dry_run"]:
+            self.stdout.write(f"[dry-run] Adjuntos sin metadatos: {total}.")
+            return
+
+        batch, updated, missing = [], 0, 0
+        for attachment in pending.iterator(chunk_size=options["batch_size"]):
+            storage = attachment.file.storage
+            name = attachment.file.name
+            try:
+                size = storage.size(name)
+                digest = file_sha256(attachment.file)
+            except OSError:
+                missing += 1
+                self.stderr.write(f"Falta el archivo {name} (adjunto {attachment.pk}).")
+                continue
+            if not attachment.original_name:
+                attachment.original_name = PurePosixPath(name).name[:255]
+            for field, value in attachment_metadata(attachment.original_name, name, size).items():
+                setattr(attachment, field, value)
+            attachment.sha256 = digest
+            batch.append(attachment)
+            if len(batch) >= options["batch_size"]:
+                updated += Attachment.objects.bulk_update(batch, FIELDS)
+                batch = []
+        if batch:
+            updated += Attachment.objects.bulk_update(batch, FIELDS)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Adjuntos actualizados: {updated} de {total}; archivos faltantes: {missing}.")
+        )
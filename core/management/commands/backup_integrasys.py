@@ -1,42 +1,49 @@
-# core/management/commands/backup_integrasys.py
-from django.core.management.base import BaseCommand
-from django.core.management import call_command
-from django.conf import settings
-from pathlib import Path
-import tarfile
-import datetime
+from django.core.management.base import BaseCommand, CommandError
+
+from core.backups import BackupError, backup_jobs, backup_root, default_retention, prune_snapshots, run_backup
+
+
+def _mb(value):
+    return f"{value / (1024 * 1024):.1f} MB"
+
 
 class Command(BaseCommand):
-    help = "Genera un dump JSON de la BD y comprime la carpeta media/"
+    help = (
+        "Respaldo incremental: base de datos (pg_dump o API de respaldo de SQLite) y media "
+        "deduplicada por SHA-256 en BACKUP_ROOT; despues aplica la retencion."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dest", help="Carpeta de respaldos (default: BACKUP_ROOT).")
+        parser.add_argument("--jobs", type=int, help="Hilos/trabajos en paralelo (default: BACKUP_JOBS o CPUs).")
+        parser.add_argument("--no-media", action="store_true", help="Solo respalda la base de datos.")
+        parser.add_argument("--no-prune", action="store_true", help="No borra respaldos viejos.")
+        parser.add_argument("--keep-daily", type=int, help="Respaldos diarios a conservar.")
+        parser.add_argument("--keep-weekly", type=int, help="Respaldos semanales a conservar.")
+        parser.add_argument("--keep-monthly", type=int, help="Respaldos mensuales a conservar.")
 
     def handle(self, *args, **options):
-        # Carpeta /backups en la raíz del proyecto
-        base_dir = Path(settings.BASE_DIR)  # raíz del proyecto (donde está manage.py)
-        backups_dir = base_dir / "backups"
-        backups_dir.mkdir(exist_ok=True)
-
-        ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        # 1) Dump JSON de la base de datos
-        json_path = backups_dir / f"backup_{ts}.json"
-        self.stdout.write(f"Generando dump: {json_path.name}")
-        with open(json_path, "w", encoding="utf-8") as f:
-            call_command(
-                "dumpdata",
-                "--natural-foreign",
-                "--natural-primary",
-                "--indent", "2",
-                stdout=f,
-            )
+        root = options["dest"] or backup_root()
+        jobs = options["jobs"] or backup_jobs()
+        try:
+            manifest = run_backup(root=root, media=not options["no_media"], jobs=jobs)
+        except BackupError as exc:
+            raise CommandError(str(exc))
+        stats = manifest["stats"]
+        self.stdout.write(
+            f"Respaldo {manifest['name']}: base {manifest['database']['format']}, "
+            f"{stats['files']} archivos de media ({_mb(stats['media_bytes'])}); "
+            f"nuevos: {stats['new_objects']} ({_mb(stats['new_bytes'])})."
+        )
 
-        # 2) Comprimir /media si existe
-        media_root = Path(settings.MEDIA_ROOT)
-        if media_root.exists():
-            tar_path = backups_dir / f"media_{ts}.tar.gz"
-            self.stdout.write(f"Comprimiendo media/: {tar_path.name}")
-            with tarfile.open(tar_path, "w:gz") as tar:
-                tar.add(media_root, arcname="media")
-        else:
-            self.stdout.write("MEDIA_ROOT no existe; se omite compresión de media/.")
-
-        self.stdout.write(self.style.SUCCESS("Backup completado en /backups"))
+        if not options["no_prune"]:
+            retention = default_retention()
+            for key in ("daily", "weekly", "monthly"):
+                if options[f"keep_{key}"] is not None:
+                    retention[key] = options[f"keep_{key}"]
+            result = prune_snapshots(root=root, **retention)
+            self.stdout.write(
+                f"Retencion {retention['daily']}/{retention['weekly']}/{retention['monthly']}: "
+                f"{len(result['removed'])} respaldos borrados, {_mb(result['freed_bytes'])} liberados."
+            )
+        self.stdout.write(self.style.SUCCESS(f"Backup completado en {root}"))
@@ -0,0 +1,63 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import BenchmarkError, compare, run
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide latencia (p50/p95/p99), consultas y pico de memoria de las vistas principales sobre los datos "
+        "de generate_load_data y compara contra una linea base JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20, help="Requests medidos por escenario (default: 20).")
+        parser.add_argument("--warmup", type=int, default=3, help="Requests de calentamiento sin medir (default: 3).")
+        parser.add_argument("--only", help="Escenarios separados por coma (default: todos).")
+        parser.add_argument("--output", help="Archivo JSON donde guardar el resultado.")
+        parser.add_argument("--baseline", help="Resultado JSON anterior contra el cual comparar.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2, help="Aumento permitido en tiempo y memoria (default: 0.2 = 20%%)."
+        )
+        parser.add_argument(
+            "--fail-on-regression", action="store_true", help="Termina con error si hay regresiones contra la base."
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations debe ser al menos 1.")
+        baseline = None
+        if options["baseline"]:
+            try:
+                with open(options["baseline"], encoding="utf-8") as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"No se pudo leer la linea base: {exc}")
+        only = [name.strip() for name in options["only"].split(",") if name.strip()] if options["only"] else None
+
+        try:
+            results = run(
+                iterations=options["iterations"], warmup=options["warmup"], only=only, log=self.stdout.write
+            )
+        except BenchmarkError as exc:
+            raise CommandError(str(exc))
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                json.dump(results, handle, indent=1, sort_keys=True)
+            self.stdout.write(f"Resultado guardado en {options['output']}.")
+        else:
+            self.stdout.write(json.dumps(results, indent=1, sort_keys=True))
+
+        if baseline is None:
+            return
+        if baseline.get("dataset") != results["dataset"]:
+            self.stdout.write(self.style.WARNING(f"La linea base uso otro set de datos: {baseline.get('dataset')}."))
+        regressions = compare(results, baseline, tolerance=options["tolerance"])
+        for scenario, metric, before, after in regressions:
+            self.stdout.write(self.style.ERROR(f"Regresion en {scenario} {metric}: {before} -> {after}"))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("Sin regresiones contra la linea base."))
+        elif options["fail_on_regression"]:
+            raise CommandError(f"{len(regressions)} regresiones contra la linea base.")
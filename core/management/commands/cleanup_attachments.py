@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.storage import REUSE_GRACE_SECONDS, sweep_orphan_blobs
+from core.uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Cancela subidas por partes abandonadas (y borra sus .part) y borra blobs de adjuntos, con sus "
+        "miniaturas, que ya no usa ninguna fila."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace-minutes",
+            type=int,
+            default=REUSE_GRACE_SECONDS // 60,
+            help=f"No borra blobs reutilizados hace menos de esto (default: {REUSE_GRACE_SECONDS // 60}).",
+        )
+        parser.add_argument(
+            "--upload-hours",
+            type=int,
+            default=settings.CHUNKED_UPLOAD_EXPIRE_HOURS,
+            help=f"Horas sin actividad para cancelar una subida (default: {settings.CHUNKED_UPLOAD_EXPIRE_HOURS}).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Solo reporta, no borra.")
+
+    def handle(self, *args, **options):
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        sessions, files = expire_uploads(hours=options["upload_hours"], dry_run=options["dry_run"])
+        for name in files:
+            self.stdout.write(f"  uploads/{name}")
+        self.stdout.write(
+            self.style.SUCCESS(f"{prefix}Subidas canceladas: {len(sessions)}; archivos temporales borrados: {len(files)}.")
+        )
+
+        orphans = sweep_orphan_blobs(grace=options["grace_minutes"] * 60, dry_run=options["dry_run"])
+        for name in orphans:
+            self.stdout.write(f"  {name}")
+        self.stdout.write(self.style.SUCCESS(f"{prefix}Blobs sin referencias borrados: {len(orphans)}."))
@@ -0,0 +1,50 @@
+from pathlib import PurePosixPath
+
+from django.core.management.base import BaseCommand
+
+from core.models import Attachment
+from core.storage import digest_from_name, release_attachment_file
+from core.thumbnails import delete_thumbnails_for_name
+
+
+class Command(BaseCommand):
+    help = "Mueve adjuntos legados al almacenamiento por SHA-256 y borra las copias repetidas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Solo reporta, no mueve archivos.")
+
+    def handle(self, *args, **options):
+        storage = Attachment._meta.get_field("file").storage
+        moved = missing = 0
+        blobs = set()
+        legacy = {}
+        for pk, name in Attachment.objects.exclude(file="").values_list("pk", "file").iterator():
+            if not digest_from_name(name):
+                legacy.setdefault(name, []).append(pk)
+
+        for name, pks in legacy.items():
+            if not storage.exists(name):
+                missing += 1
+                self.stderr.write(f"Falta el archivo {name} (adjuntos {pks}).")
+                continue
+            if options["dry_run"]:
+                moved += len(pks)
+                continue
+            with storage.open(name, "rb") as handle:
+                blob = storage.save(name, handle)
+            Attachment.objects.filter(pk__in=pks, original_name="").update(
+                original_name=PurePosixPath(name).name[:255]
+            )
+            Attachment.objects.filter(pk__in=pks).update(file=blob, sha256=digest_from_name(blob))
+            delete_thumbnails_for_name(storage, name)
+            release_attachment_file(name, storage)
+            blobs.add(blob)
+            moved += len(pks)
+
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}Adjuntos migrados: {moved} ({len(legacy)} archivos legados -> "
+                f"{len(blobs)} blobs); archivos faltantes: {missing}."
+            )
+        )
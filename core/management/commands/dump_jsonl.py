@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.jsonl import DEFAULT_BATCH_SIZE, dump_jsonl
+
+
+class Command(BaseCommand):
+    help = "Vuelca core, usuarios y grupos a JSONL por modelo (streaming, para load_jsonl)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Carpeta destino.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Filas por lectura.")
+        parser.add_argument("--database", default="default", help="Alias de base de datos.")
+
+    def handle(self, *args, **options):
+        manifest = dump_jsonl(options["directory"], batch_size=options["batch_size"], using=options["database"])
+        total = 0
+        for entry in manifest["models"]:
+            total += entry["rows"]
+            self.stdout.write(f"{entry['model']}: {entry['rows']}")
+        self.stdout.write(self.style.SUCCESS(f"Volcadas {total} filas en {options['directory']}"))
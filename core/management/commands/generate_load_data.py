@@ -0,0 +1,99 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ServiceOrder
+from core.synthetic import DEFAULTS, generate, parse_weights
+
+
+def _status_key(value):
+    if value not in ServiceOrder.Status.values:
+        raise ValueError(f"Estado desconocido: {value} (usa {', '.join(ServiceOrder.Status.values)}).")
+    return value
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sinteticos a escala de produccion (clientes, equipos, ordenes, cotizaciones, pagos, "
+        "inventario) para pruebas de carga. Misma semilla y --until = mismos datos."
+    )
+
+    def add_arguments(self, parser):
+        counts = parser.add_argument_group("volumen")
+        counts.add_argument("--customers", type=int, help=f"Clientes (default: {DEFAULTS['customers']}).")
+        counts.add_argument("--orders", type=int, help=f"Ordenes de servicio (default: {DEFAULTS['orders']}).")
+        counts.add_argument(
+            "--inventory-items", type=int, help=f"SKUs de inventario (default: {DEFAULTS['inventory_items']})."
+        )
+        counts.add_argument(
+            "--movements-per-item",
+            type=int,
+            help=f"Promedio de movimientos por SKU (default: {DEFAULTS['movements_per_item']}).",
+        )
+        counts.add_argument("--technicians", type=int, help=f"Usuarios tecnico (default: {DEFAULTS['technicians']}).")
+        counts.add_argument("--days", type=int, help=f"Dias de historia (default: {DEFAULTS['days']}).")
+
+        shape = parser.add_argument_group("distribucion")
+        shape.add_argument(
+            "--status-weights",
+            help="Pesos del estado final de ordenes recientes, p. ej. NEW=8,REV=12,DONE=45,CANC=10.",
+        )
+        shape.add_argument("--device-weights", help="Equipos por cliente, p. ej. 1=70,2=20,3=10.")
+        shape.add_argument("--order-device-weights", help="Equipos por orden, p. ej. 1=85,2=12,3=3.")
+        shape.add_argument("--estimate-ratio", type=float, help="Fraccion de ordenes con cotizacion.")
+        shape.add_argument("--accept-ratio", type=float, help="Fraccion de partidas aceptadas.")
+        shape.add_argument("--payment-ratio", type=float, help="Fraccion de ordenes cobrables con pago.")
+        shape.add_argument("--customer-skew", type=float, help="Concentracion de ordenes en pocos clientes (1 = uniforme).")
+
+        parser.add_argument("--seed", type=int, default=1, help="Semilla (default: 1).")
+        parser.add_argument("--until", help="Fecha final AAAA-MM-DD (default: hoy). Fijala para repetir los datos.")
+        parser.add_argument("--batch-size", type=int, help=f"Filas por insercion (default: {DEFAULTS['batch_size']}).")
+        parser.add_argument(
+            "--yes",
+            "--force",
+            action="store_true",
+            dest="force",
+            help="Corre aunque DEBUG este apagado (la base debe ser desechable).",
+        )
+
+    def handle(self, *args, **options):
+        if not (settings.DEBUG or options["force"]):
+            raise CommandError(
+                "DEBUG esta apagado: esto agrega miles de filas falsas a la base. Usa --yes si es desechable."
+            )
+        overrides = {
+            name: options[name]
+            for name in (
+                "customers",
+                "orders",
+                "inventory_items",
+                "movements_per_item",
+                "technicians",
+                "days",
+                "estimate_ratio",
+                "accept_ratio",
+                "payment_ratio",
+                "customer_skew",
+                "batch_size",
+            )
+        }
+        try:
+            if options["status_weights"]:
+                overrides["status_weights"] = parse_weights(options["status_weights"], _status_key)
+            if options["device_weights"]:
+                overrides["device_weights"] = parse_weights(options["device_weights"], int)
+            if options["order_device_weights"]:
+                overrides["order_device_weights"] = parse_weights(options["order_device_weights"], int)
+            until = date.fromisoformat(options["until"]) if options["until"] else None
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        for name, value in overrides.items():
+            if isinstance(value, (int, float)) and value < 0:
+                raise CommandError(f"--{name.replace('_', '-')} no puede ser negativo.")
+
+        counts = generate(seed=options["seed"], until=until, log=self.stdout.write, **overrides)
+        seconds = counts.pop("seconds")
+        for model, rows in counts.items():
+            self.stdout.write(f"{model}: {rows}")
+        self.stdout.write(self.style.SUCCESS(f"Generadas {sum(counts.values())} filas en {seconds}s."))
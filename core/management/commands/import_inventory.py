@@ -0,0 +1,72 @@
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.inventory_import import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_REASON,
+    IMPORT_MODES,
+    MODE_DELTA,
+    import_inventory_csv,
+)
+
+
+class Command(BaseCommand):
+    help = "Importa/actualiza inventario desde un CSV (sku, name, qty, min_qty, location)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path", help="Ruta del archivo CSV.")
+        parser.add_argument(
+            "--mode",
+            choices=[value for value, _ in IMPORT_MODES],
+            default=MODE_DELTA,
+            help="delta suma/resta a la existencia; absolute la reemplaza.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Solo muestra el diff, no escribe.")
+        parser.add_argument("--reason", default=DEFAULT_REASON, help="Motivo para los movimientos.")
+        parser.add_argument("--author", default="", help="Usuario que se registra como autor.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = Path(options["csv_path"])
+        if not path.exists():
+            raise CommandError(f"No existe el archivo {path}.")
+
+        author = None
+        if options["author"]:
+            author = get_user_model().objects.filter(username=options["author"]).first()
+            if author is None:
+                raise CommandError(f"Usuario {options['author']} no existe.")
+
+        with path.open("r", encoding="utf-8-sig", newline="") as fh:
+            result = import_inventory_csv(
+                fh,
+                mode=options["mode"],
+                author=author,
+                dry_run=options["dry_run"],
+                reason=options["reason"],
+                batch_size=max(options["batch_size"], 1),
+            )
+
+        if result["errors"]:
+            for error in result["errors"]:
+                self.stderr.write(error)
+            raise CommandError(f"{len(result['errors'])} error(es); no se aplico ningun cambio.")
+
+        for change in result["changes"]:
+            if change["action"] == "unchanged":
+                continue
+            self.stdout.write(
+                f"{change['action']:<7} {change['sku']:<20} {change['qty_before']:>6} -> "
+                f"{change['qty_after']:<6} ({change['delta']:+d})"
+            )
+        summary = result["summary"]
+        line = (
+            f"{summary['create']} nuevos, {summary['update']} actualizados, "
+            f"{summary['unchanged']} sin cambios, {summary['movements']} movimientos."
+        )
+        if result["applied"]:
+            self.stdout.write(self.style.SUCCESS(f"Importacion aplicada: {line}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"Dry-run: {line}"))
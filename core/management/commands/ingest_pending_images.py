@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.image_ingest import ingest_enabled, pending_attachments, retry_pending
+
+
+class Command(BaseCommand):
+    help = "Reintenta la recompresion de fotos adjuntas que quedaron sin procesar (original_size nulo)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--minutes",
+            type=int,
+            default=10,
+            help="Solo fotos subidas hace mas de estos minutos, para no competir con la cola (default: 10).",
+        )
+        parser.add_argument("--limit", type=int, default=None, help="Maximo de adjuntos por corrida.")
+        parser.add_argument("--dry-run", action="store_true", help="Solo cuenta, no procesa.")
+
+    def handle(self, *args, **options):
+        if not ingest_enabled():
+            raise CommandError("ATTACHMENT_IMAGE_INGEST esta desactivado.")
+        older_than = timedelta(minutes=options["minutes"])
+        if options["dry_run"]:
+            total = pending_attachments(older_than=older_than).count()
+            self.stdout.write(f"[dry-run] Fotos sin procesar: {total}.")
+            return
+
+        done, failed = retry_pending(older_than=older_than, limit=options["limit"])
+        for attachment_id in failed:
+            self.stderr.write(f"Fallo el adjunto {attachment_id}.")
+        self.stdout.write(self.style.SUCCESS(f"Fotos procesadas: {len(done)}; fallidas: {len(failed)}."))
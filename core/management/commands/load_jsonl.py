@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.jsonl import DEFAULT_BATCH_SIZE, JsonlError, load_jsonl
+
+
+class Command(BaseCommand):
+    help = "Carga un volcado de dump_jsonl en una base vacia con bulk_create por lotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", help="Carpeta generada por dump_jsonl.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Filas por insercion.")
+        parser.add_argument("--database", default="default", help="Alias de base de datos.")
+
+    def handle(self, *args, **options):
+        try:
+            counts = load_jsonl(options["directory"], batch_size=options["batch_size"], using=options["database"])
+        except JsonlError as exc:
+            raise CommandError(str(exc))
+        for model, rows in counts.items():
+            self.stdout.write(f"{model}: {rows}")
+        self.stdout.write(self.style.SUCCESS(f"Cargadas {sum(counts.values())} filas."))
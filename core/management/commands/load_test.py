@@ -0,0 +1,95 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.loadtest import LoadTest
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga del flujo de recepcion (alta, asignacion, cotizacion, aprobacion publica, estados, pago "
+        "y recibo) con usuarios virtuales concurrentes contra un servidor vivo. Crea ordenes reales: usar solo "
+        "en una base de pruebas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Servidor a probar.")
+        parser.add_argument("--receptionists", type=int, default=3, help="Recepcionistas virtuales (default: 3).")
+        parser.add_argument("--technicians", type=int, default=6, help="Tecnicos virtuales (default: 6).")
+        parser.add_argument("--duration", type=float, default=60, help="Segundos dando de alta ordenes (default: 60).")
+        parser.add_argument(
+            "--drain", type=float, default=60, help="Segundos extra para terminar los flujos en curso (default: 60)."
+        )
+        parser.add_argument(
+            "--think-time", type=float, default=0.5, help="Pausa promedio entre acciones, en segundos (default: 0.5)."
+        )
+        parser.add_argument(
+            "--hot-skus", type=int, default=5, help="SKUs entre los que se reparten las refacciones (default: 5)."
+        )
+        parser.add_argument("--seed", type=int, default=1, help="Semilla de las decisiones de cada usuario.")
+        parser.add_argument("--top", type=int, default=10, help="Endpoints mas lentos a mostrar (default: 10).")
+        parser.add_argument("--output", help="Archivo JSON donde guardar el reporte completo.")
+        parser.add_argument(
+            "--yes",
+            "--force",
+            action="store_true",
+            dest="force",
+            help="Corre aunque DEBUG este apagado (la base debe ser desechable).",
+        )
+
+    def handle(self, *args, **options):
+        if not (settings.DEBUG or options["force"]):
+            raise CommandError(
+                "DEBUG esta apagado: esto crea usuarios y ordenes reales en la base. Usa --yes si es desechable."
+            )
+        if options["receptionists"] < 1 or options["technicians"] < 1:
+            raise CommandError("Se necesita al menos una recepcionista y un tecnico.")
+        load_test = LoadTest(
+            options["base_url"],
+            receptionists=options["receptionists"],
+            technicians=options["technicians"],
+            duration=options["duration"],
+            drain=options["drain"],
+            think_time=options["think_time"],
+            hot_skus=options["hot_skus"],
+            seed=options["seed"],
+        )
+        report = load_test.run(log=self.stdout.write)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                json.dump(report, handle, ensure_ascii=False, indent=1)
+        self._print(report, options["top"])
+        if not report["requests"]:
+            raise CommandError(f"Ningun request llego a {options['base_url']}.")
+
+    def _print(self, report, top):
+        flows = report["flows"]
+        self.stdout.write(
+            f"{report['requests']} requests en {report['seconds']}s = {report['throughput_rps']} req/s; "
+            f"errores HTTP {report['errors']} ({report['error_rate']:.1%})"
+        )
+        self.stdout.write(
+            f"Flujos: {flows['completed']} completos de {flows['started']}; "
+            f"estado final en la base: {flows['orders_by_status']}"
+        )
+        for error, count in flows["errors"].items():
+            self.stdout.write(self.style.WARNING(f"  {count} x {error}"))
+
+        self.stdout.write("\nEndpoints mas lentos (p95):")
+        self.stdout.write(f"{'endpoint':32} {'n':>6} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'db p95':>8}")
+        for row in report["endpoints"][:top]:
+            self._row(row["endpoint"], row)
+
+        self.stdout.write("\nContencion (folio y stock):")
+        for row in report["contention"]:
+            self._row(f"{row['endpoint']} ({row['what']})", row)
+        for error, count in report["http_errors"].items():
+            self.stdout.write(self.style.ERROR(f"  {count} x {error}"))
+
+    def _row(self, name, row):
+        db = f"{row['db_p95_ms']:.0f}" if row["db_p95_ms"] is not None else "-"
+        self.stdout.write(
+            f"{name[:32]:32} {row['requests']:>6} {row['error_rate']:>6.1%} {row['p50_ms']:>8.0f} "
+            f"{row['p95_ms']:>8.0f} {row['p99_ms']:>8.0f} {row['max_ms']:>8.0f} {db:>8}"
+        )
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.backups import BackupError
+from core.restore import run_restore
+
+
+class Command(BaseCommand):
+    help = (
+        "Restaura un respaldo de backup_integrasys en una base y carpeta de prueba, "
+        "verifica filas, checksums por tabla y hashes de media, y reporta los tiempos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("snapshot", nargs="?", default="latest", help="Nombre del respaldo (default: el ultimo).")
+        parser.add_argument("--root", help="Carpeta de respaldos (default: BACKUP_ROOT).")
+        parser.add_argument(
+            "--db-target",
+            help="Ruta SQLite o nombre de base PostgreSQL de prueba (default: <BACKUP_ROOT>/restore/<respaldo>/ o <NAME>_restore).",
+        )
+        parser.add_argument("--media-dest", help="Carpeta donde restaurar media (default: junto a la base de prueba).")
+        parser.add_argument("--no-media", action="store_true", help="Solo restaura y verifica la base de datos.")
+        parser.add_argument("--jobs", type=int, help="Trabajos en paralelo (default: BACKUP_JOBS o CPUs).")
+
+    def handle(self, *args, **options):
+        try:
+            report = run_restore(
+                options["snapshot"],
+                root=options["root"],
+                db_target=options["db_target"],
+                media_dest=options["media_dest"],
+                media=not options["no_media"],
+                jobs=options["jobs"],
+            )
+        except BackupError as exc:
+            raise CommandError(str(exc))
+
+        timings = report["timings"]
+        self.stdout.write(f"Respaldo {report['name']} -> base {report['database']}")
+        self.stdout.write(f"  Base restaurada en {timings['database']:.1f}s; {report['tables']} tablas verificadas en {timings['verify']:.1f}s.")
+        if "media" in timings:
+            self.stdout.write(f"  Media: {report['files']} archivos en {report['media']} ({timings['media']:.1f}s).")
+        for problem in report["problems"]:
+            self.stderr.write(f"  {problem}")
+        if report["problems"]:
+            raise CommandError(f"Verificacion fallida: {len(report['problems'])} problemas ({timings['total']:.1f}s).")
+        self.stdout.write(self.style.SUCCESS(f"Restauracion verificada en {timings['total']:.1f}s."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from core.slowqueries import iter_entries, log_dir, summarize
+
+
+class Command(BaseCommand):
+    help = "Resume el registro de consultas lentas (SLOW_QUERY_DIR) agrupando por huella de SQL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help="Dias hacia atras a considerar (default: 7; 0 = todos).")
+        parser.add_argument("--top", type=int, default=10, help="Cuantas consultas mostrar (default: 10).")
+        parser.add_argument(
+            "--sort", choices=("total", "count", "max"), default="total", help="Orden: tiempo total, veces o maximo."
+        )
+        parser.add_argument("--explain", action="store_true", help="Incluye el ultimo plan de cada consulta.")
+
+    def handle(self, *args, **options):
+        groups = summarize(iter_entries(days=options["days"] or None), sort=options["sort"])
+        if not groups:
+            self.stdout.write(f"Sin consultas lentas registradas en {log_dir()}.")
+            return
+        for rank, group in enumerate(groups[: options["top"]], start=1):
+            average = group["total_ms"] / group["count"]
+            self.stdout.write(
+                f"{rank}. [{group['fingerprint']}] {group['count']} veces, "
+                f"total {group['total_ms'] / 1000:.2f}s, prom {average:.0f}ms, max {group['max_ms']:.0f}ms"
+            )
+            self.stdout.write(f"   {group['sql'][:400]}")
+            if group["views"]:
+                self.stdout.write(f"   Vistas: {', '.join(sorted(group['views']))}")
+            for caller in sorted(group["callers"])[:3]:
+                self.stdout.write(f"   Desde: {caller}")
+            if options["explain"] and group.get("explain"):
+                for line in group["explain"]:
+                    self.stdout.write(f"     {line}")
+        self.stdout.write(self.style.SUCCESS(f"{len(groups)} consultas distintas en total."))
@@ -0,0 +1,95 @@
+"""Entrega de archivos de ``MEDIA_ROOT`` detras de autenticacion.
+
+La vista valida permisos y luego delega los bytes a Nginx con
+``X-Accel-Redirect`` (``MEDIA_ACCEL_REDIRECT``); en desarrollo se usa
+``FileResponse``. El ETag es el SHA-256 del contenido; si la URL trae la
+version correcta (``?v=``) la respuesta se puede cachear como inmutable.
+"""
+import hashlib
+import mimetypes
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import content_disposition_header
+
+from core.storage import digest_from_name
+
+HASH_CHUNK_SIZE = 1024 * 1024
+VERSION_LENGTH = 16
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def file_sha256(file_field):
+    """SHA-256 del archivo; se guarda en cache por nombre, tamano y mtime.
+
+    Los blobs direccionados por contenido ya traen el hash en el nombre.
+    """
+    name = file_field.name
+    digest = digest_from_name(name)
+    if digest:
+        return digest
+    storage = file_field.storage
+    try:
+        stamp = f"{storage.size(name)}:{storage.get_modified_time(name).timestamp()}"
+    except (OSError, NotImplementedError):
+        stamp = ""
+    key = f"media:sha256:{hashlib.md5(f'{name}:{stamp}'.encode()).hexdigest()}"
+    digest = cache.get(key) if stamp else None
+    if digest is None:
+        hasher = hashlib.sha256()
+        with storage.open(name, "rb") as handle:
+            for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+        if stamp:
+            cache.set(key, digest, None)
+    return digest
+
+
+def file_version(file_field):
+    """Fragmento del hash para versionar URLs (``?v=``)."""
+    return file_sha256(file_field)[:VERSION_LENGTH]
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get("If-None-Match", "")
+    if not header:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def serve_media_file(request, file_field, *, filename=None, as_attachment=False, version=None):
+    """Respuesta para ``file_field`` (ya autorizado) con ETag y Cache-Control.
+
+    ``version`` es el valor esperado en ``?v=``; por defecto el del propio
+    archivo (las miniaturas usan la version del original).
+    """
+    digest = file_sha256(file_field)
+    etag = f'"{digest}"'
+    if request.GET.get("v") == (version or digest[:VERSION_LENGTH]):
+        cache_control = f"private, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        cache_control = "private, no-cache"
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    elif getattr(settings, "MEDIA_ACCEL_REDIRECT", False):
+        prefix = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/")
+        content_type = mimetypes.guess_type(filename or file_field.name)[0] or "application/octet-stream"
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + quote(file_field.name)
+        disposition = content_disposition_header(as_attachment, filename or "")
+        if disposition:
+            response["Content-Disposition"] = disposition
+    else:
+        response = FileResponse(
+            file_field.storage.open(file_field.name, "rb"),
+            as_attachment=as_attachment,
+            filename=filename or "",
+        )
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,152 @@
+"""Metricas en formato Prometheus en ``/metrics``.
+
+Los histogramas (latencia y consultas por vista desde ``core.perf``, tiempo
+de render de los PDF de recibos) y el contador de violaciones de
+``core.querybudget`` se comparten entre workers de Gunicorn con el modo
+multiproceso de ``prometheus_client``: basta definir
+``PROMETHEUS_MULTIPROC_DIR`` (ver ``deploy/gunicorn.conf.py``). Sin esa
+variable cada proceso reporta lo suyo, suficiente para ``runserver``.
+
+Los indicadores del negocio (ordenes por estado, notificaciones sin leer,
+SKUs con stock bajo, correos fallidos) se calculan al momento del scrape
+con consultas agregadas que se guardan en cache ``METRICS_CACHE_SECONDS``.
+"""
+import hmac
+import os
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+METRICS_PATH = "/metrics"
+BUSINESS_CACHE_KEY = "metrics:business"
+
+REQUEST_LATENCY = Histogram(
+    "integrasys_request_duration_seconds",
+    "Duracion de los requests por vista.",
+    ["view", "method"],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_QUERIES = Histogram(
+    "integrasys_request_db_queries",
+    "Consultas a la base por request.",
+    ["view"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+PDF_RENDER = Histogram(
+    "integrasys_pdf_render_seconds",
+    "Duracion del render de PDF por documento.",
+    ["document"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+
+QUERY_BUDGET_VIOLATIONS = Counter(
+    "integrasys_query_budget_violations",
+    "Requests que excedieron su presupuesto de consultas o tuvieron un N+1.",
+    ["view", "kind"],
+)
+
+
+def observe_request(sample):
+    """Registra una muestra de ``core.perf`` en los histogramas."""
+    REQUEST_LATENCY.labels(view=sample["view"], method=sample["method"]).observe(sample["ms"] / 1000)
+    REQUEST_QUERIES.labels(view=sample["view"]).observe(sample["queries"])
+
+
+@contextmanager
+def pdf_render_timer(document):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        PDF_RENDER.labels(document=document).observe(time.perf_counter() - started)
+
+
+def business_values():
+    """Indicadores del negocio, cacheados ``METRICS_CACHE_SECONDS``."""
+    values = cache.get(BUSINESS_CACHE_KEY)
+    if values is not None:
+        return values
+    from core.models import InventoryItem, Notification, ServiceOrder
+
+    by_status = {status: 0 for status in ServiceOrder.Status.values}
+    for row in ServiceOrder.objects.order_by().values("status").annotate(total=Count("id")):
+        by_status[row["status"]] = row["total"]
+    since = timezone.now() - timedelta(hours=24)
+    values = {
+        "orders_by_status": by_status,
+        "notifications_unread": Notification.objects.filter(seen_at__isnull=True).count(),
+        "low_stock_skus": InventoryItem.objects.filter(qty__lt=F("min_qty")).count(),
+        "email_failures_24h": Notification.objects.filter(kind="email", ok=False, created_at__gte=since).count(),
+    }
+    cache.set(BUSINESS_CACHE_KEY, values, getattr(settings, "METRICS_CACHE_SECONDS", 60))
+    return values
+
+
+class BusinessCollector:
+    def collect(self):
+        values = business_values()
+        orders = GaugeMetricFamily("integrasys_orders", "Ordenes de servicio por estado.", labels=["status"])
+        for status, total in sorted(values["orders_by_status"].items()):
+            orders.add_metric([status], total)
+        yield orders
+        yield GaugeMetricFamily(
+            "integrasys_notifications_unread", "Notificaciones sin leer.", value=values["notifications_unread"]
+        )
+        yield GaugeMetricFamily(
+            "integrasys_low_stock_skus", "SKUs con existencia menor al minimo.", value=values["low_stock_skus"]
+        )
+        yield GaugeMetricFamily(
+            "integrasys_email_failures_24h",
+            "Correos con error en las ultimas 24 horas.",
+            value=values["email_failures_24h"],
+        )
+
+
+def _registry():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = CollectorRegistry()
+        for collector in (REQUEST_LATENCY, REQUEST_QUERIES, PDF_RENDER, QUERY_BUDGET_VIOLATIONS):
+            registry.register(collector)
+    registry.register(BusinessCollector())
+    return registry
+
+
+def _authorized(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token:
+        return True
+    sent = request.headers.get("Authorization", "")
+    return hmac.compare_digest(sent.encode(), f"Bearer {token}".encode())
+
+
+def metrics_view(request):
+    if not _authorized(request):
+        return HttpResponseForbidden("Token invalido.")
+    response = HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+class MetricsMiddleware:
+    """Atiende ``/metrics`` antes de redireccion SSL, sesiones y ``core.perf``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path_info.rstrip("/") == METRICS_PATH and request.method in ("GET", "HEAD"):
+            return metrics_view(request)
+        return self.get_response(request)
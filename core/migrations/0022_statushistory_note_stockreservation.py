@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_serviceorder_warranty_cancel_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='statushistory',
+            name='note',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='statushistory',
+            name='from_status',
+            field=models.CharField(blank=True, choices=[('NEW', 'Recibido'), ('REV', 'En revision'), ('WAI', 'En espera de repuestos'), ('AUTH', 'Requiere autorizacion de repuestos'), ('READY', 'Listo para recoger'), ('DONE', 'Entregado'), ('CANC', 'Cancelado')], default='', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='statushistory',
+            name='status',
+            field=models.CharField(choices=[('NEW', 'Recibido'), ('REV', 'En revision'), ('WAI', 'En espera de repuestos'), ('AUTH', 'Requiere autorizacion de repuestos'), ('READY', 'Listo para recoger'), ('DONE', 'Entregado'), ('CANC', 'Cancelado')], db_index=True, max_length=10),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qty', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('ACT', 'Activa'), ('CON', 'Consumida'), ('REL', 'Liberada')], default='ACT', max_length=3)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('estimate_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reservation', to='core.estimateitem')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='core.inventoryitem')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to='core.serviceorder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'status', 'qty'], name='stockres_item_status_qty_idx')],
+            },
+        ),
+    ]
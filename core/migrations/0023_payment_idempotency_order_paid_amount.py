@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:58
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def _backfill_paid_amount(apps, schema_editor):
+    Payment = apps.get_model("core", "Payment")
+    ServiceOrder = apps.get_model("core", "ServiceOrder")
+    money = DecimalField(max_digits=12, decimal_places=2)
+    paid = (
+        Payment.objects.filter(order=OuterRef("pk"))
+        .order_by()
+        .values("order")
+        .annotate(total=Sum("amount"))
+        .values("total")[:1]
+    )
+    ServiceOrder.objects.update(
+        paid_amount=Coalesce(Subquery(paid, output_field=money), Value(Decimal("0.00")), output_field=money)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_statushistory_note_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='serviceorder',
+            name='paid_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(_backfill_paid_amount, migrations.RunPython.noop),
+    ]
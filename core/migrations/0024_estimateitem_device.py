@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_payment_idempotency_order_paid_amount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estimateitem',
+            name='device',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='estimate_items', to='core.device'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:12
+
+from pathlib import PurePosixPath
+
+import core.storage
+from django.db import migrations, models
+
+
+def _backfill_original_name(apps, schema_editor):
+    Attachment = apps.get_model("core", "Attachment")
+    pending = []
+    for attachment in Attachment.objects.filter(original_name="").only("pk", "file").iterator():
+        attachment.original_name = PurePosixPath(attachment.file.name or "").name[:255]
+        pending.append(attachment)
+    Attachment.objects.bulk_update(pending, ["original_name"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_estimateitem_device'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachment',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='attachment',
+            name='file',
+            field=models.FileField(db_index=True, storage=core.storage.attachment_storage, upload_to='attachments/%Y/%m/%d/'),
+        ),
+        migrations.RunPython(_backfill_original_name, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,14 @@
 from django.db import models
 from django.db import transaction, IntegrityError
 from django.db.models import Q, Count
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.apps import apps
 from decimal import Decimal, ROUND_HALF_UP
 import uuid
 import re
+from pathlib import PurePosixPath
 
 
 
@@ -16,10 +18,12 @@ from django.core.mail import send_mail
 
 from django.contrib.auth import get_user_model
 
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 from django.dispatch import receiver
 
+from core.storage import attachment_storage, release_attachment_file
+
 
 IVA_RATE = Decimal("0.16")
 
@@ -117,6 +121,16 @@ class ServiceOrder(models.Model):
     checkout_at = models.DateTimeField(null=True, blank=True)
     notes = models.TextField(blank=True)
     assigned_to = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    # Suma de pagos; la mantiene la signal de Payment (ver _sync_order_paid_amount).
+    paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Panel y dashboard: filtro por estado ya ordenado por ingreso, sin sort aparte.
+            models.Index(fields=["status", "-checkin_at"], name="order_status_checkin_idx"),
+            # Vista del tecnico: sus ordenes por estado.
+            models.Index(fields=["assigned_to", "status", "-checkin_at"], name="order_tech_status_checkin_idx"),
+        ]
 
     def __str__(self):
         device_label = self.primary_device_label()
@@ -223,6 +237,8 @@ class ServiceOrder(models.Model):
             self.checkout_at = timezone.now()
             update_fields.append("checkout_at")
         self.save(update_fields=update_fields)
+        if new_status == ServiceOrder.Status.CANCELLED:
+            StockReservation.release(order=self)
         from_status_value = previous_status or ""
         StatusHistory.log(
             order=self,
@@ -271,11 +287,7 @@ class ServiceOrder(models.Model):
 
     @property
     def paid_total(self):
-        Payment = apps.get_model(self._meta.app_label, "Payment")
-        if Payment is None:
-            return self._quantize_amount(0)
-        agg = Payment.objects.filter(order=self).aggregate(total=models.Sum("amount"))
-        return self._quantize_amount(agg.get("total") or 0)
+        return self._quantize_amount(self.paid_amount)
 
     @property
     def balance(self):
@@ -297,6 +309,11 @@ class StatusHistory(models.Model):
     note = models.TextField(blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["order", "created_at"], name="history_order_created_idx"),
+        ]
+
     @classmethod
     def log(cls, order, *, from_status="", to_status=None, author=None, author_role="", note=""):
         target_status = to_status or getattr(order, "status", "")
@@ -318,9 +335,30 @@ class Payment(models.Model):
     reference = models.CharField(max_length=80, blank=True)
     author = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Llave que manda el formulario para no duplicar un pago por doble envio.
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=["order", "created_at"], name="payment_order_created_idx"),
+        ]
+
+    @staticmethod
+    def paid_sum_subquery(order_ref="pk"):
+        """Subquery con la suma de pagos de la orden referenciada por ``order_ref``."""
+        return Coalesce(
+            models.Subquery(
+                Payment.objects.filter(order=models.OuterRef(order_ref))
+                .order_by()
+                .values("order")
+                .annotate(total=models.Sum("amount"))
+                .values("total")[:1],
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            models.Value(Decimal("0.00")),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
 
 
 class InventoryItem(models.Model):
@@ -346,6 +384,9 @@ class InventoryMovement(models.Model):
         constraints = [
             models.CheckConstraint(check=~Q(delta=0), name="inv_delta_nonzero"),
         ]
+        indexes = [
+            models.Index(fields=["order", "created_at"], name="invmov_order_created_idx"),
+        ]
 
 class Estimate(models.Model):
     class Status(models.TextChoices):
@@ -379,13 +420,21 @@ class Estimate(models.Model):
     def accepted_totals(self):
         """Return (subtotal, tax, total) using only accepted items."""
         status_code = getattr(EstimateItem.Status, "ACCEPTED", "ACC")
-        aggregation = self.items.filter(status=status_code).aggregate(
-            subtotal=models.Sum(
-                models.F("qty") * models.F("unit_price"),
-                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        prefetched = getattr(self, "_prefetched_objects_cache", {})
+        if "items" in prefetched:
+            # Listados y exportaciones con prefetch_related("estimate__items"): sin consulta por fila.
+            raw_subtotal = sum(
+                (item.qty * item.unit_price for item in prefetched["items"] if item.status == status_code),
+                Decimal("0.00"),
             )
-        )
-        raw_subtotal = aggregation.get("subtotal") or Decimal("0.00")
+        else:
+            aggregation = self.items.filter(status=status_code).aggregate(
+                subtotal=models.Sum(
+                    models.F("qty") * models.F("unit_price"),
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2),
+                )
+            )
+            raw_subtotal = aggregation.get("subtotal") or Decimal("0.00")
         subtotal = raw_subtotal.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
         tax = Decimal("0.00")
         if getattr(self, "apply_tax", True):
@@ -458,11 +507,51 @@ class EstimateItem(models.Model):
     )
     decided_at = models.DateTimeField(null=True, blank=True)
     inventory_item = models.ForeignKey(InventoryItem, null=True, blank=True, on_delete=models.SET_NULL)
+    # Equipo al que se cobra la partida en ordenes con varios dispositivos.
+    device = models.ForeignKey(
+        Device, null=True, blank=True, on_delete=models.SET_NULL, related_name="estimate_items"
+    )
 
     def __str__(self):
         return f"{self.description} x{self.qty}"
 
 
+class StockReservation(models.Model):
+    """Piezas apartadas para una partida aceptada hasta que la orden llega a READY."""
+
+    class Status(models.TextChoices):
+        ACTIVE = "ACT", "Activa"
+        CONSUMED = "CON", "Consumida"
+        RELEASED = "REL", "Liberada"
+
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name="reservations")
+    order = models.ForeignKey(ServiceOrder, on_delete=models.CASCADE, related_name="stock_reservations")
+    estimate_item = models.OneToOneField(EstimateItem, on_delete=models.CASCADE, related_name="reservation")
+    qty = models.PositiveIntegerField()
+    status = models.CharField(max_length=3, choices=Status.choices, default=Status.ACTIVE)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Cubre SUM(qty) por item de las reservas activas (disponible = qty - reservado).
+            models.Index(fields=["item", "status", "qty"], name="stockres_item_status_qty_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.item.sku} x{self.qty} ({self.get_status_display()})"
+
+    @classmethod
+    def release(cls, *, order=None, estimate_items=None):
+        """Libera reservas activas de una orden o de partidas especificas."""
+        qs = cls.objects.filter(status=cls.Status.ACTIVE)
+        if order is not None:
+            qs = qs.filter(order=order)
+        if estimate_items is not None:
+            qs = qs.filter(estimate_item__in=estimate_items)
+        return qs.update(status=cls.Status.RELEASED, updated_at=timezone.now())
+
+
 class Notification(models.Model):
     order = models.ForeignKey(ServiceOrder, null=True, blank=True, on_delete=models.CASCADE, db_index=True)
     kind = models.CharField(max_length=40, db_index=True)
@@ -470,9 +559,18 @@ class Notification(models.Model):
     ok = models.BooleanField(default=False)
     payload = models.JSONField(default=dict, blank=True)
     title = models.CharField(max_length=140, blank=True)
-    seen_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    seen_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
+    class Meta:
+        indexes = [
+            # Solo las no leidas (reemplaza al indice completo de seen_at): el contador
+            # de la campana no recorre el historico ni cada lectura reescribe el indice.
+            models.Index(
+                fields=["kind", "created_at"], condition=Q(seen_at__isnull=True), name="notif_unread_kind_idx"
+            ),
+        ]
+
 
 
 
@@ -481,12 +579,89 @@ class Notification(models.Model):
 # === INTEGRASYS PATCH: Attachment model ===
 class Attachment(models.Model):
     service_order = models.ForeignKey('ServiceOrder', related_name='attachments', on_delete=models.CASCADE)
-    file = models.FileField(upload_to='attachments/%Y/%m/%d/')
+    # Blob direccionado por contenido (core.storage); varias filas pueden compartirlo.
+    file = models.FileField(upload_to='attachments/%Y/%m/%d/', storage=attachment_storage, db_index=True)
+    original_name = models.CharField(max_length=255, blank=True)
     caption = models.CharField(max_length=255, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # Metadatos fijados al subir (ver backfill_attachment_metadata) para listar sin tocar disco.
+    # original_size: bytes recibidos si la foto se recomprimio (core.image_ingest).
+    original_size = models.PositiveBigIntegerField(null=True, blank=True)
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    is_image = models.BooleanField(default=False)
+
+    @property
+    def display_name(self):
+        return self.original_name or PurePosixPath(self.file.name or "").name
+
+    @staticmethod
+    def count_subquery(order_ref="pk"):
+        """Subquery con el numero de adjuntos de la orden referenciada por ``order_ref``."""
+        return Coalesce(
+            models.Subquery(
+                Attachment.objects.filter(service_order=models.OuterRef(order_ref))
+                .order_by()
+                .values("service_order")
+                .annotate(total=models.Count("id"))
+                .values("total")[:1],
+                output_field=models.IntegerField(),
+            ),
+            models.Value(0),
+        )
+
+    def __str__(self):
+        return f"{self.display_name or 'Attachment'} (order #{self.service_order_id})"
+
+
+class UploadSession(models.Model):
+    """Subida por partes de un adjunto (ver core.uploads)."""
+
+    class Status(models.TextChoices):
+        OPEN = "OPEN", "Abierta"
+        DONE = "DONE", "Completada"
+        ABORTED = "ABRT", "Cancelada"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    order = models.ForeignKey(ServiceOrder, on_delete=models.CASCADE, related_name="upload_sessions")
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    filename = models.CharField(max_length=255)
+    caption = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=4, choices=Status.choices, default=Status.OPEN, db_index=True)
+    attachment = models.ForeignKey(Attachment, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.file.name if self.file else 'Attachment'} (order #{self.service_order_id})"
+        return f"{self.filename} ({self.received}/{self.size})"
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def _sync_order_paid_amount(sender, instance, **kwargs):
+    """Recalcula ``ServiceOrder.paid_amount`` en la misma transaccion del pago."""
+    ServiceOrder.objects.filter(pk=instance.order_id).update(paid_amount=Payment.paid_sum_subquery())
+
+
+@receiver(post_delete, sender=Attachment)
+def _release_attachment_blob(sender, instance, **kwargs):
+    """Vista, admin o cascada: al confirmar, suelta el blob si ya nadie lo usa."""
+    name = instance.file.name
+    if name:
+        storage = instance.file.storage
+        transaction.on_commit(lambda: release_attachment_file(name, storage))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def _forget_cached_roles(sender, instance, reverse, action, **kwargs):
+    """Descarta los grupos que ``core.permissions`` guardo en el usuario."""
+    if not reverse and action.startswith("post_"):
+        instance.__dict__.pop("_group_names_cache", None)
+
 
 # === INTEGRASYS LOW STOCK SIGNAL ===
 try:
@@ -496,6 +671,127 @@ except Exception:
     InventoryMovementModel = None
     NotificationModel = None
 
+
+def notify_low_stock(item):
+    """Notificacion y correo de stock bajo si ``item`` quedo en o bajo su minimo."""
+    try:
+        qty = getattr(item, 'qty', 0) or 0
+        min_qty = getattr(item, 'min_qty', 0) or 0
+    except Exception:
+        qty = 0
+        min_qty = 0
+    if qty > min_qty:
+        return  # stock is above threshold
+
+    sku = getattr(item, 'sku', '')
+    name = getattr(item, 'name', '')
+    location = getattr(item, 'location', None) or '-'
+    subject = f"Stock bajo: {sku} - {name} (qty {qty} <= min {min_qty})"
+    body_lines = [
+        f"Inventario bajo para {name} ({sku}).",
+        f"Ubicacion: {location}",
+        f"Cantidad actual: {qty}",
+        f"Minimo definido: {min_qty}",
+    ]
+    body = "\n".join(body_lines)
+    payload = {
+        "sku": sku,
+        "name": name,
+        "qty": qty,
+        "min_qty": min_qty,
+        "location": location,
+    }
+    Notification.objects.create(
+        order=None,
+        kind='stock',
+        channel='low_stock_signal',
+        ok=True,
+        payload=payload,
+    )
+    _send_low_stock_email(subject, body, payload)
+
+
+def notify_low_stock_summary(items, *, title="Stock bajo"):
+    """Una notificacion y un correo para todos los ``items`` en o bajo su minimo."""
+    rows = [
+        {
+            "sku": item.sku,
+            "name": item.name,
+            "qty": item.qty or 0,
+            "min_qty": item.min_qty or 0,
+            "location": item.location or '-',
+        }
+        for item in items
+        if (item.qty or 0) <= (item.min_qty or 0)
+    ]
+    if not rows:
+        return
+    skus = [row["sku"] for row in rows]
+    title = f"{title}: {len(rows)} items"
+    Notification.objects.create(
+        order=None,
+        kind='stock',
+        channel='low_stock_signal',
+        ok=True,
+        title=title[:140],
+        payload={"count": len(rows), "skus": skus, "items": rows},
+    )
+    body = "Stock bajo:\n\n" + "\n".join(
+        f"{row['sku']} - {row['name']}: {row['qty']} / min {row['min_qty']} ({row['location']})" for row in rows
+    )
+    _send_low_stock_email(title, body, {"count": len(rows), "skus": skus})
+
+
+def _low_stock_recipients():
+    """ADMINS, si no MANAGERS, si no hasta 5 usuarios staff con email."""
+    try:
+        admins = getattr(settings, 'ADMINS', ())
+        to_emails = [e for _, e in admins if e]
+        if not to_emails:
+            managers = getattr(settings, 'MANAGERS', ())
+            to_emails = [e for _, e in managers if e]
+        if not to_emails:
+            User = get_user_model()
+            to_emails = list(
+                User.objects.filter(is_staff=True)
+                .exclude(email='')
+                .values_list('email', flat=True)[:5]
+            )
+    except Exception:
+        to_emails = []
+    return to_emails
+
+
+def _send_low_stock_email(subject, body, payload):
+    to_emails = _low_stock_recipients()
+    email_ok = False
+    email_error = None
+    if to_emails:
+        try:
+            send_count = send_mail(
+                subject,
+                body,
+                getattr(settings, 'DEFAULT_FROM_EMAIL', None),
+                to_emails,
+                fail_silently=False,
+            )
+            email_ok = send_count > 0
+        except Exception as exc:
+            email_error = str(exc)
+    else:
+        email_error = "no_recipients"
+    email_payload = {**payload, "recipients": list(to_emails)}
+    if email_error:
+        email_payload["error"] = email_error
+    Notification.objects.create(
+        order=None,
+        kind='email',
+        channel='low_stock',
+        ok=email_ok,
+        payload=email_payload,
+    )
+
+
 if InventoryMovementModel is not None:
     @receiver(post_save, sender=InventoryMovementModel)
     def _integrasys_notify_low_stock(sender, instance, created, **kwargs):
@@ -504,84 +800,4 @@ if InventoryMovementModel is not None:
         item = getattr(instance, 'item', None)
         if item is None:
             return
-        try:
-            qty = getattr(item, 'qty', 0) or 0
-            min_qty = getattr(item, 'min_qty', 0) or 0
-        except Exception:
-            qty = 0
-            min_qty = 0
-        if qty > min_qty:
-            return  # stock is above threshold
-
-        sku = getattr(item, 'sku', '')
-        name = getattr(item, 'name', '')
-        location = getattr(item, 'location', None) or '-'
-        subject = f"Stock bajo: {sku} - {name} (qty {qty} <= min {min_qty})"
-        body_lines = [
-            f"Inventario bajo para {name} ({sku}).",
-            f"Ubicacion: {location}",
-            f"Cantidad actual: {qty}",
-            f"Minimo definido: {min_qty}",
-        ]
-        body = "\n".join(body_lines)
-        payload = {
-            "sku": sku,
-            "name": name,
-            "qty": qty,
-            "min_qty": min_qty,
-            "location": location,
-        }
-        if NotificationModel is not None:
-            NotificationModel.objects.create(
-                order=None,
-                kind='stock',
-                channel='low_stock_signal',
-                ok=True,
-                payload=payload,
-            )
-        # Destinatarios: ADMINS/MANAGERS o staff con email
-        to_emails = []
-        try:
-            admins = getattr(settings, 'ADMINS', ())
-            if admins:
-                to_emails = [e for _, e in admins if e]
-            if not to_emails:
-                managers = getattr(settings, 'MANAGERS', ())
-                if managers:
-                    to_emails = [e for _, e in managers if e]
-            if not to_emails:
-                User = get_user_model()
-                to_emails = list(
-                    User.objects.filter(is_staff=True)
-                    .exclude(email='')
-                    .values_list('email', flat=True)[:5]
-                )
-        except Exception:
-            to_emails = []
-        email_ok = False
-        email_error = None
-        if to_emails:
-            try:
-                send_count = send_mail(
-                    subject,
-                    body,
-                    getattr(settings, 'DEFAULT_FROM_EMAIL', None),
-                    to_emails,
-                    fail_silently=False,
-                )
-                email_ok = send_count > 0
-            except Exception as exc:
-                email_error = str(exc)
-        else:
-            email_error = "no_recipients"
-        if NotificationModel is not None:
-            email_payload = {**payload, "recipients": list(to_emails)}
-            if email_error:
-                email_payload["error"] = email_error
-            NotificationModel.objects.create(
-                order=None,
-                kind='email',
-                channel='low_stock',
-                ok=email_ok,
-                payload=email_payload,
-            )
+        notify_low_stock(item)
@@ -0,0 +1,165 @@
+"""Registro de pagos seguro ante concurrencia.
+
+``record_payment`` bloquea la fila de la orden, valida el monto contra el
+saldo almacenado (``approved_total - paid_amount``) y crea el pago en la misma
+transaccion. Una ``idempotency_key`` enviada por el cliente evita duplicados
+por doble clic o reintentos de red.
+
+``device_balances`` reparte cobrado/pagado entre los equipos de la orden.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, models, transaction
+
+from core.models import IVA_RATE, Device, Estimate, EstimateItem, Payment, ServiceOrder
+
+
+class PaymentError(Exception):
+    """El pago no se puede registrar (monto, saldo o dispositivo invalidos)."""
+
+
+def _existing_payment(key, order_id):
+    payment = Payment.objects.select_related("order", "device").filter(idempotency_key=key).first()
+    if payment is not None and payment.order_id != order_id:
+        raise PaymentError("La llave de idempotencia ya se uso en otra orden.")
+    return payment
+
+
+def _order_device(order, device_id):
+    if not device_id:
+        return None
+    try:
+        device_id = int(device_id)
+    except (TypeError, ValueError):
+        raise PaymentError("Selecciona un dispositivo valido.")
+    device = Device.objects.filter(pk=device_id, orders=order).first()
+    if device is None and order.device_id == device_id:
+        device = order.device
+    if device is None:
+        raise PaymentError("Selecciona un dispositivo valido.")
+    return device
+
+
+def record_payment(
+    order_id,
+    *,
+    amount,
+    method,
+    reference="",
+    device_id=None,
+    author=None,
+    idempotency_key=None,
+):
+    """Registra un pago; regresa ``(payment, created, balance)``.
+
+    Si la llave ya existe para la orden se regresa el pago original con
+    ``created=False`` y no se escribe nada.
+    """
+    key = (idempotency_key or "").strip() or None
+    amount = ServiceOrder._quantize_amount(amount)
+    if amount <= Decimal("0.00"):
+        raise PaymentError("El monto debe ser mayor a cero.")
+
+    if key:
+        existing = _existing_payment(key, order_id)
+        if existing is not None:
+            return existing, False, existing.order.balance
+
+    try:
+        with transaction.atomic():
+            order = ServiceOrder.objects.select_for_update().get(pk=order_id)
+            if key:
+                # Otro envio con la misma llave pudo confirmar mientras esperabamos el lock.
+                existing = _existing_payment(key, order_id)
+                if existing is not None:
+                    return existing, False, order.balance
+            device = _order_device(order, device_id)
+            balance = order.balance
+            if balance <= Decimal("0.00"):
+                raise PaymentError("La orden no tiene saldo por cobrar.")
+            if amount > balance:
+                raise PaymentError("El monto excede el saldo por cobrar.")
+            payment = Payment.objects.create(
+                order=order,
+                device=device,
+                amount=amount,
+                method=method,
+                reference=reference,
+                author=author,
+                idempotency_key=key,
+            )
+            order.paid_amount = order.paid_amount + amount
+    except IntegrityError:
+        if key:
+            existing = _existing_payment(key, order_id)
+            if existing is not None:
+                return existing, False, existing.order.balance
+        raise
+    payment.order = order
+    return payment, True, ServiceOrder._quantize_amount(balance - amount)
+
+
+def device_balances(order, devices):
+    """Cobrado, pagado y saldo por dispositivo de ``order``.
+
+    Lo pagado sale de un query agrupado por ``Payment.device`` y lo cobrado de
+    otro agrupado por ``EstimateItem.device`` (solo partidas aceptadas). Lo
+    que no esta ligado a un equipo cae en la fila general (``device=None``),
+    asi la suma de filas coincide con ``approved_total`` y ``balance``.
+    """
+    by_id = {device.pk: device for device in devices}
+    paid = {
+        row["device_id"]: row["total"]
+        for row in Payment.objects.filter(order=order)
+        .order_by()
+        .values("device_id")
+        .annotate(total=models.Sum("amount"))
+    }
+    charged = {}
+    try:
+        estimate = order.estimate
+    except Estimate.DoesNotExist:
+        estimate = None
+    if estimate is not None:
+        apply_tax = estimate.apply_tax
+        subtotals = (
+            EstimateItem.objects.filter(estimate=estimate, status=EstimateItem.Status.ACCEPTED)
+            .order_by()
+            .values("device_id")
+            .annotate(
+                subtotal=models.Sum(
+                    models.F("qty") * models.F("unit_price"),
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2),
+                )
+            )
+        )
+        for row in subtotals:
+            if row["device_id"] not in by_id:
+                continue
+            subtotal = ServiceOrder._quantize_amount(row["subtotal"])
+            tax = ServiceOrder._quantize_amount(subtotal * IVA_RATE) if apply_tax else Decimal("0.00")
+            charged[row["device_id"]] = subtotal + tax
+
+    rows = []
+    for device in devices:
+        device_charged = charged.get(device.pk, Decimal("0.00"))
+        device_paid = ServiceOrder._quantize_amount(paid.get(device.pk))
+        rows.append(
+            {
+                "device": device,
+                "charged": device_charged,
+                "paid": device_paid,
+                "balance": device_charged - device_paid,
+            }
+        )
+    general_charged = order.approved_total - sum((row["charged"] for row in rows), Decimal("0.00"))
+    general_paid = order.paid_total - sum((row["paid"] for row in rows), Decimal("0.00"))
+    rows.append(
+        {
+            "device": None,
+            "charged": general_charged,
+            "paid": general_paid,
+            "balance": general_charged - general_paid,
+        }
+    )
+    return rows
@@ -0,0 +1,248 @@
+"""Instrumentacion por request: tiempo total, tiempo en base, consultas y tamano.
+
+``PerfMiddleware`` envuelve cada request con ``execute_wrapper`` (funciona
+sin ``DEBUG``) y registra por vista:
+
+- ``Server-Timing`` en la respuesta para usuarios staff, o para todos con
+  ``PERF_SERVER_TIMING = "all"`` (visible en las herramientas de desarrollo
+  del navegador; ``load_test`` lo usa para el tiempo en base);
+- una linea JSON en el logger ``core.perf`` para una muestra de requests
+  (``PERF_LOG_SAMPLE_RATE``) y siempre para los lentos (``PERF_SLOW_MS``);
+- una ventana de las ultimas ``PERF_WINDOW`` muestras por vista en memoria
+  del proceso, de donde salen los percentiles del reporte de rendimiento;
+- los histogramas de ``core.metrics`` que se exportan en ``/metrics``;
+- el presupuesto de consultas y la deteccion de N+1 de ``core.querybudget``;
+- las consultas lentas con su ``EXPLAIN`` en ``core.slowqueries``.
+
+Cada worker de Gunicorn lleva su propia ventana y se reinicia con el deploy,
+asi que una regresion se ve en cuanto llegan requests nuevos.
+"""
+import json
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+
+from core import slowqueries
+from core.metrics import observe_request
+from core.querybudget import BudgetChecker, query_shape, resolve_budget
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def percentile(values, pct):
+    """Percentil por rango mas cercano de una lista ya ordenada."""
+    if not values:
+        return None
+    rank = math.ceil(pct / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class QueryRecorder:
+    """``execute_wrapper`` que cuenta consultas, duplicadas y tiempo en base.
+
+    Con ``checker`` (un ``BudgetChecker``) revisa tambien el presupuesto y
+    las formas repetidas (N+1) de la vista; las consultas de ``SLOW_QUERY_MS``
+    o mas van a ``core.slowqueries``.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.db_ms = 0.0
+        self.statements = Counter()
+        self.shapes = Counter()
+        self.checker = None
+        self.view = None
+        self.slow_ms = slowqueries.threshold_ms()
+        self._explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._explaining:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = execute(sql, params, many, context)
+            failed = False
+            return result
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            self.db_ms += duration
+            self.count += 1
+            if self.slow_ms is not None and duration >= self.slow_ms and not failed:
+                self._record_slow(context["connection"], sql, params, many, duration)
+            self.statements[(sql, repr(params))] += 1
+            shape = query_shape(sql)
+            self.shapes[shape] += 1
+            if self.checker is not None:
+                self.checker.check(self.count, shape, self.shapes[shape])
+
+    def _record_slow(self, connection, sql, params, many, duration):
+        self._explaining = True
+        try:
+            slowqueries.record(connection, sql, params, many, duration, view=self.view)
+        except OSError:
+            logger.exception("No se pudo escribir el registro de consultas lentas")
+        finally:
+            self._explaining = False
+
+    @property
+    def duplicates(self):
+        """Consultas repetidas con el mismo SQL y parametros."""
+        return sum(seen - 1 for seen in self.statements.values() if seen > 1)
+
+
+class PerfStore:
+    """Ventana movil de muestras por vista, en memoria del proceso."""
+
+    def __init__(self, window=500):
+        self.window = window
+        self.started_at = timezone.now()
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._totals = Counter()
+
+    def record(self, sample):
+        with self._lock:
+            view = sample["view"]
+            if view not in self._samples:
+                self._samples[view] = deque(maxlen=self.window)
+            self._samples[view].append((sample["ms"], sample["db_ms"], sample["queries"], sample["duplicates"]))
+            self._totals[view] += 1
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+            self.started_at = timezone.now()
+
+    def summary(self):
+        """Percentiles por vista, ordenados por p95 descendente."""
+        with self._lock:
+            snapshot = {view: list(samples) for view, samples in self._samples.items()}
+            totals = dict(self._totals)
+        rows = []
+        for view, samples in snapshot.items():
+            wall = sorted(sample[0] for sample in samples)
+            rows.append(
+                {
+                    "view": view,
+                    "requests": totals[view],
+                    "window": len(samples),
+                    "p50_ms": percentile(wall, 50),
+                    "p95_ms": percentile(wall, 95),
+                    "p99_ms": percentile(wall, 99),
+                    "db_p95_ms": percentile(sorted(sample[1] for sample in samples), 95),
+                    "queries_avg": round(sum(sample[2] for sample in samples) / len(samples), 1),
+                    "queries_max": max(sample[2] for sample in samples),
+                    "duplicates_max": max(sample[3] for sample in samples),
+                }
+            )
+        rows.sort(key=lambda row: row["p95_ms"], reverse=True)
+        return rows
+
+
+store = PerfStore(window=_setting("PERF_WINDOW", 500))
+
+
+@contextmanager
+def _recording(recorder):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield
+
+
+def _recorded_iter(content, recorder):
+    # El wrapper se pone y quita por bloque: el generador puede quedar a medias.
+    iterator = iter(content)
+    while True:
+        with _recording(recorder):
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+        yield chunk
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "<sin-ruta>"
+    return match.view_name or match._func_path
+
+
+def _response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+def _wants_server_timing(request):
+    if _setting("PERF_SERVER_TIMING", "staff") == "all":
+        return True
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+class PerfMiddleware:
+    """Mide cada request; ver el docstring del modulo."""
+
+    def __init__(self, get_response):
+        if not _setting("PERF_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = request._query_recorder = QueryRecorder()
+        started = time.perf_counter()
+        with _recording(recorder):
+            response = self.get_response(request)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.streaming and not response.is_async:
+            # Los CSV y ZIP consultan mientras se envian; el presupuesto sigue aplicando.
+            response.streaming_content = _recorded_iter(response.streaming_content, recorder)
+
+        sample = {
+            "view": _view_name(request),
+            "method": request.method,
+            "status": response.status_code,
+            "ms": round(elapsed, 2),
+            "db_ms": round(recorder.db_ms, 2),
+            "queries": recorder.count,
+            "duplicates": recorder.duplicates,
+            "bytes": _response_size(response),
+        }
+        store.record(sample)
+        observe_request(sample)
+        self._log(sample)
+        if _wants_server_timing(request):
+            response["Server-Timing"] = (
+                f'app;dur={sample["ms"]:.1f}, '
+                f'db;dur={sample["db_ms"]:.1f};desc="{sample["queries"]} consultas, {sample["duplicates"]} duplicadas"'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        recorder = getattr(request, "_query_recorder", None)
+        if recorder is not None:
+            view = recorder.view = _view_name(request)
+            recorder.checker = BudgetChecker(view, resolve_budget(view, view_func))
+
+    def _log(self, sample):
+        if sample["ms"] >= _setting("PERF_SLOW_MS", 1000):
+            logger.warning(json.dumps({"event": "slow_request", **sample}))
+        elif random.random() < _setting("PERF_LOG_SAMPLE_RATE", 0.05):
+            logger.info(json.dumps({"event": "request", **sample}))
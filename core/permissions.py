@@ -10,10 +10,21 @@ ROLE_GERENCIA = "Gerencia"
 ROLE_TECNICO = "Tecnico"
 
 
+def _group_names(user):
+    # Una consulta por request: vistas y plantillas preguntan el rol varias veces.
+    # Vive en el usuario que carga AuthenticationMiddleware en cada request;
+    # user.groups.add/remove/clear lo descarta (core.models._forget_cached_roles).
+    names = getattr(user, "_group_names_cache", None)
+    if names is None:
+        names = frozenset(user.groups.values_list("name", flat=True))
+        user._group_names_cache = names
+    return names
+
+
 def user_in_group(user, group_name):
     if not getattr(user, "is_authenticated", False):
         return False
-    return user.groups.filter(name=group_name).exists()
+    return group_name in _group_names(user)
 
 
 def _user_has_any_role(user, roles):
@@ -21,7 +32,7 @@ def _user_has_any_role(user, roles):
         return False
     if getattr(user, "is_superuser", False):
         return True
-    return user.groups.filter(name__in=list(roles)).exists()
+    return not _group_names(user).isdisjoint(roles)
 
 
 def has_role(user, *roles):
@@ -48,6 +59,13 @@ def is_tecnico(user):
     return user_in_group(user, ROLE_TECNICO)
 
 
+def can_view_order_attachments(user, order):
+    """Recepcion, Gerencia y superusuarios ven cualquier orden; un tecnico solo las asignadas a el."""
+    if is_recepcion(user):
+        return True
+    return is_tecnico(user) and order.assigned_to_id == user.pk
+
+
 def is_manager(user):
     if not getattr(user, "is_authenticated", False):
         return False
@@ -66,6 +84,16 @@ def require_manager(view_func):
     return _wrapped
 
 
+def require_superuser(view_func):
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        if not getattr(getattr(request, "user", None), "is_superuser", False):
+            return HttpResponseForbidden("Se requiere superusuario.")
+        return view_func(request, *args, **kwargs)
+
+    return _wrapped
+
+
 def _redirect_to_admin_login(request):
     login_url = "/admin/login/"
     if hasattr(request, "get_full_path"):
@@ -86,7 +114,7 @@ def group_required(*group_names):
                 return _redirect_to_admin_login(request)
             if getattr(user, "is_superuser", False):
                 return view_func(request, *args, **kwargs)
-            if not allowed or user.groups.filter(name__in=allowed).exists():
+            if not allowed or not _group_names(user).isdisjoint(allowed):
                 return view_func(request, *args, **kwargs)
             context = {"required_groups": allowed}
             return render(request, "403.html", context=context, status=403)
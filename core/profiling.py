@@ -0,0 +1,143 @@
+"""Perfilado bajo demanda de un request, solo para superusuarios.
+
+Se activa por request con ``?_profile=1`` o el header ``X-Profile: 1``
+(``cprofile`` en lugar de ``1`` usa cProfile). Por defecto se toma una
+muestra de la pila del hilo del request cada ``PROFILER_INTERVAL_MS`` y se
+guarda en formato "folded" (``func;func;func N``), el que leen
+``flamegraph.pl`` y https://www.speedscope.app; con cProfile se guarda un
+``.prof`` para ``snakeviz`` o ``pstats``. Los archivos quedan en
+``MEDIA_ROOT/profiles/`` y se listan en ``/panel/reportes/perfiles/``.
+"""
+import cProfile
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+PROFILES_DIRNAME = "profiles"
+QUERY_FLAG = "_profile"
+HEADER_FLAG = "X-Profile"
+PROFILE_SUFFIXES = (".folded", ".prof")
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def profiles_dir():
+    return Path(settings.MEDIA_ROOT) / PROFILES_DIRNAME
+
+
+def list_profiles(limit=50):
+    """Perfiles guardados, del mas reciente al mas viejo."""
+    directory = profiles_dir()
+    if not directory.is_dir():
+        return []
+    entries = []
+    for path in directory.iterdir():
+        if path.suffix in PROFILE_SUFFIXES and path.is_file():
+            stat = path.stat()
+            taken = datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)
+            entries.append({"name": path.name, "size": stat.st_size, "taken_at": taken})
+    entries.sort(key=lambda entry: entry["taken_at"], reverse=True)
+    return entries[:limit]
+
+
+def _frame_label(code):
+    filename = code.co_filename
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base):
+        filename = filename[len(base) + 1 :]
+    elif "site-packages/" in filename:
+        filename = filename.split("site-packages/", 1)[1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class StackSampler:
+    """Toma la pila de un hilo a intervalos fijos desde un hilo aparte."""
+
+    def __init__(self, thread_id, stop_frame, interval):
+        self.thread_id = thread_id
+        self.stop_frame = stop_frame
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.stop_frame:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _requested_mode(request):
+    value = request.GET.get(QUERY_FLAG) or request.headers.get(HEADER_FLAG) or ""
+    if value == "cprofile":
+        return "cprofile"
+    if value in ("1", "true", "sample"):
+        return "sample"
+    return None
+
+
+def _profile_path(request, suffix):
+    match = getattr(request, "resolver_match", None)
+    view = match.view_name if match and match.view_name else "request"
+    stamp = timezone.now().strftime("%Y%m%d_%H%M%S_%f")
+    path = profiles_dir() / f"{stamp}_{_SAFE_NAME.sub('-', view)}{suffix}"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class ProfilerMiddleware:
+    """Perfila el request si lo pide un superusuario; ver el docstring del modulo."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILER_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = _requested_mode(request)
+        if mode is None or not getattr(request.user, "is_superuser", False):
+            return self.get_response(request)
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            response = profiler.runcall(self.get_response, request)
+            elapsed = time.perf_counter() - started
+            path = _profile_path(request, ".prof")
+            profiler.dump_stats(path)
+        else:
+            interval = getattr(settings, "PROFILER_INTERVAL_MS", 2) / 1000
+            sampler = StackSampler(threading.get_ident(), sys._getframe(), interval)
+            started = time.perf_counter()
+            sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+            elapsed = time.perf_counter() - started
+            path = _profile_path(request, ".folded")
+            path.write_text(sampler.folded(), encoding="utf-8")
+        response["X-Profile-File"] = path.name
+        response["X-Profile-Ms"] = f"{elapsed * 1000:.1f}"
+        return response
@@ -0,0 +1,91 @@
+"""Presupuesto de consultas por vista y deteccion de N+1.
+
+Cada request cuenta sus consultas por "forma" (el SQL con ``%s`` en lugar de
+los valores; las listas ``IN (...)`` cuentan como una sola forma). Si una
+forma se repite mas de ``max_repeats`` veces es un N+1; si el total pasa de
+``max_queries`` la vista se salio de su presupuesto. La primera vez que
+pasa se registra en el logger ``core.querybudget`` con la pila del codigo
+de la app, se cuenta en ``/metrics`` y, con ``QUERY_BUDGET_RAISE`` (activo
+al correr los tests), se lanza ``QueryBudgetExceeded``.
+
+El presupuesto se declara con ``@query_budget(...)`` en la vista o, por
+nombre de URL, en ``QUERY_BUDGETS``; lo que falte sale de
+``QUERY_BUDGET_MAX_QUERIES`` y ``QUERY_BUDGET_MAX_REPEATS``.
+"""
+import logging
+import re
+import traceback
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """La vista hizo mas consultas de las permitidas o un N+1."""
+
+
+def query_budget(max_queries=None, max_repeats=None):
+    """Declara el presupuesto de consultas de una vista."""
+
+    def decorator(view_func):
+        # Los decoradores externos (login_required, etc.) copian el atributo con wraps.
+        view_func.query_budget = {"max_queries": max_queries, "max_repeats": max_repeats}
+        return view_func
+
+    return decorator
+
+
+def resolve_budget(view_name, view_func):
+    """Presupuesto efectivo: ``QUERY_BUDGETS`` > decorador > defaults."""
+    budget = {
+        "max_queries": getattr(settings, "QUERY_BUDGET_MAX_QUERIES", None),
+        "max_repeats": getattr(settings, "QUERY_BUDGET_MAX_REPEATS", None),
+    }
+    for override in (getattr(view_func, "query_budget", None), getattr(settings, "QUERY_BUDGETS", {}).get(view_name)):
+        for key, value in (override or {}).items():
+            if value is not None:
+                budget[key] = value
+    return budget
+
+
+def query_shape(sql):
+    return _IN_LIST.sub("(%s, ...)", sql)
+
+
+def _app_stack():
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame
+        for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(base) and "site-packages" not in frame.filename
+    ]
+    return "".join(traceback.format_list(frames))
+
+
+class BudgetChecker:
+    """Revisa cada consulta contra el presupuesto; avisa una vez por tipo."""
+
+    def __init__(self, view, budget):
+        self.view = view
+        self.max_queries = budget.get("max_queries")
+        self.max_repeats = budget.get("max_repeats")
+        self.violations = []
+
+    def check(self, count, shape, repeats):
+        if self.max_repeats is not None and repeats == self.max_repeats + 1:
+            self._violation("n_plus_one", f"{repeats} consultas con la misma forma: {shape[:300]}")
+        if self.max_queries is not None and count == self.max_queries + 1:
+            self._violation("budget", f"mas de {self.max_queries} consultas")
+
+    def _violation(self, kind, detail):
+        from core.metrics import QUERY_BUDGET_VIOLATIONS
+
+        self.violations.append(kind)
+        QUERY_BUDGET_VIOLATIONS.labels(view=self.view, kind=kind).inc()
+        message = f"Presupuesto de consultas excedido en {self.view}: {detail}"
+        logger.warning("%s\n%s", message, _app_stack())
+        if getattr(settings, "QUERY_BUDGET_RAISE", False):
+            raise QueryBudgetExceeded(message)
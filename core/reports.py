@@ -0,0 +1,195 @@
+"""Corte de caja e ingresos mensuales sobre ``Payment``.
+
+Los totales salen de agregados agrupados en SQL (``values().annotate()``);
+Python solo acomoda las pocas filas ya agrupadas. Los periodos cerrados
+(dias y meses que ya terminaron) se guardan en el cache compartido
+(``CACHES`` en settings) porque sus pagos no cambian; la signal de
+``Payment`` de este modulo invalida la entrada al confirmar la correccion de
+un pago historico, incluido el periodo del que salio si se le cambio la fecha.
+"""
+import calendar
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from core.models import Payment
+
+
+CACHE_PREFIX = "reports:v1"
+CLOSED_PERIOD_TIMEOUT = 60 * 60 * 24 * 31
+NO_METHOD_LABEL = "Sin metodo"
+NO_AUTHOR_LABEL = "Sin usuario"
+ZERO = Decimal("0.00")
+
+
+def _aware(value):
+    return timezone.make_aware(datetime.combine(value, time.min), timezone.get_current_timezone())
+
+
+def _day_range(day):
+    return _aware(day), _aware(day + timedelta(days=1))
+
+
+def _month_range(year, month):
+    last_day = calendar.monthrange(year, month)[1]
+    return _aware(date(year, month, 1)), _aware(date(year, month, last_day) + timedelta(days=1))
+
+
+def _cash_close_key(day):
+    return f"{CACHE_PREFIX}:cash:{day.isoformat()}"
+
+
+def _revenue_key(year, month):
+    return f"{CACHE_PREFIX}:revenue:{year:04d}-{month:02d}"
+
+
+def invalidate_payment_reports(*created_ats):
+    """Borra del cache el dia y el mes de cada fecha de pago indicada."""
+    keys = set()
+    for created_at in created_ats:
+        if created_at is None:
+            continue
+        local = timezone.localtime(created_at)
+        keys.update([_cash_close_key(local.date()), _revenue_key(local.year, local.month)])
+    if keys:
+        cache.delete_many(sorted(keys))
+
+
+@receiver(post_init, sender=Payment)
+def _remember_payment_date(sender, instance, **kwargs):
+    # Fecha con la que se cargo el pago, para invalidar tambien ese periodo si cambia.
+    instance._reports_created_at = instance.__dict__.get("created_at")
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def _invalidate_on_payment_change(sender, instance, **kwargs):
+    # Al confirmar: un reporte leido antes del commit no se queda en cache.
+    dates = (getattr(instance, "_reports_created_at", None), instance.created_at)
+    instance._reports_created_at = instance.created_at
+    transaction.on_commit(lambda: invalidate_payment_reports(*dates))
+
+
+def _method_rows(grouped):
+    """Suma filas agrupadas por metodo; regresa ``(methods, total, count)``."""
+    methods = {}
+    for row in grouped:
+        label = row["method"] or NO_METHOD_LABEL
+        entry = methods.setdefault(label, {"method": label, "total": ZERO, "count": 0})
+        entry["total"] += row["total"]
+        entry["count"] += row["count"]
+    ordered = sorted(methods.values(), key=lambda entry: entry["method"].lower())
+    return ordered, sum((entry["total"] for entry in ordered), ZERO), sum(e["count"] for e in ordered)
+
+
+def cash_close(day):
+    """Corte de caja de ``day``: totales por recepcionista y por metodo.
+
+    Regresa un dict con ``cashiers`` (cada uno con sus ``methods``),
+    ``methods``, ``total``, ``count`` y ``closed``.
+    """
+    start, end = _day_range(day)
+    closed = end <= timezone.now()
+    key = _cash_close_key(day)
+    if closed:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    grouped = list(
+        Payment.objects.filter(created_at__gte=start, created_at__lt=end)
+        .order_by()
+        .values("author_id", "author__username", "method")
+        .annotate(total=Sum("amount"), count=Count("id"))
+    )
+    cashiers = {}
+    for row in grouped:
+        cashiers.setdefault(row["author_id"], []).append(row)
+    cashier_rows = []
+    for author_id, rows in cashiers.items():
+        methods, total, count = _method_rows(rows)
+        cashier_rows.append(
+            {
+                "author_id": author_id,
+                "username": rows[0]["author__username"] or NO_AUTHOR_LABEL,
+                "methods": methods,
+                "total": total,
+                "count": count,
+            }
+        )
+    cashier_rows.sort(key=lambda entry: entry["username"].lower())
+    methods, total, count = _method_rows(grouped)
+    report = {
+        "day": day,
+        "cashiers": cashier_rows,
+        "methods": methods,
+        "total": total,
+        "count": count,
+        "closed": closed,
+    }
+    if closed:
+        cache.set(key, report, CLOSED_PERIOD_TIMEOUT)
+    return report
+
+
+def monthly_revenue(year):
+    """Ingresos por mes y metodo de ``year`` (solo meses ya iniciados).
+
+    Los meses cerrados se leen del cache; los faltantes se calculan en un
+    solo query agrupado por ``TruncMonth``.
+    """
+    now = timezone.now()
+    months = {}
+    missing = []
+    for month in range(1, 13):
+        start, end = _month_range(year, month)
+        if start > now:
+            break
+        if end <= now:
+            cached = cache.get(_revenue_key(year, month))
+            if cached is not None:
+                months[month] = cached
+                continue
+        missing.append(month)
+
+    if missing:
+        start = _month_range(year, missing[0])[0]
+        end = _month_range(year, missing[-1])[1]
+        grouped = (
+            Payment.objects.filter(created_at__gte=start, created_at__lt=end)
+            .annotate(month=TruncMonth("created_at", tzinfo=timezone.get_current_timezone()))
+            .order_by()
+            .values("month", "method")
+            .annotate(total=Sum("amount"), count=Count("id"))
+        )
+        by_month = {}
+        for row in grouped:
+            by_month.setdefault(row["month"].month, []).append(row)
+        for month in missing:
+            methods, total, count = _method_rows(by_month.get(month, []))
+            closed = _month_range(year, month)[1] <= now
+            entry = {
+                "month": date(year, month, 1),
+                "methods": methods,
+                "total": total,
+                "count": count,
+                "closed": closed,
+            }
+            months[month] = entry
+            if closed:
+                cache.set(_revenue_key(year, month), entry, CLOSED_PERIOD_TIMEOUT)
+
+    rows = [months[month] for month in sorted(months)]
+    return {
+        "year": year,
+        "months": rows,
+        "total": sum((row["total"] for row in rows), ZERO),
+        "count": sum(row["count"] for row in rows),
+    }
@@ -0,0 +1,106 @@
+"""Reservas de inventario para partidas de cotizacion aceptadas.
+
+Disponible (available-to-promise) = ``qty`` - suma de reservas activas. Las
+reservas se crean al aceptar partidas con ``inventory_item``, se consumen al
+pasar la orden a READY (``apply_estimate_inventory``) y se liberan al
+rechazar o cancelar.
+"""
+import logging
+
+from django.db import models, transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+
+from core.models import EstimateItem, InventoryItem, Notification, StockReservation
+
+logger = logging.getLogger(__name__)
+
+
+def with_availability(queryset=None):
+    """Anota ``reserved_qty`` y ``available_qty`` en un solo query agregado."""
+    if queryset is None:
+        queryset = InventoryItem.objects.all()
+    return queryset.annotate(
+        reserved_qty=Coalesce(
+            Sum("reservations__qty", filter=Q(reservations__status=StockReservation.Status.ACTIVE)),
+            0,
+            output_field=models.IntegerField(),
+        ),
+    ).annotate(available_qty=models.F("qty") - models.F("reserved_qty"))
+
+
+def reserved_qty(item, *, exclude_order=None):
+    qs = StockReservation.objects.filter(item=item, status=StockReservation.Status.ACTIVE)
+    if exclude_order is not None:
+        qs = qs.exclude(order=exclude_order)
+    return qs.aggregate(total=Sum("qty"))["total"] or 0
+
+
+def available_qty(item, *, exclude_order=None):
+    return item.qty - reserved_qty(item, exclude_order=exclude_order)
+
+
+def reserve_estimate_items(estimate_items, *, order):
+    """Aparta stock para las partidas aceptadas con ``inventory_item``.
+
+    Regresa la lista de SKUs sin existencia suficiente; esas partidas quedan
+    sin reserva y se avisa en notificaciones de stock.
+    """
+    candidates = [
+        item
+        for item in estimate_items
+        if item.inventory_item_id and item.status == EstimateItem.Status.ACCEPTED
+    ]
+    if not candidates:
+        return []
+    shortages = []
+    with transaction.atomic():
+        item_ids = sorted({item.inventory_item_id for item in candidates})
+        locked = {
+            stock.pk: stock
+            for stock in InventoryItem.objects.select_for_update().filter(pk__in=item_ids).order_by("pk")
+        }
+        active = {
+            res.estimate_item_id: res
+            for res in StockReservation.objects.filter(
+                estimate_item__in=candidates, status=StockReservation.Status.ACTIVE
+            )
+        }
+        for est_item in candidates:
+            if est_item.pk in active:
+                continue
+            stock = locked[est_item.inventory_item_id]
+            if available_qty(stock) < est_item.qty:
+                shortages.append(stock.sku or stock.name)
+                continue
+            StockReservation.objects.update_or_create(
+                estimate_item=est_item,
+                defaults={
+                    "item": stock,
+                    "order": order,
+                    "qty": est_item.qty,
+                    "status": StockReservation.Status.ACTIVE,
+                },
+            )
+    if shortages:
+        try:
+            Notification.objects.create(
+                order=order,
+                kind="stock",
+                channel="reservation_shortage",
+                ok=False,
+                title=f"Sin stock para apartar {order.folio}",
+                payload={"order_id": order.pk, "order_folio": order.folio, "skus": shortages},
+            )
+        except Exception:
+            logger.exception("Error registrando notificacion de reserva")
+    return shortages
+
+
+def sync_estimate_reservations(estimate):
+    """Reserva partidas aceptadas y libera las rechazadas de una cotizacion."""
+    items = list(estimate.items.filter(inventory_item__isnull=False))
+    rejected = [item for item in items if item.status == EstimateItem.Status.REJECTED]
+    if rejected:
+        StockReservation.release(estimate_items=rejected)
+    return reserve_estimate_items(items, order=estimate.order)
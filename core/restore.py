@@ -0,0 +1,195 @@
+"""Restauracion y verificacion de respaldos de ``core.backups``.
+
+Siempre se restaura a destinos de prueba (nunca a la base ni al
+``MEDIA_ROOT`` en uso). La base se carga sin pasar por el ORM: SQLite es
+descomprimir el archivo y PostgreSQL es ``pg_restore --jobs`` (COPY por
+tabla). Despues se comparan filas y SHA-256 por tabla contra el manifiesto,
+y cada archivo de media se copia verificando su hash.
+"""
+import gzip
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from core.backups import (
+    COPY_BLOCK_SIZE,
+    BackupError,
+    backup_jobs,
+    backup_root,
+    find_object,
+    list_snapshots,
+    load_manifest,
+    open_database,
+    pg_connection_args,
+    pg_env,
+    run_command,
+    snapshots_dir,
+    table_checksums,
+)
+
+
+def resolve_snapshot(name, root=None):
+    names = list_snapshots(root)
+    if not names:
+        raise BackupError("No hay respaldos.")
+    if name in (None, "", "latest"):
+        return names[-1]
+    if name not in names:
+        raise BackupError(f"No existe el respaldo {name}.")
+    return name
+
+
+def default_scratch_dir(name, root=None):
+    return Path(root or backup_root()) / "restore" / name
+
+
+def _copy_verified(source, target, expected):
+    """Copia ``source`` (gzip si termina en .gz) a ``target``; ``True`` si el hash coincide."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    hasher = hashlib.sha256()
+    opener = gzip.open if source.suffix == ".gz" else open
+    with opener(source, "rb") as src, open(target, "wb") as dst:
+        for block in iter(lambda: src.read(COPY_BLOCK_SIZE), b""):
+            hasher.update(block)
+            dst.write(block)
+    return hasher.hexdigest() == expected
+
+
+def restore_database(manifest, snapshot_dir, *, target, jobs, using="default"):
+    """Carga la base del respaldo en ``target`` (ruta SQLite o nombre de base PostgreSQL)."""
+    connection = connections[using]
+    info = manifest["database"]
+    if info["vendor"] != connection.vendor:
+        raise BackupError(f"El respaldo es de {info['vendor']} y la conexion es {connection.vendor}.")
+    source = Path(snapshot_dir) / info["path"]
+    live = str(connection.settings_dict["NAME"])
+
+    if info["format"] == "sqlite":
+        target = Path(target)
+        if target.exists() and live and target.resolve() == Path(live).resolve():
+            raise BackupError("El destino es la base en uso; indica una base de prueba.")
+        tmp = target.with_name(target.name + ".tmp")
+        if not _copy_verified(source, tmp, info["sha256"]):
+            tmp.unlink(missing_ok=True)
+            raise BackupError("El archivo de la base no coincide con su SHA-256.")
+        os.replace(tmp, target)
+        return target
+
+    if info["format"] == "pg_directory":
+        target = str(target)
+        if target == live:
+            raise BackupError("El destino es la base en uso; indica una base de prueba.")
+        env = pg_env(connection.settings_dict)
+        args = pg_connection_args(connection.settings_dict)
+        run_command(["dropdb", "--if-exists", *args, target], env)
+        run_command(["createdb", *args, target], env)
+        run_command(
+            [
+                getattr(settings, "BACKUP_PG_RESTORE", "pg_restore"),
+                f"--jobs={max(1, jobs)}",
+                "--no-owner",
+                "--no-privileges",
+                "--exit-on-error",
+                "--dbname",
+                target,
+                *args,
+                str(source),
+            ],
+            env,
+        )
+        return target
+    raise BackupError(f"Formato de base desconocido: {info['format']}.")
+
+
+def verify_tables(manifest, target, using="default"):
+    """Lista de diferencias entre las tablas restauradas y el manifiesto."""
+    expected = manifest["database"].get("tables") or {}
+    restored = open_database(connections[using], target)
+    try:
+        actual = table_checksums(restored)
+    finally:
+        restored.close()
+    problems = []
+    for table, summary in sorted(expected.items()):
+        found = actual.get(table)
+        if found is None:
+            problems.append(f"{table}: falta la tabla")
+        elif found["rows"] != summary["rows"]:
+            problems.append(f"{table}: {found['rows']} filas, se esperaban {summary['rows']}")
+        elif found["sha256"] != summary["sha256"]:
+            problems.append(f"{table}: checksum distinto")
+    return problems, len(expected)
+
+
+def _check_media_dest(dest):
+    if dest.resolve() == Path(settings.MEDIA_ROOT).resolve():
+        raise BackupError("El destino es el MEDIA_ROOT en uso; indica una carpeta de prueba.")
+    if dest.exists() and any(dest.iterdir()):
+        raise BackupError(f"La carpeta {dest} no esta vacia.")
+
+
+def restore_media(manifest, dest, *, root=None, jobs=None):
+    """Copia la media del respaldo a ``dest`` verificando hashes; regresa los problemas."""
+    root = Path(root or backup_root())
+    dest = Path(dest)
+    _check_media_dest(dest)
+
+    def restore(entry):
+        source = find_object(root, entry["sha256"])
+        if source is None:
+            return f"{entry['path']}: falta el objeto {entry['sha256'][:12]}"
+        if not _copy_verified(source, dest / entry["path"], entry["sha256"]):
+            return f"{entry['path']}: SHA-256 distinto"
+        return None
+
+    with ThreadPoolExecutor(max_workers=jobs or backup_jobs(), thread_name_prefix="restore") as pool:
+        results = list(pool.map(restore, manifest.get("files", [])))
+    return [problem for problem in results if problem]
+
+
+def run_restore(name=None, *, root=None, db_target=None, media_dest=None, media=True, jobs=None, using="default"):
+    """Restaura y verifica un respaldo; regresa un reporte con tiempos por fase."""
+    root = Path(root or backup_root())
+    jobs = jobs or backup_jobs()
+    name = resolve_snapshot(name, root)
+    manifest = load_manifest(name, root)
+    scratch = default_scratch_dir(name, root)
+    scratch.mkdir(parents=True, exist_ok=True)
+    if db_target is None:
+        if manifest["database"]["format"] == "sqlite":
+            db_target = scratch / "db.sqlite3"
+        else:
+            db_target = f"{connections[using].settings_dict['NAME']}_restore"
+    if media:
+        if media_dest is None:
+            media_dest = scratch / "media"
+            shutil.rmtree(media_dest, ignore_errors=True)
+        media_dest = Path(media_dest)
+        _check_media_dest(media_dest)
+
+    report = {"name": name, "timings": {}, "problems": []}
+    started = time.monotonic()
+    target = restore_database(manifest, snapshots_dir(root) / name, target=db_target, jobs=jobs, using=using)
+    report["timings"]["database"] = time.monotonic() - started
+    report["database"] = str(target)
+
+    mark = time.monotonic()
+    problems, report["tables"] = verify_tables(manifest, target, using=using)
+    report["problems"] += problems
+    report["timings"]["verify"] = time.monotonic() - mark
+
+    report["files"] = 0
+    if media:
+        mark = time.monotonic()
+        report["problems"] += restore_media(manifest, media_dest, root=root, jobs=jobs)
+        report["files"] = len(manifest.get("files", []))
+        report["media"] = str(media_dest)
+        report["timings"]["media"] = time.monotonic() - mark
+    report["timings"]["total"] = time.monotonic() - started
+    return report
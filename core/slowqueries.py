@@ -0,0 +1,188 @@
+"""Registro de consultas lentas con su plan de ejecucion.
+
+El ``QueryRecorder`` de ``core.perf`` llama a ``record`` con cada consulta
+que tarda ``SLOW_QUERY_MS`` o mas. Se escribe una linea JSON con la huella
+del SQL (la misma forma que usa ``core.querybudget``), los parametros sin
+textos (solo tipo y largo), la vista y la linea de la app que la lanzo, y
+el ``EXPLAIN`` (PostgreSQL) o ``EXPLAIN QUERY PLAN`` (SQLite) de los SELECT.
+
+Los archivos rotan por dia (``slow_queries-AAAAmmdd.jsonl`` en
+``SLOW_QUERY_DIR``) y se conservan ``SLOW_QUERY_KEEP_DAYS``; cada linea se
+escribe con un solo ``write`` en modo append, asi que varios workers pueden
+compartir el archivo. ``python manage.py slow_queries`` resume los peores.
+"""
+import hashlib
+import json
+import os
+import re
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.querybudget import query_shape
+
+FILE_PREFIX = "slow_queries-"
+FILE_SUFFIX = ".jsonl"
+_WHITESPACE = re.compile(r"\s+")
+# Frames propios de la instrumentacion: no son "quien hizo la consulta".
+_SKIP_FILES = ("core/perf.py", "core/slowqueries.py", "core/querybudget.py")
+
+
+def threshold_ms():
+    return getattr(settings, "SLOW_QUERY_MS", 0) or None
+
+
+def log_dir():
+    return Path(getattr(settings, "SLOW_QUERY_DIR", Path(settings.BASE_DIR) / "logs"))
+
+
+def fingerprint(sql):
+    shape = _WHITESPACE.sub(" ", query_shape(sql)).strip()
+    return hashlib.md5(shape.encode()).hexdigest()[:12], shape
+
+
+def redact_params(params):
+    """Los textos pueden traer nombres o telefonos: se dejan solo tipo y largo."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: redact_params([value])[0] for key, value in params.items()}
+    redacted = []
+    for value in params:
+        if isinstance(value, (str, bytes, memoryview)):
+            redacted.append(f"<{type(value).__name__}:{len(value)}>")
+        elif value is None or isinstance(value, (bool, int, float)):
+            redacted.append(value)
+        else:
+            redacted.append(f"<{type(value).__name__}>")
+    return redacted
+
+
+def caller():
+    """``archivo:linea`` del frame de la app mas cercano a la consulta."""
+    base = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()):
+        filename = frame.filename
+        if not filename.startswith(base) or "site-packages" in filename:
+            continue
+        relative = filename[len(base) + 1 :]
+        if relative.replace(os.sep, "/") in _SKIP_FILES:
+            continue
+        return f"{relative}:{frame.lineno} ({frame.name})"
+    return None
+
+
+def explain(connection, sql, params):
+    """Plan de la consulta como lista de lineas; ``None`` si no aplica."""
+    if not getattr(settings, "SLOW_QUERY_EXPLAIN", True):
+        return None
+    if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    if connection.vendor == "postgresql":
+        prefix = "EXPLAIN "
+    elif connection.vendor == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        return None
+    if connection.vendor == "postgresql" and connection.needs_rollback:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except Exception as exc:  # el plan es informativo; nunca debe romper el request
+        return [f"EXPLAIN fallo: {type(exc).__name__}: {exc}"[:200]]
+    if connection.vendor == "sqlite":
+        return [str(row[-1]) for row in rows]
+    return [row[0] for row in rows]
+
+
+def _log_path(day):
+    return log_dir() / f"{FILE_PREFIX}{day:%Y%m%d}{FILE_SUFFIX}"
+
+
+def _prune(today):
+    keep = getattr(settings, "SLOW_QUERY_KEEP_DAYS", 14)
+    oldest = f"{FILE_PREFIX}{today - timedelta(days=keep - 1):%Y%m%d}{FILE_SUFFIX}"
+    for path in log_dir().glob(f"{FILE_PREFIX}*{FILE_SUFFIX}"):
+        if path.name < oldest:
+            path.unlink(missing_ok=True)
+
+
+def write_entry(entry):
+    today = timezone.localdate()
+    path = _log_path(today)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _prune(today)
+    line = (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o640)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+def record(connection, sql, params, many, duration_ms, view=None):
+    digest, shape = fingerprint(sql)
+    entry = {
+        "at": timezone.now().isoformat(timespec="seconds"),
+        "ms": round(duration_ms, 2),
+        "fingerprint": digest,
+        "sql": shape,
+        "params": None if many else redact_params(params),
+        "many": many,
+        "vendor": connection.vendor,
+        "view": view,
+        "caller": caller(),
+        "explain": None if many else explain(connection, sql, params),
+    }
+    write_entry(entry)
+    return entry
+
+
+def iter_entries(days=None, today=None):
+    """Entradas de los archivos de los ultimos ``days`` dias (todos si es ``None``)."""
+    today = today or timezone.localdate()
+    first = f"{FILE_PREFIX}{today - timedelta(days=days - 1):%Y%m%d}{FILE_SUFFIX}" if days else ""
+    for path in sorted(log_dir().glob(f"{FILE_PREFIX}*{FILE_SUFFIX}")):
+        if path.name < first:
+            continue
+        with open(path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # linea cortada por un proceso interrumpido
+
+
+def summarize(entries, sort="total"):
+    """Agrupa por huella: conteo, tiempo total/maximo, vistas y el ultimo plan."""
+    groups = {}
+    for entry in entries:
+        group = groups.get(entry["fingerprint"])
+        if group is None:
+            group = groups[entry["fingerprint"]] = {
+                "fingerprint": entry["fingerprint"],
+                "sql": entry["sql"],
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "views": set(),
+                "callers": set(),
+            }
+        group["count"] += 1
+        group["total_ms"] += entry["ms"]
+        group["max_ms"] = max(group["max_ms"], entry["ms"])
+        if entry.get("view"):
+            group["views"].add(entry["view"])
+        if entry.get("caller"):
+            group["callers"].add(entry["caller"])
+        if entry.get("explain"):
+            group["explain"] = entry["explain"]
+    key = {"total": "total_ms", "count": "count", "max": "max_ms"}[sort]
+    return sorted(groups.values(), key=lambda group: group[key], reverse=True)
+
@@ -0,0 +1,196 @@
+"""Almacenamiento de adjuntos direccionado por contenido.
+
+Cada archivo se guarda una sola vez en ``blobs/<aa>/<bb>/<sha256><ext>``: el
+hash se calcula mientras se copia a un temporal y, si el blob ya existe, el
+temporal se descarta. Varias filas de ``Attachment`` pueden apuntar al mismo
+blob; las referencias son las filas con ese ``file`` y el blob solo se borra
+cuando se va la ultima (``release_attachment_file``, al confirmar el borrado
+de la fila).
+
+Guardar y liberar blobs se serializa con un lock de archivo entre procesos.
+Aun asi, quien reutiliza un blob existente guarda su fila despues; por eso
+cada reutilizacion deja una marca y un blob reutilizado hace menos de
+``REUSE_GRACE_SECONDS`` no se borra (lo recoge ``sweep_orphan_blobs``).
+"""
+import contextlib
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+from pathlib import PurePosixPath
+
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin lock entre procesos.
+    fcntl = None
+
+BLOB_DIR = "blobs"
+REUSE_DIR = f"{BLOB_DIR}/reused"
+REUSE_GRACE_SECONDS = 60 * 60
+_BLOB_RE = re.compile(rf"^{BLOB_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})(\.[\w]+)?$")
+
+
+def blob_name(digest, ext=""):
+    ext = (ext or "").lower()
+    if ext and not re.fullmatch(r"\.[\w]{1,10}", ext):
+        ext = ""
+    return f"{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def digest_from_name(name):
+    """SHA-256 codificado en el nombre del blob, o ``None`` si es un archivo legado."""
+    match = _BLOB_RE.match(name or "")
+    return match.group("digest") if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # El nombre final depende del contenido; no hace falta buscar uno libre.
+        return name
+
+    @contextlib.contextmanager
+    def blob_lock(self):
+        """Lock exclusivo (entre workers) para colocar o borrar blobs."""
+        path = self.path(f"{BLOB_DIR}/.lock")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _reuse_marker(self, name):
+        digest = digest_from_name(name)
+        return self.path(f"{REUSE_DIR}/{digest}") if digest else None
+
+    def reused_recently(self, name, grace=REUSE_GRACE_SECONDS):
+        marker = self._reuse_marker(name)
+        try:
+            return marker is not None and time.time() - os.path.getmtime(marker) < grace
+        except OSError:
+            return False
+
+    def _place(self, path, final_name, *, keep=False):
+        """Mueve ``path`` a ``final_name``; si el blob ya existe lo marca como reutilizado.
+
+        Con ``keep`` el original se conserva (enlace duro o copia).
+        """
+        full_path = self.path(final_name)
+        with self.blob_lock():
+            if os.path.exists(full_path):
+                if not keep:
+                    os.unlink(path)
+                marker = self._reuse_marker(final_name)
+                os.makedirs(os.path.dirname(marker), exist_ok=True)
+                with open(marker, "a"):
+                    os.utime(marker)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                if keep:
+                    try:
+                        os.link(path, full_path)
+                    except OSError:
+                        shutil.copyfile(path, full_path)
+                else:
+                    os.replace(path, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        return final_name
+
+    def delete_blob(self, name):
+        self.delete(name)
+        marker = self._reuse_marker(name)
+        if marker and os.path.exists(marker):
+            os.unlink(marker)
+
+    def _save(self, name, content):
+        tmp_dir = self.path(f"{BLOB_DIR}/tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    handle.write(chunk)
+            final_name = self._place(tmp_path, blob_name(hasher.hexdigest(), PurePosixPath(name).suffix))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return final_name
+
+    def adopt_file(self, path, digest, ext="", *, keep=False):
+        """Mueve un archivo local ya verificado a su blob sin volver a copiarlo."""
+        return self._place(path, blob_name(digest, ext), keep=keep)
+
+    def save_exact(self, name, content):
+        """Guarda en ``name`` tal cual, reemplazando (derivados como miniaturas)."""
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(full_path))
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                for chunk in content.chunks():
+                    handle.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return name
+
+
+def attachment_storage():
+    return ContentAddressedStorage()
+
+
+def release_attachment_file(name, storage=None, *, grace=REUSE_GRACE_SECONDS):
+    """Borra el blob ``name`` y sus miniaturas si ya ninguna fila lo usa.
+
+    No se borra si otra subida lo reutilizo hace menos de ``grace`` segundos:
+    su fila puede no estar confirmada todavia.
+    """
+    from core.models import Attachment
+    from core.thumbnails import delete_thumbnails_for_name
+
+    if not name:
+        return False
+    storage = storage or Attachment._meta.get_field("file").storage
+    with storage.blob_lock():
+        if Attachment.objects.filter(file=name).exists() or storage.reused_recently(name, grace):
+            return False
+        delete_thumbnails_for_name(storage, name)
+        storage.delete_blob(name)
+    return True
+
+
+def sweep_orphan_blobs(storage=None, *, grace=REUSE_GRACE_SECONDS, dry_run=False):
+    """Blobs sin filas que ya pasaron el periodo de gracia; regresa sus nombres."""
+    from core.models import Attachment
+
+    storage = storage or Attachment._meta.get_field("file").storage
+    root = storage.path(BLOB_DIR)
+    orphans = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            name = PurePosixPath(os.path.relpath(os.path.join(dirpath, filename), storage.location)).as_posix()
+            if not digest_from_name(name) or Attachment.objects.filter(file=name).exists():
+                continue
+            if dry_run:
+                if not storage.reused_recently(name, grace):
+                    orphans.append(name)
+            elif release_attachment_file(name, storage, grace=grace):
+                orphans.append(name)
+    return sorted(orphans)
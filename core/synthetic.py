@@ -0,0 +1,535 @@
+"""Datos sinteticos a escala de produccion para pruebas de carga.
+
+``generate`` inserta inventario con movimientos, clientes con sus equipos y
+ordenes con varios equipos (M2M), historial de estados, cotizaciones con
+partidas decididas, pagos y notificaciones. Todo sale de un
+``random.Random(seed)`` y de una fecha final fija: con la misma semilla,
+parametros y base de partida se generan las mismas filas.
+
+Se inserta con ``bulk_create`` por lotes asignando las PK (sin ``save()`` ni
+signals; ``paid_amount`` y las existencias se calculan aqui) y al final se
+ajustan las secuencias de PostgreSQL. Las ordenes abiertas solo caen en los
+ultimos ``open_days`` dias, como en el taller real; las viejas estan
+entregadas o canceladas.
+"""
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+from datetime import time as dt_time
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.contrib.auth.models import Group, User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.jsonl import raw_timestamps
+from core.models import (
+    IVA_RATE,
+    Customer,
+    Device,
+    Estimate,
+    EstimateItem,
+    InventoryItem,
+    InventoryMovement,
+    Notification,
+    Payment,
+    ServiceOrder,
+    StatusHistory,
+)
+from core.permissions import ROLE_TECNICO
+
+TWO_PLACES = Decimal("0.01")
+Status = ServiceOrder.Status
+
+DEFAULTS = {
+    "customers": 100_000,
+    "orders": 250_000,
+    "inventory_items": 2_000,
+    "movements_per_item": 20,
+    "technicians": 8,
+    "days": 730,
+    "open_days": 30,
+    # Equipos por cliente y por orden: {cantidad: peso}.
+    "device_weights": {1: 70, 2: 20, 3: 10},
+    "order_device_weights": {1: 85, 2: 12, 3: 3},
+    # Estado final de las ordenes recientes; las viejas solo usan DONE y CANC.
+    "status_weights": {"NEW": 8, "REV": 12, "WAI": 8, "AUTH": 5, "READY": 12, "DONE": 45, "CANC": 10},
+    "estimate_ratio": 0.75,
+    "max_items_per_estimate": 5,
+    "accept_ratio": 0.7,
+    "payment_ratio": 0.9,
+    "notifications_per_order": 2,
+    # >1 concentra las ordenes en pocos clientes frecuentes.
+    "customer_skew": 2.0,
+    "batch_size": 5_000,
+}
+
+FIRST_NAMES = (
+    "Ana", "Luis", "Maria", "Jose", "Carmen", "Jorge", "Laura", "Pedro", "Sofia", "Miguel", "Lucia", "Diego",
+    "Elena", "Javier", "Paola", "Ricardo", "Fernanda", "Raul", "Daniela", "Hector", "Gabriela", "Oscar",
+)
+LAST_NAMES = (
+    "Hernandez", "Garcia", "Martinez", "Lopez", "Gonzalez", "Perez", "Rodriguez", "Sanchez", "Ramirez", "Cruz",
+    "Flores", "Gomez", "Morales", "Vazquez", "Reyes", "Jimenez", "Torres", "Diaz", "Gutierrez", "Ruiz",
+)
+DEVICE_MODELS = {
+    "HP": ("Pavilion 15", "ProBook 440 G8", "EliteBook 840", "Victus 16"),
+    "Dell": ("Inspiron 15", "Latitude 5420", "Vostro 3500", "XPS 13"),
+    "Lenovo": ("IdeaPad 3", "ThinkPad T14", "Legion 5", "Yoga 7"),
+    "Acer": ("Aspire 5", "Nitro 5", "Swift 3"),
+    "Asus": ("VivoBook 15", "TUF Gaming F15", "ZenBook 14"),
+    "Apple": ("MacBook Air M1", "MacBook Pro 13"),
+    "MSI": ("Katana 15", "Modern 14"),
+}
+PROBLEMS = (
+    "No enciende", "Pantalla rota", "Se calienta y se apaga", "Lento, revisar disco", "Teclado no responde",
+    "No carga la bateria", "Mantenimiento preventivo", "Reinstalar sistema", "Bisagra rota", "Derrame de liquido",
+)
+PARTS = (
+    ("SSD 512GB", Decimal("950.00")), ("SSD 1TB", Decimal("1650.00")), ("Memoria RAM 8GB", Decimal("700.00")),
+    ("Memoria RAM 16GB", Decimal("1250.00")), ("Pantalla 15.6 FHD", Decimal("2300.00")),
+    ("Teclado", Decimal("850.00")), ("Bateria", Decimal("1400.00")), ("Cargador 65W", Decimal("650.00")),
+    ("Ventilador", Decimal("480.00")), ("Bisagras", Decimal("600.00")), ("Pasta termica", Decimal("150.00")),
+)
+SERVICES = (
+    ("Mano de obra diagnostico", Decimal("350.00")), ("Limpieza interna", Decimal("450.00")),
+    ("Instalacion de sistema", Decimal("600.00")), ("Respaldo de informacion", Decimal("500.00")),
+)
+PAYMENT_METHODS = (("Efectivo", 50), ("Tarjeta", 30), ("Transferencia", 20))
+# Camino de estados hasta cada estado final (respeta STATUS_TRANSITIONS).
+STATUS_PATHS = {
+    Status.NEW: (Status.NEW,),
+    Status.IN_REVIEW: (Status.NEW, Status.IN_REVIEW),
+    Status.WAITING_PARTS: (Status.NEW, Status.IN_REVIEW, Status.WAITING_PARTS),
+    Status.REQUIRES_AUTH: (Status.NEW, Status.IN_REVIEW, Status.REQUIRES_AUTH),
+    Status.READY_PICKUP: (Status.NEW, Status.IN_REVIEW, Status.READY_PICKUP),
+    Status.DELIVERED: (Status.NEW, Status.IN_REVIEW, Status.READY_PICKUP, Status.DELIVERED),
+    Status.CANCELLED: (Status.NEW, Status.IN_REVIEW, Status.CANCELLED),
+}
+CLOSED_STATUSES = (Status.DELIVERED, Status.CANCELLED)
+
+
+def parse_weights(text, cast=str):
+    """``"NEW=5,DONE=40"`` -> ``{"NEW": 5.0, "DONE": 40.0}``."""
+    weights = {}
+    for part in filter(None, (chunk.strip() for chunk in text.split(","))):
+        key, sep, value = part.partition("=")
+        if not sep:
+            raise ValueError(f"Peso invalido: {part!r} (usa clave=peso).")
+        weights[cast(key.strip())] = float(value)
+    return weights
+
+
+class _Picker:
+    """Eleccion ponderada reutilizable sobre un ``random.Random``."""
+
+    def __init__(self, rng, weights):
+        self.rng = rng
+        self.values = list(weights)
+        self.cum_weights = []
+        total = 0
+        for value in self.values:
+            total += weights[value]
+            self.cum_weights.append(total)
+        if total <= 0:
+            raise ValueError("Los pesos deben sumar mas de cero.")
+
+    def __call__(self):
+        return self.rng.choices(self.values, cum_weights=self.cum_weights)[0]
+
+
+def _next_pk(model):
+    last = model._base_manager.order_by("-pk").values_list("pk", flat=True).first()
+    return (last or 0) + 1
+
+
+def _money(value):
+    return Decimal(value).quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+
+
+def _uuid(rng, pk):
+    # La PK en los bits bajos evita choques al correr dos veces con la misma semilla.
+    return uuid.UUID(int=rng.getrandbits(128) ^ pk, version=4)
+
+
+def _phone(rng):
+    return f"{rng.choice(('614', '656', '555', '818', '331'))}{rng.randrange(10**7):07d}"
+
+
+def _folio_counters():
+    """Consecutivo maximo por ano de los folios ``SR-NNNN-AAAA`` existentes."""
+    pattern = re.compile(r"^SR-(\d{4,})-(\d{4})$")
+    counters = {}
+    for folio in ServiceOrder.objects.filter(folio__startswith="SR-").values_list("folio", flat=True).iterator():
+        match = pattern.match(folio or "")
+        if match:
+            year = int(match.group(2))
+            counters[year] = max(counters.get(year, 0), int(match.group(1)))
+    return counters
+
+
+def _technicians(count):
+    group, _ = Group.objects.get_or_create(name=ROLE_TECNICO)
+    users = []
+    for index in range(1, count + 1):
+        user, created = User.objects.get_or_create(username=f"carga_tecnico{index:02d}")
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=["password"])
+            user.groups.add(group)
+        users.append(user.pk)
+    return users
+
+
+class _Generator:
+    def __init__(self, rng, options, end, batch_size, log):
+        self.rng = rng
+        self.opts = options
+        self.end = end
+        self.start = end - timedelta(days=options["days"])
+        self.batch_size = batch_size
+        self.log = log
+        self.counts = {}
+
+    def _insert(self, model, objects):
+        if objects:
+            model._base_manager.bulk_create(objects, batch_size=self.batch_size)
+            label = model._meta.label_lower
+            self.counts[label] = self.counts.get(label, 0) + len(objects)
+
+    def _when(self, fraction):
+        return self.start + (self.end - self.start) * fraction
+
+    # --- inventario -------------------------------------------------------
+
+    def inventory(self):
+        rng = self.rng
+        total = self.opts["inventory_items"]
+        item_pk = _next_pk(InventoryItem)
+        movement_pk = _next_pk(InventoryMovement)
+        self.item_prices = []
+        items, movements = [], []
+        for index in range(total):
+            name, price = rng.choice(PARTS)
+            pk = item_pk + index
+            qty = 0
+            for step in range(max(1, int(rng.expovariate(1 / self.opts["movements_per_item"])))):
+                if step == 0 or qty <= 0 or rng.random() < 0.15:
+                    delta, reason = rng.randint(5, 30), "Entrada de proveedor"
+                else:
+                    delta, reason = -rng.randint(1, min(3, qty)), "Salida por orden"
+                qty += delta
+                movements.append(
+                    InventoryMovement(
+                        pk=movement_pk,
+                        item_id=pk,
+                        delta=delta,
+                        reason=reason,
+                        created_at=self._when(rng.random()),
+                    )
+                )
+                movement_pk += 1
+            items.append(
+                InventoryItem(
+                    pk=pk,
+                    sku=f"SKU-{pk:06d}",
+                    name=f"{name} {rng.choice(('generico', 'original', 'compatible'))}",
+                    qty=qty,
+                    min_qty=rng.randint(1, 6),
+                    location=f"A{rng.randint(1, 9)}-{rng.randint(1, 20):02d}",
+                )
+            )
+            self.item_prices.append((pk, name, price))
+            if len(movements) >= self.batch_size:
+                self._flush_inventory(items, movements)
+                items, movements = [], []
+        self._flush_inventory(items, movements)
+
+    def _flush_inventory(self, items, movements):
+        with transaction.atomic():
+            self._insert(InventoryItem, items)
+            self._insert(InventoryMovement, movements)
+
+    # --- clientes y equipos -----------------------------------------------
+
+    def customers(self):
+        rng = self.rng
+        picker = _Picker(rng, self.opts["device_weights"])
+        customer_pk = _next_pk(Customer)
+        device_pk = _next_pk(Device)
+        self.customer_pks = []
+        self.customer_devices = []
+        brands = list(DEVICE_MODELS)
+        customers, devices = [], []
+        for index in range(self.opts["customers"]):
+            pk = customer_pk + index
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            customers.append(
+                Customer(
+                    pk=pk,
+                    name=f"{first} {last} {rng.choice(LAST_NAMES)}",
+                    phone=_phone(rng),
+                    alt_phone=_phone(rng) if rng.random() < 0.2 else "",
+                    email=f"{first}.{last}{pk}@example.com".lower() if rng.random() < 0.6 else "",
+                )
+            )
+            owned = []
+            for _ in range(int(picker())):
+                brand = rng.choice(brands)
+                devices.append(
+                    Device(
+                        pk=device_pk,
+                        customer_id=pk,
+                        brand=brand,
+                        model=rng.choice(DEVICE_MODELS[brand]),
+                        serial=f"{brand[:2].upper()}{rng.getrandbits(40):010X}",
+                        notes=rng.choice(PROBLEMS),
+                    )
+                )
+                owned.append(device_pk)
+                device_pk += 1
+            self.customer_pks.append(pk)
+            self.customer_devices.append(owned)
+            if len(customers) >= self.batch_size:
+                self._flush_customers(customers, devices)
+                customers, devices = [], []
+        self._flush_customers(customers, devices)
+
+    def _flush_customers(self, customers, devices):
+        with transaction.atomic():
+            self._insert(Customer, customers)
+            self._insert(Device, devices)
+
+    # --- ordenes ----------------------------------------------------------
+
+    def orders(self, technicians):
+        rng = self.rng
+        opts = self.opts
+        total = opts["orders"]
+        if not total or not self.customer_pks:
+            return
+        recent_picker = _Picker(rng, opts["status_weights"])
+        old_weights = {status: opts["status_weights"].get(status, 0) for status in CLOSED_STATUSES}
+        old_picker = _Picker(rng, old_weights if sum(old_weights.values()) > 0 else {Status.DELIVERED: 1})
+        device_picker = _Picker(rng, opts["order_device_weights"])
+        method_picker = _Picker(rng, dict(PAYMENT_METHODS))
+        open_since = self.end - timedelta(days=opts["open_days"])
+        folios = _folio_counters()
+        pks = {
+            model: _next_pk(model)
+            for model in (ServiceOrder, StatusHistory, Estimate, EstimateItem, Payment, Notification)
+        }
+        through = ServiceOrder.devices.through
+        customers = len(self.customer_pks)
+        batch = {model: [] for model in (ServiceOrder, through, StatusHistory, Estimate, EstimateItem, Payment, Notification)}
+
+        for index in range(total):
+            checkin = self._when((index + rng.random()) / total)
+            customer_index = min(customers - 1, int(customers * rng.random() ** opts["customer_skew"]))
+            owned = self.customer_devices[customer_index]
+            if not owned:
+                continue
+            order_devices = owned[: max(1, min(len(owned), int(device_picker())))]
+            status = recent_picker() if checkin >= open_since else old_picker()
+            year = timezone.localtime(checkin).year
+            folios[year] = folios.get(year, 0) + 1
+            order_pk = pks[ServiceOrder]
+            pks[ServiceOrder] += 1
+            assigned = rng.choice(technicians) if technicians and status != Status.NEW else None
+
+            # Historial: cada paso unas horas despues del anterior, sin pasar de la fecha final.
+            moments = [checkin]
+            for _ in STATUS_PATHS[status][1:]:
+                moments.append(min(self.end, moments[-1] + timedelta(hours=rng.uniform(2, 72))))
+            path = STATUS_PATHS[status]
+            for step, (from_status, to_status) in enumerate(zip(("",) + path[:-1], path)):
+                batch[StatusHistory].append(
+                    StatusHistory(
+                        pk=pks[StatusHistory],
+                        order_id=order_pk,
+                        from_status=from_status,
+                        status=to_status,
+                        author_id=assigned,
+                        author_role="Tecnico" if step else "Recepcion",
+                        created_at=moments[step],
+                    )
+                )
+                pks[StatusHistory] += 1
+
+            approved = Decimal("0.00")
+            if status != Status.NEW and rng.random() < opts["estimate_ratio"]:
+                approved = self._estimate(batch, pks, order_pk, order_devices, status, moments[1])
+            paid = self._payments(batch, pks, order_pk, status, approved, moments[-1], method_picker, assigned)
+
+            for offset in range(rng.randint(0, 2 * opts["notifications_per_order"])):
+                created = min(self.end, moments[min(offset, len(moments) - 1)] + timedelta(minutes=rng.randint(1, 90)))
+                batch[Notification].append(
+                    Notification(
+                        pk=pks[Notification],
+                        order_id=order_pk,
+                        kind="update",
+                        channel="status_change",
+                        ok=rng.random() < 0.97,
+                        title=f"Actualizacion SR-{folios[year]:04d}-{year}",
+                        payload={"order_folio": f"SR-{folios[year]:04d}-{year}", "status": status},
+                        seen_at=created + timedelta(hours=rng.uniform(0, 48)) if created < self.end - timedelta(days=3) else None,
+                        created_at=created,
+                    )
+                )
+                pks[Notification] += 1
+
+            batch[ServiceOrder].append(
+                ServiceOrder(
+                    pk=order_pk,
+                    customer_id=self.customer_pks[customer_index],
+                    device_id=order_devices[0],
+                    folio=f"SR-{folios[year]:04d}-{year}",
+                    token=_uuid(rng, order_pk),
+                    status=status,
+                    checkin_at=checkin,
+                    checkout_at=moments[-1] if status == Status.DELIVERED else None,
+                    notes=rng.choice(PROBLEMS),
+                    assigned_to_id=assigned,
+                    paid_amount=paid,
+                )
+            )
+            batch[through].extend(through(serviceorder_id=order_pk, device_id=device) for device in order_devices)
+            if len(batch[ServiceOrder]) >= self.batch_size:
+                self._flush_orders(batch)
+        self._flush_orders(batch)
+
+    def _estimate(self, batch, pks, order_pk, order_devices, status, created):
+        rng = self.rng
+        estimate_pk = pks[Estimate]
+        pks[Estimate] += 1
+        decided = status not in (Status.IN_REVIEW, Status.REQUIRES_AUTH)
+        decided_at = created + timedelta(hours=rng.uniform(1, 24)) if decided else None
+        subtotal = accepted = Decimal("0.00")
+        accepted_count = 0
+        count = rng.randint(1, self.opts["max_items_per_estimate"])
+        for _ in range(count):
+            inventory_pk = None
+            if self.item_prices and rng.random() < 0.6:
+                inventory_pk, description, price = rng.choice(self.item_prices)
+            else:
+                description, price = rng.choice(SERVICES)
+            qty = 1 if rng.random() < 0.85 else 2
+            if not decided:
+                item_status = EstimateItem.Status.PENDING
+            elif status != Status.CANCELLED and rng.random() < self.opts["accept_ratio"]:
+                item_status = EstimateItem.Status.ACCEPTED
+            else:
+                item_status = EstimateItem.Status.REJECTED
+            line = price * qty
+            subtotal += line
+            if item_status == EstimateItem.Status.ACCEPTED:
+                accepted += line
+                accepted_count += 1
+            batch[EstimateItem].append(
+                EstimateItem(
+                    pk=pks[EstimateItem],
+                    estimate_id=estimate_pk,
+                    description=description,
+                    qty=qty,
+                    unit_price=price,
+                    status=item_status,
+                    decided_at=decided_at,
+                    inventory_item_id=inventory_pk,
+                    device_id=rng.choice(order_devices) if len(order_devices) > 1 else None,
+                )
+            )
+            pks[EstimateItem] += 1
+
+        if not decided:
+            estimate_status = Estimate.Status.PENDING
+        elif accepted_count == count:
+            estimate_status = Estimate.Status.CLOSED_ACCEPTED
+        elif accepted_count:
+            estimate_status = Estimate.Status.CLOSED_PARTIAL
+        else:
+            estimate_status = Estimate.Status.CLOSED_REJECTED
+        tax = _money(subtotal * IVA_RATE)
+        batch[Estimate].append(
+            Estimate(
+                pk=estimate_pk,
+                order_id=order_pk,
+                created_at=created,
+                updated_at=decided_at or created,
+                approved_at=decided_at if accepted_count else None,
+                declined_at=decided_at if decided and not accepted_count else None,
+                subtotal=_money(subtotal),
+                tax=tax,
+                total=_money(subtotal) + tax,
+                token=_uuid(rng, estimate_pk),
+                status=estimate_status,
+            )
+        )
+        accepted = _money(accepted)
+        return accepted + _money(accepted * IVA_RATE)
+
+    def _payments(self, batch, pks, order_pk, status, approved, last_moment, method_picker, author):
+        rng = self.rng
+        if approved <= 0 or rng.random() >= self.opts["payment_ratio"]:
+            return Decimal("0.00")
+        if status == Status.DELIVERED:
+            amounts = [approved] if rng.random() < 0.7 else [_money(approved / 2), approved - _money(approved / 2)]
+        elif status == Status.READY_PICKUP and rng.random() < 0.3:
+            amounts = [_money(approved / 2)]
+        else:
+            return Decimal("0.00")
+        for position, amount in enumerate(amounts):
+            batch[Payment].append(
+                Payment(
+                    pk=pks[Payment],
+                    order_id=order_pk,
+                    amount=amount,
+                    method=method_picker(),
+                    author_id=author,
+                    created_at=last_moment - timedelta(hours=rng.uniform(0, 4)) * (len(amounts) - position),
+                )
+            )
+            pks[Payment] += 1
+        return sum(amounts, Decimal("0.00"))
+
+    def _flush_orders(self, batch):
+        if not batch[ServiceOrder]:
+            return
+        with transaction.atomic():
+            for model, objects in batch.items():
+                self._insert(model, objects)
+                objects.clear()
+        self.log(f"  {self.counts.get('core.serviceorder', 0)} ordenes")
+
+
+def generate(*, seed=1, until=None, log=None, **overrides):
+    """Genera los datos y regresa ``{modelo: filas insertadas}``."""
+    unknown = set(overrides) - set(DEFAULTS)
+    if unknown:
+        raise TypeError(f"Opciones desconocidas: {', '.join(sorted(unknown))}")
+    options = {**DEFAULTS, **{key: value for key, value in overrides.items() if value is not None}}
+    rng = random.Random(seed)
+    until = until or timezone.localdate()
+    end = timezone.make_aware(datetime.combine(until, dt_time(19, 0)))
+    log = log or (lambda message: None)
+    generator = _Generator(rng, options, end, options["batch_size"], log)
+    models = [InventoryItem, InventoryMovement, Customer, Device, ServiceOrder, StatusHistory, Estimate, EstimateItem, Payment, Notification]
+
+    started = time.monotonic()
+    with raw_timestamps(models):
+        technicians = _technicians(options["technicians"])
+        log("Inventario...")
+        generator.inventory()
+        log("Clientes y equipos...")
+        generator.customers()
+        log("Ordenes...")
+        generator.orders(technicians)
+    statements = connection.ops.sequence_reset_sql(no_style(), models + [ServiceOrder.devices.through])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+    generator.counts["seconds"] = round(time.monotonic() - started, 1)
+    return generator.counts
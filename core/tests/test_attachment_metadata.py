@@ -0,0 +1,84 @@
+import hashlib
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import Attachment, Customer, Device, ServiceOrder
+
+
+class AttachmentMetadataTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        User = get_user_model()
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pass123"))
+        self.customer = Customer.objects.create(name="Cliente", phone="5550001234")
+        self.device = Device.objects.create(customer=self.customer, brand="HP", model="G4")
+        self.order = ServiceOrder.objects.create(customer=self.customer, device=self.device)
+
+    def test_upload_stores_metadata_and_listing_skips_filesystem(self):
+        content = b"%PDF-1.4 manual"
+        upload = SimpleUploadedFile("manual.pdf", content, content_type="application/pdf")
+        self.client.post(reverse("order_attachments", args=[self.order.pk]), {"file": [upload]})
+        attachment = Attachment.objects.get()
+        self.assertEqual(
+            (attachment.size, attachment.content_type, attachment.sha256, attachment.is_image),
+            (len(content), "application/pdf", hashlib.sha256(content).hexdigest(), False),
+        )
+
+        storage = attachment.file.storage
+        with mock.patch.object(type(storage), "size", side_effect=AssertionError("stat")), \
+                mock.patch.object(type(storage), "open", side_effect=AssertionError("open")):
+            response = self.client.get(reverse("order_attachments", args=[self.order.pk]))
+        self.assertContains(response, "manual.pdf")
+        self.assertContains(response, f"?v={attachment.sha256[:16]}")
+
+    def test_order_list_counts_attachments_without_per_row_queries(self):
+        def list_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse("list_orders"), {"status": ServiceOrder.Status.NEW})
+            self.assertEqual(response.status_code, 200)
+            return ctx.captured_queries, response
+
+        Attachment.objects.create(service_order=self.order, file="legacy/a.pdf")
+        Attachment.objects.create(service_order=self.order, file="legacy/b.pdf")
+        queries, response = list_queries()
+        baseline = len(queries)
+        self.assertContains(response, "Adjuntos (2)")
+        sql = [query["sql"] for query in queries if '"core_attachment"' in query["sql"]]
+        # Solo la pagina calcula el conteo (subquery correlacionada); el total del paginador no.
+        self.assertEqual(len(sql), 1)
+        self.assertNotIn("COUNT(DISTINCT", sql[0])
+        self.assertIn('U0."service_order_id" = ("core_serviceorder"."id")', sql[0])
+        self.assertNotIn('JOIN "core_attachment"', sql[0])
+        for _ in range(5):
+            order = ServiceOrder.objects.create(customer=self.customer, device=self.device)
+            Attachment.objects.create(service_order=order, file="legacy/c.pdf")
+        self.assertEqual(len(list_queries()[0]), baseline)
+
+    def test_backfill_command_fills_legacy_rows(self):
+        storage = Attachment._meta.get_field("file").storage
+        name = storage.save_exact("attachments/2023/01/01/foto.jpg", ContentFile(b"\xff\xd8\xff foto"))
+        attachment = Attachment.objects.create(service_order=self.order, file=name)
+        out = StringIO()
+        call_command("backfill_attachment_metadata", stdout=out)
+
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.original_name, "foto.jpg")
+        self.assertEqual((attachment.size, attachment.content_type, attachment.is_image), (8, "image/jpeg", True))
+        self.assertEqual(attachment.sha256, hashlib.sha256(b"\xff\xd8\xff foto").hexdigest())
+        self.assertIn("Adjuntos actualizados: 1 de 1", out.getvalue())
@@ -0,0 +1,83 @@
+import csv
+import io
+import shutil
+import tempfile
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attachment, Customer, Device, ServiceOrder
+
+
+class AttachmentZipTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        User = get_user_model()
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pass123")
+        self.tech = User.objects.create_user("tecnico", password="pass123")
+        self.tech.groups.add(Group.objects.get_or_create(name="Tecnico")[0])
+        customer = Customer.objects.create(name="Cliente", phone="5550001234")
+        device = Device.objects.create(customer=customer, brand="HP", model="G4")
+        self.order = ServiceOrder.objects.create(customer=customer, device=device)
+        self.other = ServiceOrder.objects.create(customer=customer, device=device)
+        self._attach(self.order, "foto.jpg", b"\xff\xd8\xff foto", "Pantalla rota")
+        self._attach(self.order, "reporte.pdf", b"%PDF-1.4 " + b"texto " * 2000, "Diagnostico")
+        self._attach(self.other, "foto.jpg", b"\xff\xd8\xff otra", "")
+
+    def _attach(self, order, name, content, caption):
+        attachment = Attachment(service_order=order, original_name=name, caption=caption)
+        attachment.file.save(name, ContentFile(content))
+        return attachment
+
+    def _open_zip(self, response):
+        self.assertEqual(response["Content-Type"], "application/zip")
+        return zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+
+    def _manifest(self, archive):
+        return list(csv.DictReader(io.StringIO(archive.read("manifest.csv").decode("utf-8-sig"))))
+
+    def test_order_zip_streams_files_with_manifest(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("order_attachments_zip", args=[self.order.pk]))
+        archive = self._open_zip(response)
+
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ["foto.jpg", "reporte.pdf", "manifest.csv"])
+        self.assertEqual(archive.read("foto.jpg"), b"\xff\xd8\xff foto")
+        self.assertEqual(archive.getinfo("foto.jpg").compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(archive.getinfo("reporte.pdf").compress_type, zipfile.ZIP_DEFLATED)
+        manifest = self._manifest(archive)
+        self.assertEqual([row["Comentario"] for row in manifest], ["Pantalla rota", "Diagnostico"])
+        self.assertEqual(manifest[0]["Folio"], self.order.folio)
+
+        self.client.force_login(self.tech)
+        forbidden = self.client.get(reverse("order_attachments_zip", args=[self.order.pk]))
+        self.assertEqual(forbidden.status_code, 403)
+
+    def test_range_zip_groups_by_order_and_reports_missing_files(self):
+        missing = Attachment.objects.filter(service_order=self.other).first()
+        missing.file.storage.delete(missing.file.name)
+        self.client.force_login(self.admin)
+        today = timezone.localdate().isoformat()
+        response = self.client.get(reverse("panel_export_attachments"), {"start": today, "end": today})
+        archive = self._open_zip(response)
+
+        self.assertEqual(
+            sorted(archive.namelist()),
+            sorted([f"{self.order.folio}/foto.jpg", f"{self.order.folio}/reporte.pdf", "manifest.csv"]),
+        )
+        states = {row["Archivo"]: row["Estado"] for row in self._manifest(archive)}
+        self.assertEqual(states[f"{self.other.folio}/foto.jpg"], "Falta archivo")
+
+        bad = self.client.get(reverse("panel_export_attachments"), {"start": today})
+        self.assertEqual(bad.status_code, 400)
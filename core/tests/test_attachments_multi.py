@@ -42,5 +42,5 @@ class AttachmentMultiUploadTests(TestCase):
         self.assertEqual(response.status_code, 200)
         attachments = Attachment.objects.filter(service_order=self.order)
         self.assertEqual(attachments.count(), 1)
-        self.assertTrue(attachments.first().file.name.endswith("ok.pdf"))
+        self.assertEqual(attachments.first().display_name, "ok.pdf")
         self.assertContains(response, "excede 1 MB")
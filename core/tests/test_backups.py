@@ -0,0 +1,169 @@
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase, override_settings
+
+from core import backups
+from core.models import Customer
+
+
+class BackupEngineTests(TransactionTestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.media = self.tmp / "media"
+        self.root = self.tmp / "backups"
+        override = override_settings(MEDIA_ROOT=str(self.media), BACKUP_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self._write("attachments/2024/01/01/notas.txt", b"diagnostico " * 500)
+        self._write("blobs/ab/cd/" + "ab" + "cd" * 31 + ".jpg", b"\xff\xd8\xff foto")
+        self._write("blobs/ab/cd/.thumbs/miniatura.webp", b"derivado")
+        self._write("uploads/pendiente.part", b"a medias")
+        Customer.objects.create(name="Cliente Respaldo", phone="5550001234")
+
+    def _write(self, relative, content):
+        path = self.media / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        return path
+
+    def test_backup_is_incremental_and_restorable(self):
+        first = backups.run_backup(jobs=2, now=datetime(2024, 5, 1, 3, 0))
+        self.assertEqual(
+            sorted(entry["path"] for entry in first["files"]),
+            ["attachments/2024/01/01/notas.txt", "blobs/ab/cd/" + "ab" + "cd" * 31 + ".jpg"],
+        )
+        self.assertEqual(first["stats"]["new_objects"], 2)
+        text = next(e for e in first["files"] if e["path"].endswith(".txt"))
+        with gzip.open(backups.find_object(self.root, text["sha256"]), "rb") as handle:
+            self.assertEqual(handle.read(), b"diagnostico " * 500)
+
+        snapshot = self.root / "snapshots" / first["name"]
+        restored = self.tmp / "restored.sqlite3"
+        with gzip.open(snapshot / first["database"]["path"], "rb") as src, open(restored, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        with sqlite3.connect(restored) as db:
+            self.assertEqual(db.execute("select name from core_customer").fetchall(), [("Cliente Respaldo",)])
+
+        self._write("attachments/2024/01/02/nuevo.txt", b"otro archivo")
+        with mock.patch.object(backups, "_hash_file", wraps=backups._hash_file) as hashed:
+            second = backups.run_backup(jobs=2, now=datetime(2024, 5, 2, 3, 0))
+        self.assertEqual(second["stats"]["new_objects"], 1)
+        # Solo se calcula el hash del archivo nuevo y de la base.
+        self.assertEqual(hashed.call_count, 2)
+        self.assertEqual(backups.list_snapshots(), [first["name"], second["name"]])
+
+    def test_retention_keeps_daily_weekly_monthly_and_collects_objects(self):
+        start = datetime(2024, 1, 1, 3, 0)
+        names = [(start + timedelta(days=offset)).strftime(backups.SNAPSHOT_FORMAT) for offset in range(90)]
+        keep = backups.select_retained(names, daily=3, weekly=2, monthly=3)
+        self.assertEqual(
+            sorted(keep),
+            ["20240131_030000", "20240229_030000", "20240324_030000", "20240328_030000", "20240329_030000", "20240330_030000"],
+        )
+
+        old = backups.run_backup(jobs=1, now=datetime(2024, 4, 1, 3, 0))
+        (self.media / "attachments/2024/01/01/notas.txt").unlink()
+        backups.run_backup(jobs=1, now=datetime(2024, 4, 2, 3, 0))
+        text = next(e for e in old["files"] if e["path"].endswith(".txt"))
+        result = backups.prune_snapshots(daily=1, weekly=0, monthly=0)
+        self.assertEqual(result["removed"], [old["name"]])
+        self.assertIsNone(backups.find_object(self.root, text["sha256"]))
+
+    def test_prune_waits_for_backup_lock_and_spares_fresh_temporaries(self):
+        backups.run_backup(jobs=1, now=datetime(2024, 4, 1, 3, 0))
+        objects = self.root / "objects" / "00" / "00"
+        objects.mkdir(parents=True)
+        fresh = objects / ("0" * 64 + ".tmp-1-1")
+        stale = objects / ("0" * 64 + ".tmp-2-2")
+        fresh.write_bytes(b"copiando")
+        stale.write_bytes(b"abandonado")
+        old = time.time() - backups.TMP_GRACE_SECONDS - 60
+        os.utime(stale, (old, old))
+
+        done = threading.Event()
+        worker = threading.Thread(target=lambda: (backups.prune_snapshots(daily=1, weekly=0, monthly=0), done.set()))
+        with backups.backup_lock(self.root):
+            worker.start()
+            self.assertFalse(done.wait(0.3))
+        worker.join(10)
+        self.assertTrue(done.is_set())
+        self.assertTrue(fresh.exists())
+        self.assertFalse(stale.exists())
+
+    def test_postgres_uses_parallel_directory_dump(self):
+        settings_dict = {"NAME": "integrasys", "HOST": "127.0.0.1", "PORT": 5432, "USER": "integrasys", "PASSWORD": "s"}
+        command = backups.pg_dump_command(settings_dict, Path("/tmp/x.pgdump"), 4)
+        self.assertEqual(command[:4], ["pg_dump", "--format=directory", "--jobs=4", "--compress=6"])
+        self.assertEqual(command[-1], "integrasys")
+        self.assertEqual(backups.pg_env(settings_dict)["PGPASSWORD"], "s")
+
+    def test_command_reports_and_prunes(self):
+        out = StringIO()
+        call_command("backup_integrasys", "--jobs", "2", "--keep-daily", "1", stdout=out)
+        output = out.getvalue()
+        self.assertIn("2 archivos de media", output)
+        self.assertIn("Backup completado", output)
+        name = backups.list_snapshots()[0]
+        manifest = json.loads((self.root / "snapshots" / name / "manifest.json").read_text())
+        self.assertEqual(manifest["database"]["vendor"], "sqlite")
+
+
+class RestoreTests(TransactionTestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.media = self.tmp / "media"
+        self.root = self.tmp / "backups"
+        override = override_settings(MEDIA_ROOT=str(self.media), BACKUP_ROOT=self.root)
+        override.enable()
+        self.addCleanup(override.disable)
+        (self.media / "docs").mkdir(parents=True)
+        (self.media / "docs" / "nota.txt").write_bytes(b"contenido " * 100)
+        Customer.objects.create(name="Cliente Respaldo", phone="5550001234")
+        self.manifest = backups.run_backup(jobs=2, now=datetime(2024, 5, 1, 3, 0))
+
+    def test_restore_drill_verifies_tables_and_media(self):
+        self.assertEqual(self.manifest["database"]["tables"]["core_customer"]["rows"], 1)
+        out = StringIO()
+        call_command("restore_integrasys", "--jobs", "2", stdout=out)
+        self.assertIn("Restauracion verificada", out.getvalue())
+
+        scratch = self.root / "restore" / self.manifest["name"]
+        self.assertEqual((scratch / "media" / "docs" / "nota.txt").read_bytes(), b"contenido " * 100)
+        with sqlite3.connect(scratch / "db.sqlite3") as db:
+            self.assertEqual(db.execute("select count(*) from core_customer").fetchone(), (1,))
+
+    def test_restore_reports_tampered_data(self):
+        from core.restore import run_restore
+
+        entry = self.manifest["files"][0]
+        obj = backups.find_object(self.root, entry["sha256"])
+        with gzip.open(obj, "wb") as handle:
+            handle.write(b"alterado")
+        self.manifest["database"]["tables"]["core_customer"]["rows"] = 2
+        manifest_path = self.root / "snapshots" / self.manifest["name"] / "manifest.json"
+        manifest_path.write_text(json.dumps(self.manifest))
+
+        report = run_restore(jobs=1)
+        self.assertEqual(
+            report["problems"],
+            ["core_customer: 1 filas, se esperaban 2", "docs/nota.txt: SHA-256 distinto"],
+        )
+        with self.assertRaisesMessage(CommandError, "Verificacion fallida: 2 problemas"):
+            call_command("restore_integrasys", stdout=StringIO(), stderr=StringIO())
+        with self.assertRaisesMessage(CommandError, "MEDIA_ROOT en uso"):
+            call_command("restore_integrasys", "--media-dest", str(self.media), stdout=StringIO())
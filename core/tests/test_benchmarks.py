@@ -0,0 +1,103 @@
+import json
+import tempfile
+from datetime import date
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.benchmarks import BENCH_USERNAME, BenchmarkError, compare, run
+from core.models import Payment, ServiceOrder
+from core.synthetic import generate
+
+SCENARIOS = {
+    "list_orders",
+    "list_orders_search",
+    "list_orders_filters",
+    "list_orders_assignee",
+    "dashboard",
+    "order_detail",
+    "reception_new_order",
+    "add_payment",
+    "export_orders_csv",
+    "receipt_pdf",
+    "public_status",
+    "reception_customer_search",
+}
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate(seed=5, until=date(2026, 3, 1), customers=30, orders=80, inventory_items=5, technicians=2, days=60)
+
+    def test_runs_every_scenario_without_leaving_rows(self):
+        orders = ServiceOrder.objects.count()
+        payments = Payment.objects.count()
+        results = run(iterations=2, warmup=1)
+
+        self.assertEqual(set(results["scenarios"]), SCENARIOS)
+        self.assertEqual(results["dataset"]["orders"], orders)
+        for name, result in results["scenarios"].items():
+            self.assertLessEqual(result["p50_ms"], result["p99_ms"], name)
+            self.assertGreater(result["queries"], 0, name)
+            self.assertGreater(result["peak_kb"], 0, name)
+        self.assertGreater(results["scenarios"]["export_orders_csv"]["bytes"], 0)
+        self.assertEqual(ServiceOrder.objects.count(), orders)
+        self.assertEqual(Payment.objects.count(), payments)
+        self.assertFalse(User.objects.filter(username=BENCH_USERNAME).exists())
+
+    def test_add_payment_is_skipped_without_a_payable_order(self):
+        ServiceOrder.objects.filter(status=ServiceOrder.Status.READY_PICKUP).update(paid_amount=1)
+        messages = []
+        results = run(iterations=1, warmup=0, log=messages.append)
+        self.assertEqual(set(results["scenarios"]), SCENARIOS - {"add_payment"})
+        self.assertIn("add_payment: omitido, no hay orden lista con saldo por cobrar.", messages)
+        with self.assertRaisesMessage(BenchmarkError, "add_payment"):
+            run(iterations=1, warmup=0, only=["add_payment"])
+
+    def test_only_rejects_unknown_scenarios(self):
+        with self.assertRaises(BenchmarkError):
+            run(iterations=1, warmup=0, only=["no_existe"])
+
+    def test_compare_flags_slower_and_chattier_scenarios(self):
+        base = {"p50_ms": 10.0, "p95_ms": 20.0, "queries": 5, "peak_kb": 100}
+        baseline = {"scenarios": {"a": base, "b": base}}
+        current = {
+            "scenarios": {
+                "a": {**base, "p95_ms": 30.0, "queries": 6},
+                # +20% pero por debajo del piso de ruido: no cuenta.
+                "b": {**base, "p50_ms": 11.5},
+                "c": base,
+            }
+        }
+        self.assertEqual(
+            compare(current, baseline, tolerance=0.2),
+            [("a", "p95_ms", 20.0, 30.0), ("a", "queries", 5, 6)],
+        )
+
+    def test_command_writes_json_and_fails_on_regression(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "bench.json"
+            call_command(
+                "benchmark", "--iterations=1", "--warmup=0", "--only=public_status", f"--output={output}", stdout=StringIO()
+            )
+            result = json.loads(output.read_text(encoding="utf-8"))
+            self.assertEqual(list(result["scenarios"]), ["public_status"])
+
+            result["scenarios"]["public_status"]["queries"] = 0
+            baseline = Path(tmp) / "base.json"
+            baseline.write_text(json.dumps(result), encoding="utf-8")
+            with self.assertRaisesMessage(CommandError, "regresiones"):
+                call_command(
+                    "benchmark",
+                    "--iterations=1",
+                    "--warmup=0",
+                    "--only=public_status",
+                    f"--baseline={baseline}",
+                    "--fail-on-regression",
+                    stdout=StringIO(),
+                )
@@ -0,0 +1,164 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Attachment, Customer, Device, ServiceOrder, UploadSession
+from core.uploads import append_chunk, finish_upload, part_path, start_upload, upload_dir
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        User = get_user_model()
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pass123"))
+        customer = Customer.objects.create(name="Cliente", phone="5550001234")
+        device = Device.objects.create(customer=customer, brand="HP", model="G4")
+        self.order = ServiceOrder.objects.create(customer=customer, device=device)
+        self.content = b"%PDF-1.7\n" + bytes(range(256)) * 40
+
+    def _start(self, **data):
+        payload = {"filename": "manual.pdf", "size": len(self.content)}
+        payload.update(data)
+        return self.client.post(
+            reverse("attachment_upload_start", args=[self.order.pk]), payload, content_type="application/json"
+        )
+
+    def _put(self, url, offset, chunk, **headers):
+        return self.client.put(
+            url,
+            data=chunk,
+            content_type="application/octet-stream",
+            headers={"Upload-Offset": str(offset), **headers},
+        )
+
+    def test_resumable_upload_creates_attachment(self):
+        digest = hashlib.sha256(self.content).hexdigest()
+        state = self._start(sha256=digest, caption="Manual").json()
+        first, rest = self.content[:4000], self.content[4000:]
+
+        response = self._put(state["url"], 0, first, **{"Upload-Checksum": hashlib.sha256(first).hexdigest()})
+        self.assertEqual(response.json()["offset"], 4000)
+        # Reintento desfasado: el servidor indica desde donde continuar.
+        conflict = self._put(state["url"], 0, first)
+        self.assertEqual((conflict.status_code, conflict.json()["offset"]), (409, 4000))
+        self.assertEqual(self.client.get(state["url"]).json()["offset"], 4000)
+        self._put(state["url"], 4000, rest)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            finish = self.client.post(state["finish_url"])
+        self.assertEqual(finish.status_code, 201)
+        attachment = Attachment.objects.get(pk=finish.json()["attachment_id"])
+        self.assertEqual((attachment.original_name, attachment.caption), ("manual.pdf", "Manual"))
+        self.assertIn(digest, attachment.file.name)
+        with attachment.file.open("rb") as handle:
+            self.assertEqual(handle.read(), self.content)
+        session = UploadSession.objects.get()
+        self.assertEqual(session.status, UploadSession.Status.DONE)
+        self.assertFalse(part_path(session).exists())
+        # Finalizar de nuevo es idempotente.
+        self.assertEqual(self.client.post(state["finish_url"]).json()["attachment_id"], attachment.pk)
+
+    def test_failed_finish_keeps_the_part_for_a_retry(self):
+        session = start_upload(self.order, filename="manual.pdf", size=len(self.content))
+        append_chunk(session.pk, offset=0, stream=io.BytesIO(self.content), length=len(self.content))
+        with mock.patch.object(Attachment.objects, "create", side_effect=DatabaseError("caida")):
+            with self.assertRaises(DatabaseError):
+                finish_upload(session.pk)
+        session.refresh_from_db()
+        self.assertEqual(session.status, UploadSession.Status.OPEN)
+        self.assertTrue(part_path(session).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment, created = finish_upload(session.pk)
+        self.assertTrue(created)
+        self.assertFalse(part_path(session).exists())
+        with attachment.file.open("rb") as handle:
+            self.assertEqual(handle.read(), self.content)
+
+    def test_finish_without_part_file_is_an_upload_error(self):
+        session = start_upload(self.order, filename="manual.pdf", size=len(self.content))
+        append_chunk(session.pk, offset=0, stream=io.BytesIO(self.content), length=len(self.content))
+        part_path(session).unlink()
+        finish = self.client.post(reverse("attachment_upload_finish", args=[self.order.pk, session.pk]))
+        self.assertEqual(finish.status_code, 400)
+        self.assertIn("vuelve a subirlo", finish.json()["error"])
+
+    def test_unassigned_tecnico_cannot_start_or_resume_uploads(self):
+        state = self._start().json()
+        tech = get_user_model().objects.create_user("tecnico", password="pass123", is_staff=True)
+        tech.groups.add(Group.objects.get_or_create(name="Tecnico")[0])
+        self.client.force_login(tech)
+        self.assertEqual(self._start().status_code, 403)
+        self.assertEqual(self.client.get(state["url"]).status_code, 403)
+        self.assertEqual(self.client.post(state["finish_url"]).status_code, 403)
+
+    def test_type_is_checked_from_first_chunk_and_checksum_at_finish(self):
+        state = self._start().json()
+        bad = self._put(state["url"], 0, b"MZ\x90\x00" + self.content[4:])
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(UploadSession.objects.get().received, 0)
+
+        state = self._start(filename="otro.pdf", sha256="0" * 64).json()
+        self._put(state["url"], 0, self.content)
+        finish = self.client.post(state["finish_url"])
+        self.assertEqual(finish.status_code, 400)
+        self.assertFalse(Attachment.objects.exists())
+
+    def test_rejects_disallowed_types_and_oversized_files(self):
+        self.assertEqual(self._start(filename="setup.exe").status_code, 400)
+        with self.settings(CHUNKED_UPLOAD_MAX_MB=1):
+            self.assertEqual(self._start(size=2 * 1024 * 1024).status_code, 400)
+
+    def test_chunk_is_read_before_locking_the_session(self):
+        session = start_upload(self.order, filename="manual.pdf", size=len(self.content))
+        depth = len(connection.atomic_blocks)
+        seen = []
+
+        class SlowClient(io.BytesIO):
+            def read(self, size=-1):
+                seen.append(len(connection.atomic_blocks))
+                return super().read(size)
+
+        self.assertEqual(append_chunk(session.pk, offset=0, stream=SlowClient(self.content), length=4000), 4000)
+        self.assertEqual(set(seen), {depth})
+        self.assertEqual(part_path(session).read_bytes(), self.content[:4000])
+        self.assertEqual(sorted(os.listdir(upload_dir())), [f"{session.pk}.part"])
+
+    def test_cleanup_expires_stale_sessions_and_files(self):
+        stale = start_upload(self.order, filename="viejo.pdf", size=len(self.content))
+        append_chunk(stale.pk, offset=0, stream=io.BytesIO(self.content[:4000]), length=4000)
+        fresh = start_upload(self.order, filename="nuevo.pdf", size=len(self.content))
+        append_chunk(fresh.pk, offset=0, stream=io.BytesIO(self.content[:4000]), length=4000)
+        leftover = upload_dir() / f"{fresh.pk}.abc.chunk"
+        leftover.write_bytes(b"x")
+        old = time.time() - 3 * 24 * 3600
+        for path in (part_path(stale), leftover):
+            os.utime(path, (old, old))
+        UploadSession.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(days=3))
+
+        out = StringIO()
+        call_command("cleanup_attachments", stdout=out)
+        self.assertIn("Subidas canceladas: 1; archivos temporales borrados: 2", out.getvalue())
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, UploadSession.Status.ABORTED)
+        self.assertEqual(sorted(os.listdir(upload_dir())), [f"{fresh.pk}.part"])
+        self.assertEqual(self._put(reverse("attachment_upload_chunk", args=[self.order.pk, stale.pk]), 4000, b"x").status_code, 400)
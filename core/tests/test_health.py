@@ -0,0 +1,47 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+
+
+class HealthCheckTests(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.media = self.tmp / "media"
+
+    def test_healthz_skips_database_and_session(self):
+        with self.assertNumQueries(0):
+            response = self.client.get("/healthz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"ok")
+        self.assertEqual(response["Cache-Control"], "no-store")
+        self.assertNotIn("sessionid", response.cookies)
+        self.assertEqual(self.client.head("/healthz/").status_code, 200)
+
+    def test_readyz_reports_dependencies(self):
+        with override_settings(MEDIA_ROOT=self.media, BACKUP_ROOT=self.tmp / "backups"):
+            response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertTrue(body["checks"]["database"]["ok"])
+        self.assertIn("ms", body["checks"]["database"])
+        self.assertTrue(body["checks"]["media"]["ok"])
+        self.assertEqual(list(self.media.iterdir()), [])
+        self.assertEqual(body["checks"]["queues"]["uploads_open"], 0)
+        self.assertEqual(body["checks"]["queues"]["image_ingest_pending"], 0)
+        # Sin respaldos la app sigue sirviendo, pero se reporta.
+        self.assertIsNone(body["checks"]["backup"]["age_hours"])
+        self.assertEqual(body["status"], "degraded")
+
+    def test_readyz_fails_when_media_is_not_writable(self):
+        blocker = self.tmp / "not-a-dir"
+        blocker.write_text("x")
+        with override_settings(MEDIA_ROOT=blocker, BACKUP_ROOT=self.tmp / "backups"):
+            response = self.client.get("/readyz/")
+        self.assertEqual(response.status_code, 503)
+        body = response.json()
+        self.assertEqual(body["status"], "fail")
+        self.assertFalse(body["checks"]["media"]["ok"])
+        self.assertIn("error", body["checks"]["media"])
@@ -0,0 +1,115 @@
+import hashlib
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from PIL import Image
+
+from core import image_ingest
+from core.image_ingest import ingest_attachment
+from core.models import Attachment, Customer, Device, ServiceOrder
+from core.storage import blob_name
+from core.thumbnails import thumbnail_name
+
+
+def camera_jpeg(size=(1600, 1200)):
+    image = Image.effect_noise(size, 60).convert("RGB")
+    exif = Image.Exif()
+    exif[0x010F] = "Camara"
+    exif[0x0112] = 6  # girada 90 grados
+    exif.get_ifd(0x8825)[1] = "N"
+    buffer = BytesIO()
+    image.save(buffer, "JPEG", quality=95, exif=exif)
+    return buffer.getvalue()
+
+
+@override_settings(ATTACHMENT_IMAGE_INGEST=True, ATTACHMENT_IMAGE_MAX_PX=800, ATTACHMENT_INGEST_WORKERS=0)
+class ImageIngestTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        User = get_user_model()
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pass123"))
+        customer = Customer.objects.create(name="Cliente", phone="5550001234")
+        device = Device.objects.create(customer=customer, brand="HP", model="G4")
+        self.order = ServiceOrder.objects.create(customer=customer, device=device)
+
+    def _upload(self, name, data):
+        upload = SimpleUploadedFile(name, data, content_type="image/jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("order_attachments", args=[self.order.pk]), {"file": [upload]})
+        return Attachment.objects.get(original_name=name)
+
+    def test_upload_is_downsized_and_stripped_after_commit(self):
+        data = camera_jpeg()
+        attachment = self._upload("foto.jpg", data)
+        storage = attachment.file.storage
+
+        self.assertEqual(attachment.original_size, len(data))
+        self.assertEqual(attachment.size, storage.size(attachment.file.name))
+        self.assertLess(attachment.size, len(data))
+        with attachment.file.open("rb") as handle, Image.open(handle) as image:
+            self.assertEqual(image.size, (600, 800))
+            self.assertFalse(image.getexif())
+        self.assertTrue(storage.exists(thumbnail_name(attachment.file.name)))
+        # El blob original ya no tiene referencias y se borra.
+        self.assertFalse(storage.exists(blob_name(hashlib.sha256(data).hexdigest(), ".jpg")))
+
+    def test_processed_attachments_and_disabled_ingest_are_left_alone(self):
+        attachment = self._upload("foto.jpg", camera_jpeg())
+        name = attachment.file.name
+        self.assertFalse(ingest_attachment(attachment.pk))
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.file.name, name)
+
+        with self.settings(ATTACHMENT_IMAGE_INGEST=False):
+            raw = camera_jpeg((400, 300))
+            untouched = self._upload("chica.jpg", raw)
+        self.assertIsNone(untouched.original_size)
+        with untouched.file.open("rb") as handle:
+            self.assertEqual(handle.read(), raw)
+
+    def test_unprocessed_photos_are_retried(self):
+        with self.settings(ATTACHMENT_IMAGE_INGEST=False):
+            lost = self._upload("perdida.jpg", camera_jpeg())
+            recent = self._upload("reciente.jpg", camera_jpeg((400, 300)))
+        Attachment.objects.filter(pk=lost.pk).update(uploaded_at=timezone.now() - timedelta(hours=1))
+
+        out = StringIO()
+        call_command("ingest_pending_images", stdout=out)
+        self.assertIn("Fotos procesadas: 1; fallidas: 0.", out.getvalue())
+        lost.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertIsNotNone(lost.original_size)
+        self.assertLess(lost.size, lost.original_size)
+        self.assertIsNone(recent.original_size)
+
+    def test_queue_depth_counts_submitted_until_finished(self):
+        release = threading.Event()
+
+        with mock.patch.object(image_ingest, "ingest_attachment", lambda pk: release.wait(5)), mock.patch.object(
+            image_ingest, "close_old_connections"
+        ):
+            image_ingest._submit(1)
+            image_ingest._submit(2)
+            self.assertEqual(image_ingest.queue_depth(), 2)
+            release.set()
+            deadline = time.monotonic() + 5
+            while image_ingest.queue_depth() and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertEqual(image_ingest.queue_depth(), 0)
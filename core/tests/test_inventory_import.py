@@ -0,0 +1,116 @@
+import io
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from core.inventory_import import MODE_ABSOLUTE, import_inventory_csv
+from core.models import InventoryItem, InventoryMovement, Notification
+
+
+CSV_OK = (
+    "sku,name,qty,min_qty,location\n"
+    "ram-8,Memoria 8GB,10,2,A1\n"
+    "SSD-1,,5,,\n"
+    "FAN-1,Ventilador,,4,\n"
+)
+
+
+class InventoryImportTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pass123")
+        self.client.force_login(self.user)
+        self.ssd = InventoryItem.objects.create(sku="SSD-1", name="SSD 1TB", qty=3, min_qty=1, location="B2")
+        self.fan = InventoryItem.objects.create(sku="FAN-1", name="Fan", qty=7, min_qty=0)
+
+    def test_delta_import_upserts_items_and_movements(self):
+        result = import_inventory_csv(io.StringIO(CSV_OK), author=self.user)
+        self.assertTrue(result["applied"])
+        self.assertEqual(result["summary"]["create"], 1)
+        self.assertEqual(result["summary"]["update"], 2)
+
+        ram = InventoryItem.objects.get(sku="RAM-8")
+        self.assertEqual((ram.qty, ram.min_qty, ram.location), (10, 2, "A1"))
+        self.ssd.refresh_from_db()
+        self.assertEqual((self.ssd.qty, self.ssd.name, self.ssd.location), (8, "SSD 1TB", "B2"))
+        self.fan.refresh_from_db()
+        self.assertEqual((self.fan.qty, self.fan.min_qty, self.fan.name), (7, 4, "Ventilador"))
+
+        movements = InventoryMovement.objects.order_by("item__sku")
+        self.assertEqual([(m.item.sku, m.delta) for m in movements], [("RAM-8", 10), ("SSD-1", 5)])
+        self.assertTrue(all(m.author_id == self.user.pk for m in movements))
+
+    def test_absolute_mode_sets_stock(self):
+        csv_text = "sku,qty\nSSD-1,1\nFAN-1,7\n"
+        result = import_inventory_csv(io.StringIO(csv_text), mode=MODE_ABSOLUTE)
+        self.assertTrue(result["applied"])
+        self.ssd.refresh_from_db()
+        self.assertEqual(self.ssd.qty, 1)
+        self.assertEqual(list(InventoryMovement.objects.values_list("delta", flat=True)), [-2])
+
+    def test_import_sends_one_low_stock_summary(self):
+        csv_text = "sku,name,qty,min_qty\nSSD-1,,1,\nFAN-1,,6,\nLOW-1,Pasta,1,2\nLOW-2,Cable,1,1\n"
+        with self.captureOnCommitCallbacks(execute=True):
+            import_inventory_csv(io.StringIO(csv_text), mode=MODE_ABSOLUTE)
+        alert = Notification.objects.get(kind="stock", channel="low_stock_signal")
+        self.assertEqual(alert.payload["skus"], ["LOW-1", "LOW-2", "SSD-1"])
+        self.assertEqual(alert.title, "Stock bajo tras importacion: 3 items")
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("SSD-1 - SSD 1TB: 1 / min 1", mail.outbox[0].body)
+
+    def test_any_error_rejects_whole_file(self):
+        csv_text = "sku,name,qty\nNEW-1,Nuevo,4\nSSD-1,,-9\nNEW-2,,1\nNEW-1,Otro,1\n"
+        result = import_inventory_csv(io.StringIO(csv_text))
+        self.assertFalse(result["applied"])
+        self.assertEqual(len(result["errors"]), 1)
+        self.assertIn("repetido", result["errors"][0])
+        result = import_inventory_csv(io.StringIO("sku,name,qty\nNEW-1,Nuevo,4\nSSD-1,,-9\nNEW-2,,1\n"))
+        self.assertEqual(len(result["errors"]), 2)
+        self.assertFalse(InventoryItem.objects.filter(sku="NEW-1").exists())
+        self.assertFalse(InventoryMovement.objects.exists())
+
+    def test_view_preview_then_apply(self):
+        url = reverse("inventory_import")
+        upload = SimpleUploadedFile("inv.csv", CSV_OK.encode("utf-8"), content_type="text/csv")
+        response = self.client.post(url, {"file": upload, "mode": "delta", "action": "preview"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "RAM-8")
+        self.assertFalse(InventoryItem.objects.filter(sku="RAM-8").exists())
+
+        # Se aplica lo previsualizado sin volver a subir el archivo.
+        token = response.context["token"]
+        self.assertTrue(token)
+        response = self.client.post(url, {"token": token, "action": "apply"})
+        self.assertRedirects(response, reverse("inventory_list"))
+        self.assertTrue(InventoryItem.objects.filter(sku="RAM-8").exists())
+        self.assertEqual(InventoryItem.objects.get(sku="SSD-1").qty, 8)
+
+        response = self.client.post(url, {"token": token, "action": "apply"})
+        self.assertRedirects(response, reverse("inventory_import"))
+        self.assertEqual(InventoryItem.objects.get(sku="SSD-1").qty, 8)
+
+    def test_view_applies_a_direct_upload(self):
+        upload = SimpleUploadedFile("inv.csv", CSV_OK.encode("utf-8"), content_type="text/csv")
+        response = self.client.post(reverse("inventory_import"), {"file": upload, "mode": "delta", "action": "apply"})
+        self.assertRedirects(response, reverse("inventory_list"))
+        self.assertTrue(InventoryItem.objects.filter(sku="RAM-8").exists())
+
+    def test_command_dry_run_and_errors(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "inv.csv"
+            path.write_text(CSV_OK, encoding="utf-8")
+            out = io.StringIO()
+            call_command("import_inventory", str(path), "--dry-run", stdout=out)
+            self.assertIn("Dry-run", out.getvalue())
+            self.assertFalse(InventoryItem.objects.filter(sku="RAM-8").exists())
+
+            path.write_text("sku,qty\nNOPE,1\n", encoding="utf-8")
+            with self.assertRaises(CommandError):
+                call_command("import_inventory", str(path), stdout=io.StringIO(), stderr=io.StringIO())
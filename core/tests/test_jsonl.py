@@ -0,0 +1,68 @@
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from core.jsonl import default_models, dump_jsonl, load_jsonl
+from core.models import Customer, Device, Estimate, Payment, ServiceOrder
+
+
+class JsonlDumpLoadTests(TestCase):
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.user = get_user_model().objects.create_user("recep", password="pass123")
+        customer = Customer.objects.create(name="Ramón Núñez", phone="5550001234")
+        laptop = Device.objects.create(customer=customer, brand="HP", model="G4")
+        charger = Device.objects.create(customer=customer, brand="HP", model="Cargador")
+        self.order = ServiceOrder.objects.create(customer=customer, device=laptop, assigned_to=self.user)
+        self.order.devices.set([laptop, charger])
+        self.warranty = ServiceOrder.objects.create(customer=customer, device=laptop, warranty_parent=self.order)
+        Estimate.objects.create(order=self.order, subtotal=Decimal("100.00"))
+        Payment.objects.create(order=self.order, amount=Decimal("50.00"), author=self.user)
+        old = timezone.now() - timedelta(days=400, microseconds=123457)
+        ServiceOrder.objects.filter(pk=self.order.pk).update(checkin_at=old)
+        self.checkin_at = old
+
+    def _wipe(self):
+        for model in reversed(default_models()):
+            model._base_manager.all()._raw_delete(model._base_manager.db)
+
+    def test_round_trip_keeps_relations_and_timestamps(self):
+        manifest = dump_jsonl(self.tmp, batch_size=2)
+        labels = [entry["model"] for entry in manifest["models"]]
+        self.assertLess(labels.index("core.customer"), labels.index("core.serviceorder"))
+        self.assertLess(labels.index("core.serviceorder"), labels.index("core.serviceorder_devices"))
+        with open(self.tmp / "core.customer.jsonl", encoding="utf-8") as handle:
+            self.assertIn("Ramón Núñez", handle.readline())
+
+        self._wipe()
+        self.assertFalse(ServiceOrder.objects.exists())
+        counts = load_jsonl(self.tmp, batch_size=2)
+        self.assertEqual(counts["core.serviceorder"], 2)
+
+        order = ServiceOrder.objects.get(pk=self.order.pk)
+        self.assertEqual(order.checkin_at, self.checkin_at)
+        self.assertEqual(order.assigned_to, self.user)
+        self.assertEqual(sorted(order.devices.values_list("model", flat=True)), ["Cargador", "G4"])
+        self.assertEqual(ServiceOrder.objects.get(pk=self.warranty.pk).warranty_parent_id, order.pk)
+        self.assertEqual(order.estimate.subtotal, Decimal("100.00"))
+        self.assertEqual(order.paid_amount, Decimal("50.00"))
+
+    def test_commands_refuse_non_empty_database(self):
+        out = StringIO()
+        call_command("dump_jsonl", str(self.tmp), stdout=out)
+        self.assertIn("Volcadas", out.getvalue())
+        manifest = json.loads((self.tmp / "manifest.json").read_text())
+        self.assertEqual(sum(entry["rows"] for entry in manifest["models"] if entry["model"] == "core.payment"), 1)
+        with self.assertRaisesMessage(CommandError, "ya tiene datos"):
+            call_command("load_jsonl", str(self.tmp), stdout=StringIO())
@@ -0,0 +1,93 @@
+import re
+from datetime import date
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, Sum
+from django.test import TestCase
+
+from core.jsonl import default_models
+from core.models import Customer, Estimate, EstimateItem, InventoryItem, Payment, ServiceOrder, StatusHistory
+from core.synthetic import generate, parse_weights
+
+SMALL = {"customers": 40, "orders": 120, "inventory_items": 10, "movements_per_item": 4, "technicians": 2, "days": 90}
+
+
+class GenerateLoadDataTests(TestCase):
+    def _snapshot(self):
+        return list(
+            ServiceOrder.objects.order_by("pk").values_list("folio", "token", "status", "checkin_at", "paid_amount")
+        ), list(EstimateItem.objects.order_by("pk").values_list("description", "qty", "status"))
+
+    def _wipe(self):
+        for model in reversed(default_models()):
+            model._base_manager.all()._raw_delete(model._base_manager.db)
+
+    def test_same_seed_generates_same_rows(self):
+        counts = generate(seed=7, until=date(2026, 3, 1), batch_size=25, **SMALL)
+        self.assertEqual(counts["core.customer"], 40)
+        self.assertEqual(counts["core.serviceorder"], 120)
+        first = self._snapshot()
+
+        self._wipe()
+        generate(seed=7, until=date(2026, 3, 1), batch_size=50, **SMALL)
+        self.assertEqual(self._snapshot(), first)
+
+        self._wipe()
+        generate(seed=8, until=date(2026, 3, 1), **SMALL)
+        self.assertNotEqual(self._snapshot(), first)
+
+    def test_rows_are_consistent(self):
+        generate(seed=3, until=date(2026, 3, 1), **SMALL)
+        folios = list(ServiceOrder.objects.values_list("folio", flat=True))
+        self.assertTrue(all(re.fullmatch(r"SR-\d{4}-\d{4}", folio) for folio in folios))
+        self.assertEqual(ServiceOrder.objects.annotate(n=Count("devices")).filter(n=0).count(), 0)
+        self.assertFalse(InventoryItem.objects.filter(qty__lt=0).exists())
+
+        for order in ServiceOrder.objects.annotate(paid=Sum("payments__amount")):
+            self.assertEqual(order.paid_amount, order.paid or 0)
+            self.assertEqual(order.history.order_by("-created_at", "-pk").first().status, order.status)
+            self.assertEqual(order.checkout_at is not None, order.status == ServiceOrder.Status.DELIVERED)
+            self.assertIn(order.device_id, order.devices.values_list("pk", flat=True))
+        for estimate in Estimate.objects.exclude(status=Estimate.Status.PENDING):
+            self.assertFalse(estimate.items.filter(status=EstimateItem.Status.PENDING).exists())
+
+    def test_appends_to_existing_data(self):
+        generate(seed=1, until=date(2026, 3, 1), **SMALL)
+        generate(seed=1, until=date(2026, 3, 1), **SMALL)
+        self.assertEqual(Customer.objects.count(), 80)
+        self.assertEqual(ServiceOrder.objects.values("folio").distinct().count(), 240)
+        self.assertEqual(StatusHistory.objects.filter(order__isnull=True).count(), 0)
+        # Las secuencias siguen despues de las PK asignadas.
+        self.assertGreater(Payment.objects.create(order=ServiceOrder.objects.first(), amount=1).pk, 0)
+
+    def test_command_reports_counts(self):
+        out = StringIO()
+        call_command(
+            "generate_load_data",
+            "--customers=5",
+            "--orders=10",
+            "--inventory-items=2",
+            "--technicians=1",
+            "--status-weights=DONE=1",
+            "--until=2026-03-01",
+            "--yes",
+            stdout=out,
+        )
+        self.assertIn("core.serviceorder: 10", out.getvalue())
+        self.assertEqual(set(ServiceOrder.objects.values_list("status", flat=True)), {ServiceOrder.Status.DELIVERED})
+
+    def test_command_requires_debug_or_confirmation(self):
+        with self.assertRaisesMessage(CommandError, "DEBUG esta apagado"):
+            call_command("generate_load_data", "--orders=1", stdout=StringIO())
+        self.assertFalse(ServiceOrder.objects.exists())
+        with self.settings(DEBUG=True):
+            call_command("generate_load_data", "--customers=1", "--orders=1", "--inventory-items=1", stdout=StringIO())
+        self.assertEqual(ServiceOrder.objects.count(), 1)
+
+    def test_command_rejects_bad_weights(self):
+        with self.assertRaises(CommandError):
+            call_command("generate_load_data", "--status-weights=LISTO=1", "--force", stdout=StringIO())
+        with self.assertRaises(ValueError):
+            parse_weights("1:70")
@@ -0,0 +1,113 @@
+from datetime import date
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer
+from django.db import connection
+from django.test import LiveServerTestCase, override_settings
+from django.test.testcases import LiveServerThread
+
+from core.loadtest import CONTENTION_POINTS, RECEPTION_PREFIX, TECHNICIAN_PREFIX, LoadTest
+from core.models import Payment, ServiceOrder
+from core.synthetic import generate
+
+
+class _SerialWSGIServer(ThreadedWSGIServer):
+    # Con SQLite en memoria todos los requests comparten una sola conexion:
+    # atenderlos en paralelo mezclaria sus transacciones. Los usuarios
+    # virtuales siguen siendo concurrentes; el servidor los atiende en fila.
+    def process_request(self, request, client_address):
+        self.process_request_thread(request, client_address)
+
+
+class _SerialLiveServerThread(LiveServerThread):
+    server_class = _SerialWSGIServer
+
+
+class _LoadTestCase(LiveServerTestCase):
+    def setUp(self):
+        generate(seed=2, until=date(2026, 3, 1), customers=10, orders=0, inventory_items=3, technicians=0)
+
+    def _run(self, **overrides):
+        options = {
+            "receptionists": 1,
+            "technicians": 1,
+            "duration": 0.5,
+            "drain": 60,
+            "think_time": 0,
+            "hot_skus": 2,
+            "seed": 1,
+        }
+        options.update(overrides)
+        return LoadTest(self.live_server_url, **options).run()
+
+
+# El contador de core.perf se engancha a la conexion, que el hilo de la prueba
+# tambien usa mientras el servidor atiende.
+@override_settings(QUERY_BUDGET_RAISE=False, PERF_SERVER_TIMING="all")
+class LoadTestFlowTests(_LoadTestCase):
+    """Flujo completo y reporte, con el servidor atendiendo un request a la vez.
+
+    Por eso aqui no hay contencion real en folio ni stock: eso lo cubre
+    ``ConcurrentLoadTestTests`` (solo PostgreSQL) y la corrida contra Gunicorn.
+    """
+
+    server_thread_class = _SerialLiveServerThread
+
+    def test_flow_reaches_delivery_with_payment_and_receipt(self):
+        report = self._run()
+
+        flows = report["flows"]
+        self.assertGreater(flows["started"], 0)
+        self.assertEqual(flows["completed"], flows["started"], flows["errors"])
+        self.assertEqual(flows["orders_by_status"], {ServiceOrder.Status.DELIVERED: flows["started"]})
+        self.assertEqual(report["errors"], 0, report["http_errors"])
+        self.assertEqual(Payment.objects.filter(order__notes="Prueba de carga").count(), flows["started"])
+
+        endpoints = {row["endpoint"] for row in report["endpoints"]}
+        for label in ("reception_customer_search", "assign_tech", "change_status:REV", "estimate_send", "receipt_pdf"):
+            self.assertIn(label, endpoints)
+        self.assertEqual([row["endpoint"] for row in report["contention"]], [label for label, _ in CONTENTION_POINTS])
+        # PERF_SERVER_TIMING="all": el Server-Timing da el tiempo en base sin hacer staff a nadie.
+        self.assertIsNotNone(report["contention"][0]["db_p95_ms"])
+        self.assertFalse(User.objects.get(username=f"{RECEPTION_PREFIX}01").is_staff)
+        self.assertFalse(User.objects.get(username=f"{TECHNICIAN_PREFIX}01").has_usable_password())
+
+    def test_command_prints_summary(self):
+        out = StringIO()
+        call_command(
+            "load_test",
+            f"--base-url={self.live_server_url}",
+            "--receptionists=1",
+            "--technicians=1",
+            "--duration=0.2",
+            "--think-time=0",
+            "--yes",
+            stdout=out,
+        )
+        output = out.getvalue()
+        self.assertIn("req/s", output)
+        self.assertIn("Contencion", output)
+
+    def test_command_requires_debug_or_confirmation(self):
+        with self.assertRaisesMessage(CommandError, "DEBUG esta apagado"):
+            call_command("load_test", f"--base-url={self.live_server_url}", stdout=StringIO())
+        self.assertFalse(User.objects.filter(username__startswith=TECHNICIAN_PREFIX).exists())
+
+
+@skipUnless(connection.vendor == "postgresql", "SQLite en memoria comparte una conexion entre hilos.")
+class ConcurrentLoadTestTests(_LoadTestCase):
+    """Requests en paralelo: varias recepcionistas piden folio y stock a la vez."""
+
+    def test_concurrent_users_keep_folios_and_stock_consistent(self):
+        report = self._run(receptionists=3, technicians=3, duration=2)
+
+        flows = report["flows"]
+        self.assertGreater(flows["started"], 3)
+        self.assertEqual(report["errors"], 0, report["http_errors"])
+        self.assertEqual(flows["orders_by_status"], {ServiceOrder.Status.DELIVERED: flows["started"]})
+        orders = ServiceOrder.objects.filter(notes="Prueba de carga")
+        self.assertEqual(orders.values("folio").distinct().count(), flows["started"])
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import pdf_render_timer
+from core.models import Customer, Device, InventoryItem, Notification, ServiceOrder
+
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        customer = Customer.objects.create(name="Cliente", phone="5550001234")
+        device = Device.objects.create(customer=customer, brand="HP", model="G4")
+        ServiceOrder.objects.create(customer=customer, device=device)
+        ServiceOrder.objects.create(customer=customer, device=device, status=ServiceOrder.Status.READY_PICKUP)
+        InventoryItem.objects.create(sku="SSD-1", name="SSD", qty=1, min_qty=3)
+        InventoryItem.objects.create(sku="RAM-1", name="RAM", qty=5, min_qty=3)
+        Notification.objects.create(kind="email", channel="status", ok=False)
+
+    def test_exports_business_gauges_and_request_histograms(self):
+        admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pass123")
+        self.client.force_login(admin)
+        self.client.get(reverse("list_orders"))
+        with pdf_render_timer("receipt"):
+            pass
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn('integrasys_orders{status="NEW"} 1.0', body)
+        self.assertIn('integrasys_orders{status="READY"} 1.0', body)
+        self.assertIn('integrasys_orders{status="CANC"} 0.0', body)
+        self.assertIn("integrasys_low_stock_skus 1.0", body)
+        self.assertIn("integrasys_notifications_unread 1.0", body)
+        self.assertIn("integrasys_email_failures_24h 1.0", body)
+        self.assertIn('integrasys_request_duration_seconds_count{method="GET",view="list_orders"}', body)
+        self.assertIn('integrasys_request_db_queries_bucket{le="+Inf",view="list_orders"}', body)
+        self.assertIn('integrasys_pdf_render_seconds_count{document="receipt"}', body)
+
+    def test_business_gauges_are_cached(self):
+        self.client.get("/metrics")
+        with self.assertNumQueries(0):
+            self.client.get("/metrics")
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_token_is_required_when_configured(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
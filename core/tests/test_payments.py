@@ -0,0 +1,148 @@
+import threading
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from core.models import Customer, Device, Estimate, EstimateItem, Payment, ServiceOrder
+from core.payments import PaymentError, device_balances, record_payment
+
+
+def _order_with_total(total="1000.00"):
+    customer = Customer.objects.create(name="Cliente", phone="5550001234")
+    device = Device.objects.create(customer=customer, brand="HP", model="G4")
+    order = ServiceOrder.objects.create(customer=customer, device=device)
+    order.devices.set([device])
+    estimate = Estimate.objects.create(order=order)
+    EstimateItem.objects.create(
+        estimate=estimate,
+        description="Reparacion",
+        qty=1,
+        unit_price=Decimal(total),
+        status=EstimateItem.Status.ACCEPTED,
+    )
+    return ServiceOrder.objects.get(pk=order.pk), device
+
+
+class PaymentRecordTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pass123")
+        self.client.force_login(self.user)
+        self.order, self.device = _order_with_total()
+
+    def _pay(self, **data):
+        payload = {"amount": "400.00", "method": "Efectivo", "idempotency_key": "abc123"}
+        payload.update(data)
+        return self.client.post(reverse("add_payment", args=[self.order.pk]), payload)
+
+    def test_duplicate_submission_is_recorded_once(self):
+        balance = self.order.balance
+        self._pay()
+        self._pay()
+        self.assertEqual(Payment.objects.count(), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.paid_amount, Decimal("400.00"))
+        self.assertEqual(self.order.balance, balance - Decimal("400.00"))
+
+    def test_overpayment_and_foreign_device_are_rejected(self):
+        other_device = Device.objects.create(customer=self.order.customer, brand="Dell", model="X")
+        with self.assertRaises(PaymentError):
+            record_payment(
+                self.order.pk, amount=self.order.balance + Decimal("0.01"), method="Efectivo"
+            )
+        with self.assertRaises(PaymentError):
+            record_payment(
+                self.order.pk, amount=Decimal("10.00"), method="Efectivo", device_id=other_device.pk
+            )
+        payment, created, balance = record_payment(
+            self.order.pk, amount=Decimal("10.00"), method="Efectivo", device_id=self.device.pk
+        )
+        self.assertTrue(created)
+        self.assertEqual(payment.device, self.device)
+        self.assertEqual(balance, self.order.balance - Decimal("10.00"))
+
+    def test_device_balances_split_charges_and_payments(self):
+        second = Device.objects.create(customer=self.order.customer, brand="Dell", model="X")
+        self.order.devices.add(second)
+        response = self.client.post(
+            reverse("estimate_edit", args=[self.order.pk]),
+            {
+                "description": ["Pantalla", "Teclado", "Limpieza"],
+                "qty": ["1", "1", "1"],
+                "unit_price": ["100.00", "50.00", "10.00"],
+                "inventory_sku": ["", "", ""],
+                "item_device": [str(self.device.pk), str(second.pk), ""],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.order.estimate.items.update(status=EstimateItem.Status.ACCEPTED)
+        record_payment(self.order.pk, amount=Decimal("116.00"), method="Efectivo", device_id=self.device.pk)
+        record_payment(self.order.pk, amount=Decimal("5.00"), method="Efectivo")
+
+        order = ServiceOrder.objects.get(pk=self.order.pk)
+        devices = [self.device, second]
+        with self.assertNumQueries(4):
+            rows = device_balances(order, devices)
+        first_row, second_row, general = rows
+        self.assertEqual((first_row["charged"], first_row["paid"], first_row["balance"]),
+                         (Decimal("116.00"), Decimal("116.00"), Decimal("0.00")))
+        self.assertEqual(second_row["balance"], Decimal("58.00"))
+        self.assertIsNone(general["device"])
+        self.assertEqual(sum(row["charged"] for row in rows), order.approved_total)
+        self.assertEqual(sum(row["balance"] for row in rows), order.balance)
+
+        detail = self.client.get(reverse("order_detail", args=[order.pk]))
+        self.assertContains(detail, "Saldo por equipo")
+
+    def test_paid_amount_follows_payment_deletes(self):
+        self._pay()
+        Payment.objects.get().delete()
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.paid_amount, Decimal("0.00"))
+
+
+@skipUnless(connection.vendor == "postgresql", "SQLite no deja competir a los hilos por el lock de la orden.")
+class PaymentConcurrencyTests(TransactionTestCase):
+    """Pagos simultaneos compitiendo por ``select_for_update`` de la orden."""
+
+    workers = 4
+
+    def test_concurrent_full_payments_never_overpay(self):
+        order, _device = _order_with_total("500.00")
+        amount = order.balance
+        barrier = threading.Barrier(self.workers)
+        outcomes = []
+
+        def pay(idx):
+            try:
+                barrier.wait()
+                record_payment(
+                    order.pk,
+                    amount=amount,
+                    method="Efectivo",
+                    idempotency_key=f"worker-{idx}",
+                )
+                outcomes.append("ok")
+            except PaymentError:
+                outcomes.append("rejected")
+            except Exception as exc:
+                outcomes.append(type(exc).__name__)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=pay, args=(idx,)) for idx in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        order.refresh_from_db()
+        total = sum((p.amount for p in Payment.objects.filter(order=order)), Decimal("0.00"))
+        self.assertEqual(len(outcomes), self.workers)
+        self.assertEqual(sorted(outcomes), ["ok"] + ["rejected"] * (self.workers - 1))
+        self.assertEqual(total, order.approved_total)
+        self.assertEqual(order.paid_amount, total)
@@ -0,0 +1,76 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import perf
+from core.models import Customer, Device, ServiceOrder
+
+
+class PerfMiddlewareTests(TestCase):
+    def setUp(self):
+        perf.store.reset()
+        self.addCleanup(perf.store.reset)
+        User = get_user_model()
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pass123")
+        customer = Customer.objects.create(name="Cliente", phone="5550001234")
+        device = Device.objects.create(customer=customer, brand="HP", model="G4")
+        ServiceOrder.objects.create(customer=customer, device=device)
+
+    def test_staff_get_server_timing_and_samples_are_recorded(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("list_orders"))
+        self.assertEqual(response.status_code, 200)
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ consultas, \d+ duplicadas"$')
+
+        rows = {row["view"]: row for row in perf.store.summary()}
+        self.assertEqual(rows["list_orders"]["requests"], 1)
+        self.assertGreater(rows["list_orders"]["queries_max"], 0)
+        self.assertIsNotNone(rows["list_orders"]["p95_ms"])
+
+    def test_anonymous_requests_do_not_expose_timings(self):
+        response = self.client.get(reverse("list_orders"))
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(PERF_SERVER_TIMING="all")
+    def test_server_timing_can_be_sent_to_everyone(self):
+        response = self.client.get(reverse("list_orders"))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("db;dur=", response["Server-Timing"])
+
+    @override_settings(PERF_LOG_SAMPLE_RATE=0, PERF_SLOW_MS=0)
+    def test_slow_requests_are_always_logged(self):
+        with self.assertLogs("core.perf", level="WARNING") as logs:
+            self.client.get(reverse("list_orders"))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["event"], "slow_request")
+        self.assertEqual(record["view"], "list_orders")
+        self.assertEqual(record["status"], 302)
+
+    def test_recorder_counts_duplicates(self):
+        recorder = perf.QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for _ in range(3):
+                list(Customer.objects.filter(pk=1))
+            list(Customer.objects.filter(pk=2))
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(recorder.duplicates, 2)
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(perf.percentile(values, 50), 50)
+        self.assertEqual(perf.percentile(values, 95), 95)
+        self.assertEqual(perf.percentile([7], 99), 7)
+        self.assertIsNone(perf.percentile([], 50))
+
+    def test_perf_report_lists_views(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse("list_orders"))
+        response = self.client.get(reverse("perf_report"))
+        self.assertContains(response, "list_orders")
+        self.client.post(reverse("perf_report"), {"reset": "1"})
+        self.assertEqual([row["view"] for row in perf.store.summary()], ["perf_report"])
@@ -30,3 +30,26 @@ class RequireManagerDecoratorTests(TestCase):
 
         response = self.client.get(self.dashboard_url)
         self.assertEqual(response.status_code, 200)
+
+
+class RoleChecksTests(TestCase):
+    def test_role_checks_share_one_groups_query(self):
+        from core.permissions import has_role, is_gerencia, is_recepcion, is_tecnico
+
+        user = get_user_model().objects.create_user(username="recep", password="pass123")
+        user.groups.add(Group.objects.create(name="Recepcion"))
+        with self.assertNumQueries(1):
+            self.assertTrue(is_recepcion(user))
+            self.assertFalse(is_gerencia(user))
+            self.assertFalse(is_tecnico(user))
+            self.assertTrue(has_role(user, "Tecnico", "Recepcion"))
+
+    def test_group_changes_refresh_cached_roles(self):
+        from core.permissions import is_gerencia
+
+        user = get_user_model().objects.create_user(username="recep", password="pass123")
+        self.assertFalse(is_gerencia(user))
+        user.groups.add(Group.objects.create(name="Gerencia"))
+        self.assertTrue(is_gerencia(user))
+        user.groups.clear()
+        self.assertFalse(is_gerencia(user))
@@ -0,0 +1,62 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import Customer, Device, ServiceOrder
+
+
+class ProfilerTests(TestCase):
+    def setUp(self):
+        self.media = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media, PROFILER_INTERVAL_MS=0.5)
+        override.enable()
+        self.addCleanup(override.disable)
+        User = get_user_model()
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pass123")
+        self.staff = User.objects.create_user("gerente", password="pass123", is_staff=True)
+        customer = Customer.objects.create(name="Cliente", phone="5550001234")
+        device = Device.objects.create(customer=customer, brand="HP", model="G4")
+        self.order = ServiceOrder.objects.create(customer=customer, device=device)
+
+    def test_sampling_profile_is_saved_as_folded_stacks(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("order_detail", args=[self.order.pk]), {"_profile": "1"})
+        self.assertEqual(response.status_code, 200)
+        name = response["X-Profile-File"]
+        self.assertTrue(name.endswith("_order_detail.folded"))
+        path = self.media / "profiles" / name
+        self.assertTrue(path.is_file())
+        for line in path.read_text().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            self.assertGreater(int(count), 0)
+            self.assertNotIn("ProfilerMiddleware", stack.split(";")[0])
+
+        listing = self.client.get(reverse("profiles_list"))
+        self.assertContains(listing, name)
+        download = self.client.get(reverse("profile_download", args=[name]))
+        self.assertEqual(download.status_code, 200)
+        self.assertIn("attachment", download["Content-Disposition"])
+
+    def test_cprofile_mode_via_header(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("list_orders"), HTTP_X_PROFILE="cprofile")
+        self.assertTrue(response["X-Profile-File"].endswith("_list_orders.prof"))
+        self.assertTrue((self.media / "profiles" / response["X-Profile-File"]).is_file())
+
+    def test_non_superusers_are_not_profiled(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("list_orders"), {"_profile": "1"})
+        self.assertNotIn("X-Profile-File", response)
+        self.assertFalse((self.media / "profiles").exists())
+        self.assertEqual(self.client.get(reverse("profiles_list")).status_code, 403)
+
+    def test_download_rejects_other_files(self):
+        self.client.force_login(self.admin)
+        (self.media / "secret.txt").write_text("x")
+        response = self.client.get(reverse("profile_download", args=["..secret.txt"]))
+        self.assertEqual(response.status_code, 404)
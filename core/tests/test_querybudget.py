@@ -0,0 +1,116 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path, reverse
+
+from core.metrics import QUERY_BUDGET_VIOLATIONS
+from core.models import Customer, Device, Estimate, EstimateItem, ServiceOrder, StatusHistory
+from core.querybudget import QueryBudgetExceeded, query_budget, query_shape
+
+
+def n_plus_one(request):
+    names = [order.customer.name for order in ServiceOrder.objects.all()]
+    return HttpResponse(",".join(names))
+
+
+@query_budget(max_queries=1)
+def over_budget(request):
+    ServiceOrder.objects.count()
+    Customer.objects.count()
+    return HttpResponse("ok")
+
+
+def streaming_n_plus_one(request):
+    return StreamingHttpResponse(order.customer.name for order in ServiceOrder.objects.all())
+
+
+urlpatterns = [
+    path("n1/", n_plus_one, name="n_plus_one"),
+    path("budget/", over_budget, name="over_budget"),
+    path("stream/", streaming_n_plus_one, name="streaming_n_plus_one"),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__, QUERY_BUDGET_MAX_REPEATS=3)
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        for index in range(5):
+            customer = Customer.objects.create(name=f"Cliente {index}", phone=f"555000120{index}")
+            device = Device.objects.create(customer=customer, brand="HP", model="G4")
+            ServiceOrder.objects.create(customer=customer, device=device)
+
+    def test_repeated_query_shape_raises_in_tests(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, "4 consultas con la misma forma"):
+            self.client.get("/n1/")
+
+    def test_declared_budget_raises(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, "mas de 1 consultas"):
+            self.client.get("/budget/")
+
+    @override_settings(QUERY_BUDGETS={"over_budget": {"max_queries": 5}})
+    def test_url_config_overrides_decorator(self):
+        self.assertEqual(self.client.get("/budget/").status_code, 200)
+
+    def test_streaming_responses_are_checked(self):
+        response = self.client.get("/stream/")
+        with self.assertRaises(QueryBudgetExceeded):
+            b"".join(response.streaming_content)
+
+    @override_settings(QUERY_BUDGET_RAISE=False)
+    def test_violation_is_logged_with_stack_and_counted(self):
+        counter = QUERY_BUDGET_VIOLATIONS.labels(view="n_plus_one", kind="n_plus_one")
+        before = counter._value.get()
+        with self.assertLogs("core.querybudget", level="WARNING") as logs:
+            response = self.client.get("/n1/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("test_querybudget.py", logs.output[0])
+        self.assertIn("n_plus_one", logs.output[0])
+        self.assertEqual(counter._value.get(), before + 1)
+
+    def test_in_lists_share_a_shape(self):
+        self.assertEqual(
+            query_shape('SELECT 1 FROM t WHERE id IN (%s, %s)'),
+            query_shape('SELECT 1 FROM t WHERE id IN (%s, %s, %s, %s)'),
+        )
+
+
+class ViewBudgetTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pass123")
+        for index in range(12):
+            tech = User.objects.create_user(f"tec{index}", password="pass123")
+            customer = Customer.objects.create(name=f"Cliente {index}", phone=f"55500013{index:02d}")
+            device = Device.objects.create(customer=customer, brand="HP", model="G4")
+            order = ServiceOrder.objects.create(customer=customer, device=device, assigned_to=tech)
+            estimate = Estimate.objects.create(order=order)
+            EstimateItem.objects.create(
+                estimate=estimate, description="SSD", qty=2, unit_price=Decimal("10.50"), status=EstimateItem.Status.ACCEPTED
+            )
+            EstimateItem.objects.create(estimate=estimate, description="RAM", qty=1, unit_price=Decimal("99.00"))
+        self.client.force_login(self.admin)
+
+    def test_order_listing_and_exports_stay_within_budget(self):
+        self.assertEqual(self.client.get(reverse("list_orders")).status_code, 200)
+        response = self.client.get(reverse("list_orders"), {"export": "1"})
+        self.assertContains(response, "24.36")
+        response = self.client.get(reverse("panel_export_orders"), {"start": "2000-01-01", "end": "2100-01-01"})
+        body = b"".join(response.streaming_content).decode("utf-8-sig")
+        # Total aprobado y saldo de cada orden (sin pagos).
+        self.assertEqual(body.count("24.36"), 24)
+
+    @override_settings(QUERY_BUDGET_MAX_REPEATS=3)
+    def test_order_detail_loads_history_authors_in_one_query(self):
+        order = ServiceOrder.objects.first()
+        for author in get_user_model().objects.filter(username__startswith="tec"):
+            StatusHistory.log(order, to_status=ServiceOrder.Status.IN_REVIEW, author=author, author_role="Tecnico")
+        self.assertEqual(self.client.get(reverse("order_detail", args=[order.pk])).status_code, 200)
+
+    def test_prefetched_accepted_totals_match_database(self):
+        order = ServiceOrder.objects.select_related("estimate").prefetch_related("estimate__items").first()
+        with self.assertNumQueries(0):
+            prefetched = order.estimate.accepted_totals()
+        self.assertEqual(prefetched, ServiceOrder.objects.get(pk=order.pk).estimate.accepted_totals())
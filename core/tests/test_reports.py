@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Customer, Device, Payment, ServiceOrder
+from core.reports import _cash_close_key, cash_close, monthly_revenue
+
+
+class PaymentReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User = get_user_model()
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pass123")
+        self.ana = User.objects.create_user("ana", password="pass123")
+        self.client.force_login(self.admin)
+        customer = Customer.objects.create(name="Cliente", phone="5550001234")
+        device = Device.objects.create(customer=customer, brand="HP", model="G4")
+        self.order = ServiceOrder.objects.create(customer=customer, device=device)
+        self.yesterday = timezone.localdate() - timedelta(days=1)
+
+    def _pay(self, amount, method, author, day):
+        payment = Payment.objects.create(order=self.order, amount=Decimal(amount), method=method, author=author)
+        moment = timezone.make_aware(datetime.combine(day, time(12, 0)))
+        Payment.objects.filter(pk=payment.pk).update(created_at=moment)
+        return payment
+
+    def test_cash_close_groups_by_cashier_and_method(self):
+        self._pay("100.00", "Efectivo", self.ana, self.yesterday)
+        self._pay("50.00", "Efectivo", self.ana, self.yesterday)
+        self._pay("200.00", "Tarjeta", self.ana, self.yesterday)
+        self._pay("300.00", "Efectivo", self.admin, self.yesterday)
+        self._pay("999.00", "Efectivo", self.admin, self.yesterday - timedelta(days=1))
+
+        with self.assertNumQueries(1):
+            report = cash_close(self.yesterday)
+        self.assertTrue(report["closed"])
+        self.assertEqual((report["total"], report["count"]), (Decimal("650.00"), 4))
+        self.assertEqual(
+            [(row["method"], row["total"]) for row in report["methods"]],
+            [("Efectivo", Decimal("450.00")), ("Tarjeta", Decimal("200.00"))],
+        )
+        ana = next(row for row in report["cashiers"] if row["username"] == "ana")
+        self.assertEqual((ana["total"], ana["count"]), (Decimal("350.00"), 3))
+
+        # Dia cerrado: la segunda lectura sale del cache.
+        with self.assertNumQueries(0):
+            cash_close(self.yesterday)
+
+        response = self.client.get(reverse("cash_close_report"), {"day": self.yesterday.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "650.00")
+
+    def test_payment_changes_invalidate_closed_period(self):
+        payment = self._pay("100.00", "Efectivo", self.ana, self.yesterday)
+        self.assertEqual(cash_close(self.yesterday)["total"], Decimal("100.00"))
+        payment.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.delete()
+        self.assertEqual(cash_close(self.yesterday)["total"], Decimal("0.00"))
+
+    def test_moving_a_payment_invalidates_old_and_new_day(self):
+        before = self.yesterday - timedelta(days=1)
+        payment = self._pay("100.00", "Efectivo", self.ana, before)
+        self.assertEqual(cash_close(before)["total"], Decimal("100.00"))
+        self.assertEqual(cash_close(self.yesterday)["total"], Decimal("0.00"))
+
+        payment = Payment.objects.get(pk=payment.pk)
+        payment.created_at = timezone.make_aware(datetime.combine(self.yesterday, time(12, 0)))
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.save()
+        self.assertEqual(cash_close(before)["total"], Decimal("0.00"))
+        self.assertEqual(cash_close(self.yesterday)["total"], Decimal("100.00"))
+
+    def test_invalidation_reaches_other_workers_through_file_cache(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        file_cache = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location}}
+        payment = self._pay("100.00", "Efectivo", self.ana, self.yesterday)
+        with override_settings(CACHES=file_cache):
+            cash_close(self.yesterday)
+            # Otro worker: su propia instancia del cache sobre el mismo directorio.
+            other_worker = FileBasedCache(location, {})
+            key = _cash_close_key(self.yesterday)
+            self.assertIsNotNone(other_worker.get(key))
+            payment.refresh_from_db()
+            with self.captureOnCommitCallbacks(execute=True):
+                payment.delete()
+            self.assertIsNone(other_worker.get(key))
+
+    def test_monthly_revenue_groups_by_month(self):
+        today = timezone.localdate()
+        self._pay("100.00", "Efectivo", self.ana, today)
+        self._pay("40.00", "Tarjeta", self.ana, today)
+        report = monthly_revenue(today.year)
+        self.assertEqual(len(report["months"]), today.month)
+        current = report["months"][-1]
+        self.assertFalse(current["closed"])
+        self.assertEqual((current["total"], current["count"]), (Decimal("140.00"), 2))
+        self.assertEqual(report["total"], Decimal("140.00"))
+
+        response = self.client.get(reverse("revenue_report"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "140.00")
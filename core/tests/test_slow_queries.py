@@ -0,0 +1,70 @@
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import slowqueries
+from core.models import Customer, Device, ServiceOrder
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        self.logs = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.logs, ignore_errors=True)
+        override = override_settings(SLOW_QUERY_DIR=self.logs, SLOW_QUERY_MS=0.000001)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.admin = get_user_model().objects.create_superuser("admin", "admin@example.com", "pass123")
+        customer = Customer.objects.create(name="Ramon Nunez", phone="5550001234")
+        device = Device.objects.create(customer=customer, brand="HP", model="G4")
+        ServiceOrder.objects.create(customer=customer, device=device)
+
+    def _entries(self):
+        return list(slowqueries.iter_entries())
+
+    def test_slow_queries_are_logged_with_explain_and_caller(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse("list_orders"), {"q": "Ramon"})
+        entries = [entry for entry in self._entries() if entry["view"] == "list_orders"]
+        self.assertTrue(entries)
+        search = next(entry for entry in entries if "core_customer" in entry["sql"] and "LIKE" in entry["sql"])
+        self.assertNotIn("Ramon", json.dumps(search))
+        self.assertIn("<str:", json.dumps(search["params"]))
+        self.assertTrue(search["caller"].startswith("core/"))
+        self.assertTrue(search["explain"])
+        self.assertEqual(len(search["fingerprint"]), 12)
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_disabled_threshold_writes_nothing(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse("list_orders"))
+        self.assertEqual(self._entries(), [])
+
+    def test_old_files_are_pruned_and_command_summarizes(self):
+        today = timezone.localdate()
+        stale = self.logs / f"slow_queries-{today - timedelta(days=30):%Y%m%d}.jsonl"
+        stale.write_text("{}\n")
+        base = {"sql": "SELECT 1", "view": "dashboard", "caller": "core/views.py:10 (dashboard)", "explain": ["SCAN t"]}
+        for ms in (300, 500):
+            slowqueries.write_entry({**base, "fingerprint": "aaa", "ms": ms})
+        slowqueries.write_entry({**base, "fingerprint": "bbb", "ms": 900, "sql": "SELECT 2"})
+        self.assertFalse(stale.exists())
+
+        out = StringIO()
+        call_command("slow_queries", "--explain", stdout=out)
+        output = out.getvalue()
+        self.assertLess(output.index("[bbb]"), output.index("[aaa]"))
+        self.assertIn("2 veces, total 0.80s, prom 400ms, max 500ms", output)
+        self.assertIn("SCAN t", output)
+        out = StringIO()
+        call_command("slow_queries", "--sort", "count", "--top", "1", stdout=out)
+        self.assertIn("[aaa]", out.getvalue())
+        self.assertNotIn("[bbb]", out.getvalue())
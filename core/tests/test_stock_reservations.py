@@ -0,0 +1,100 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.test import TestCase
+from django.urls import reverse
+
+from core.models import (
+    Customer,
+    Device,
+    Estimate,
+    EstimateItem,
+    InventoryItem,
+    ServiceOrder,
+    StockReservation,
+)
+from core.reservations import with_availability
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_superuser("admin", "admin@example.com", "pass123")
+        self.client.force_login(self.user)
+        self.stock = InventoryItem.objects.create(sku="BAT-01", name="Bateria", qty=1)
+
+    def _order_with_estimate(self, qty=1):
+        customer = Customer.objects.create(name="Cliente", phone="5550001234")
+        device = Device.objects.create(customer=customer, brand="HP", model="G4")
+        order = ServiceOrder.objects.create(customer=customer, device=device)
+        order.devices.set([device])
+        estimate = Estimate.objects.create(order=order)
+        item = EstimateItem.objects.create(
+            estimate=estimate,
+            description="Bateria",
+            qty=qty,
+            unit_price=Decimal("500.00"),
+            inventory_item=self.stock,
+        )
+        return order, estimate, item
+
+    def _accept(self, estimate, item):
+        return self.client.post(
+            reverse("estimate_update_items", args=[estimate.token]),
+            {f"item-{item.pk}-status": EstimateItem.Status.ACCEPTED},
+        )
+
+    def test_accepting_item_reserves_and_second_order_is_short(self):
+        order_a, estimate_a, item_a = self._order_with_estimate()
+        order_b, estimate_b, item_b = self._order_with_estimate()
+        self._accept(estimate_a, item_a)
+        response = self._accept(estimate_b, item_b)
+        warnings = [str(m) for m in get_messages(response.wsgi_request) if m.level_tag == "warning"]
+        self.assertEqual(warnings, ["Sin stock suficiente para apartar: BAT-01. El taller confirmara la disponibilidad."])
+
+        reservation = StockReservation.objects.get()
+        self.assertEqual(reservation.order, order_a)
+        self.assertEqual(reservation.status, StockReservation.Status.ACTIVE)
+        annotated = with_availability().get(pk=self.stock.pk)
+        self.assertEqual((annotated.qty, annotated.reserved_qty, annotated.available_qty), (1, 1, 0))
+
+        # La orden B no puede consumir la pieza apartada por A.
+        for target in (ServiceOrder.Status.IN_REVIEW, ServiceOrder.Status.READY_PICKUP):
+            self.client.post(reverse("change_status", args=[order_b.pk]), {"target": target})
+        order_b.refresh_from_db()
+        self.assertEqual(order_b.status, ServiceOrder.Status.IN_REVIEW)
+
+        for target in (ServiceOrder.Status.IN_REVIEW, ServiceOrder.Status.READY_PICKUP):
+            self.client.post(reverse("change_status", args=[order_a.pk]), {"target": target})
+        order_a.refresh_from_db()
+        self.assertEqual(order_a.status, ServiceOrder.Status.READY_PICKUP)
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, StockReservation.Status.CONSUMED)
+        self.stock.refresh_from_db()
+        self.assertEqual(self.stock.qty, 0)
+
+    def test_decline_and_cancel_release_reservations(self):
+        order, estimate, item = self._order_with_estimate()
+        self.client.post(reverse("estimate_approve", args=[estimate.token]))
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.Status.ACTIVE)
+        self.client.post(reverse("estimate_decline", args=[estimate.token]))
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.Status.RELEASED)
+
+        self.client.post(reverse("estimate_approve", args=[estimate.token]))
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.Status.ACTIVE)
+        self.client.post(reverse("order_cancel", args=[order.pk]))
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.Status.RELEASED)
+
+    def test_inventory_list_shows_available_in_constant_queries(self):
+        order, estimate, item = self._order_with_estimate()
+        self.stock.qty = 5
+        self.stock.save(update_fields=["qty"])
+        self._accept(estimate, item)
+        for idx in range(5):
+            InventoryItem.objects.create(sku=f"EXTRA-{idx}", name="Extra", qty=idx)
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("inventory_list"))
+        self.assertEqual(response.status_code, 200)
+        row = next(it for it in response.context["items"] if it.pk == self.stock.pk)
+        self.assertEqual((row.reserved_qty, row.available_qty), (1, 4))
@@ -0,0 +1,82 @@
+"""Miniaturas de adjuntos de imagen.
+
+Las miniaturas viven junto al original en ``<carpeta>/.thumbs/`` y se
+generan al subir el archivo o, si faltan, en la primera peticion. Se usan
+WebP cuando Pillow lo soporta y JPEG como respaldo.
+"""
+import logging
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.db.models.fields.files import FieldFile
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_DIR = ".thumbs"
+THUMBNAIL_QUALITY = 75
+
+
+def _thumbnail_format():
+    return ("WEBP", "webp") if features.check("webp") else ("JPEG", "jpg")
+
+
+def thumbnail_name(name, size=THUMBNAIL_SIZE):
+    _, ext = _thumbnail_format()
+    path = PurePosixPath(name)
+    return str(path.parent / THUMBNAIL_DIR / f"{path.name}.{size[0]}x{size[1]}.{ext}")
+
+
+def _render_thumbnail(handle, size):
+    with Image.open(handle) as image:
+        # JPEG: decodifica a escala reducida en vez de la foto completa.
+        image.draft("RGB", (size[0] * 2, size[1] * 2))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+        fmt, _ = _thumbnail_format()
+        options = {"quality": THUMBNAIL_QUALITY}
+        if fmt == "JPEG":
+            image = image.convert("RGB")
+            options["optimize"] = True
+        else:
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA")
+            options["method"] = 4
+        buffer = BytesIO()
+        image.save(buffer, fmt, **options)
+        return buffer.getvalue()
+
+
+def ensure_thumbnail(file_field, size=THUMBNAIL_SIZE):
+    """Regresa la miniatura de ``file_field`` como ``FieldFile``; la crea si falta.
+
+    Regresa ``None`` si el archivo no es una imagen legible.
+    """
+    storage = file_field.storage
+    name = thumbnail_name(file_field.name, size)
+    if not storage.exists(name):
+        try:
+            with storage.open(file_field.name, "rb") as handle:
+                data = _render_thumbnail(handle, size)
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            logger.warning("No se pudo generar miniatura de %s", file_field.name)
+            return None
+        save = getattr(storage, "save_exact", storage.save)
+        saved = save(name, ContentFile(data))
+        if saved != name:
+            # Otra peticion la creo al mismo tiempo; se conserva la primera.
+            storage.delete(saved)
+    return FieldFile(file_field.instance, file_field.field, name)
+
+
+def delete_thumbnails_for_name(storage, name, sizes=(THUMBNAIL_SIZE,)):
+    for size in sizes:
+        thumb = thumbnail_name(name, size)
+        if storage.exists(thumb):
+            storage.delete(thumb)
+
+
+def delete_thumbnails(file_field, sizes=(THUMBNAIL_SIZE,)):
+    delete_thumbnails_for_name(file_field.storage, file_field.name, sizes)
@@ -0,0 +1,317 @@
+"""Reglas de adjuntos y subida por partes (reanudable).
+
+Flujo: ``start_upload`` crea la ``UploadSession``; ``append_chunk`` recibe
+cada parte en un temporal (sin transaccion: la red puede ser lenta) y solo
+al final bloquea la sesion, revalida el offset y la copia a
+``MEDIA_ROOT/uploads/<id>.part`` (el tipo real se valida con la firma de la
+primera parte); ``finish_upload`` verifica tamano y SHA-256, mueve el
+archivo al almacenamiento por contenido y crea el ``Attachment`` en una
+transaccion. Si la conexion se cae, el cliente consulta el offset y
+continua desde ahi; ``expire_uploads`` cancela las sesiones abandonadas.
+"""
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Attachment, UploadSession
+from core.storage import digest_from_name
+
+ATTACHMENT_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
+ATTACHMENT_ALLOWED_EXTENSIONS = ATTACHMENT_IMAGE_EXTENSIONS | {
+    ".pdf",
+    ".doc",
+    ".docx",
+    ".xls",
+    ".xlsx",
+    ".txt",
+    ".csv",
+}
+ATTACHMENT_ALLOWED_MIME_TYPES = {
+    "application/pdf",
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.ms-excel",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "text/plain",
+    "text/csv",
+}
+ATTACHMENT_IMAGE_PREFIXES = ("image/",)
+
+# Firmas (magic numbers) aceptadas por extension para la primera parte.
+_OLE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+_ZIP = b"PK\x03\x04"
+FILE_SIGNATURES = {
+    ".jpg": (b"\xff\xd8\xff",),
+    ".jpeg": (b"\xff\xd8\xff",),
+    ".png": (b"\x89PNG\r\n\x1a\n",),
+    ".gif": (b"GIF87a", b"GIF89a"),
+    ".bmp": (b"BM",),
+    ".webp": (b"RIFF",),
+    ".pdf": (b"%PDF-",),
+    ".doc": (_OLE,),
+    ".xls": (_OLE,),
+    ".docx": (_ZIP,),
+    ".xlsx": (_ZIP,),
+}
+TEXT_EXTENSIONS = {".txt", ".csv"}
+
+STREAM_BLOCK_SIZE = 64 * 1024
+UPLOAD_DIR = "uploads"
+
+
+class UploadError(Exception):
+    """Error de validacion de una subida por partes."""
+
+
+class UploadOffsetError(UploadError):
+    """La parte no empieza donde termina lo recibido; el cliente debe reanudar."""
+
+    def __init__(self, expected):
+        super().__init__(f"Offset incorrecto; se esperaba {expected}.")
+        self.expected = expected
+
+
+def attachment_allowed(name, content_type=""):
+    ext = Path(name or "").suffix.lower()
+    guessed, _ = mimetypes.guess_type(name or "")
+    candidates = [(content_type or "").lower(), (guessed or "").lower()]
+    if any(ct.startswith(ATTACHMENT_IMAGE_PREFIXES) for ct in candidates if ct):
+        return True
+    if any(ct in ATTACHMENT_ALLOWED_MIME_TYPES for ct in candidates if ct):
+        return True
+    return ext in ATTACHMENT_ALLOWED_EXTENSIONS
+
+
+def attachment_is_image(name):
+    return Path(name or "").suffix.lower() in ATTACHMENT_IMAGE_EXTENSIONS
+
+
+def attachment_metadata(name, blob, size):
+    """Campos de ``Attachment`` que se guardan al subir ``name`` como ``blob``."""
+    return {
+        "size": size,
+        "content_type": mimetypes.guess_type(name or "")[0] or "application/octet-stream",
+        "sha256": digest_from_name(blob) or "",
+        "is_image": attachment_is_image(name),
+    }
+
+
+def signature_matches(name, head):
+    """Valida que los primeros bytes correspondan a la extension declarada."""
+    ext = Path(name or "").suffix.lower()
+    if ext in TEXT_EXTENSIONS:
+        return b"\x00" not in head[:4096]
+    signatures = FILE_SIGNATURES.get(ext)
+    if not signatures:
+        return False
+    if ext == ".webp" and head[8:12] != b"WEBP":
+        return False
+    return any(head.startswith(sig) for sig in signatures)
+
+
+def chunked_max_bytes():
+    return int(getattr(settings, "CHUNKED_UPLOAD_MAX_MB", 500)) * 1024 * 1024
+
+
+def chunk_max_bytes():
+    return int(getattr(settings, "CHUNKED_UPLOAD_CHUNK_MB", 8)) * 1024 * 1024
+
+
+def upload_dir():
+    return Path(settings.MEDIA_ROOT) / UPLOAD_DIR
+
+
+def part_path(session):
+    return upload_dir() / f"{session.pk}.part"
+
+
+def start_upload(order, *, filename, size, sha256="", caption="", user=None):
+    filename = Path(filename or "").name.strip()
+    if not filename:
+        raise UploadError("Nombre de archivo requerido.")
+    if not attachment_allowed(filename):
+        raise UploadError(f"{filename}: tipo no permitido.")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("Tamano invalido.")
+    if size <= 0:
+        raise UploadError("El archivo esta vacio.")
+    if size > chunked_max_bytes():
+        raise UploadError(f"{filename}: excede {chunked_max_bytes() // (1024 * 1024)} MB.")
+    sha256 = (sha256 or "").strip().lower()
+    if sha256 and (len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256)):
+        raise UploadError("SHA-256 invalido.")
+    name_key = filename.lower()
+    if any(att.display_name.lower() == name_key for att in order.attachments.all()):
+        raise UploadError(f"{filename}: ya existe en la orden.")
+    return UploadSession.objects.create(
+        order=order,
+        created_by=user,
+        filename=filename[:255],
+        caption=(caption or "").strip()[:255],
+        size=size,
+        sha256=sha256,
+    )
+
+
+def append_chunk(session_id, *, offset, stream, length, checksum=""):
+    """Escribe ``length`` bytes de ``stream`` en ``offset``; regresa el nuevo offset.
+
+    ``checksum`` (opcional) es el SHA-256 hex de la parte.
+    """
+    if length <= 0:
+        raise UploadError("Parte vacia.")
+    if length > chunk_max_bytes():
+        raise UploadError(f"La parte excede {chunk_max_bytes() // (1024 * 1024)} MB.")
+    session = UploadSession.objects.get(pk=session_id)
+    _check_chunk(session, offset, length)
+
+    # La parte se lee del cliente sin transaccion ni lock abiertos.
+    upload_dir().mkdir(parents=True, exist_ok=True)
+    fd, staged = tempfile.mkstemp(dir=upload_dir(), prefix=f"{session.pk}.", suffix=".chunk")
+    try:
+        hasher = hashlib.sha256()
+        written = 0
+        with os.fdopen(fd, "wb") as handle:
+            while written < length:
+                block = stream.read(min(STREAM_BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                if offset == 0 and written == 0 and not signature_matches(session.filename, block):
+                    raise UploadError(f"{session.filename}: el contenido no corresponde al tipo de archivo.")
+                hasher.update(block)
+                handle.write(block)
+                written += len(block)
+        if written != length:
+            raise UploadError("La parte llego incompleta.")
+        if checksum and hasher.hexdigest() != checksum.strip().lower():
+            raise UploadError("Checksum de la parte no coincide.")
+
+        with transaction.atomic():
+            # Otra peticion pudo avanzar la sesion mientras llegaba esta parte.
+            session = UploadSession.objects.select_for_update().get(pk=session_id)
+            _check_chunk(session, offset, length)
+            path = part_path(session)
+            with open(path, "r+b" if path.exists() else "wb") as handle, open(staged, "rb") as chunk:
+                handle.seek(offset)
+                # Descarta restos de un intento previo que no se confirmo.
+                handle.truncate()
+                shutil.copyfileobj(chunk, handle, STREAM_BLOCK_SIZE * 16)
+            session.received = offset + written
+            session.save(update_fields=["received", "updated_at"])
+    finally:
+        if os.path.exists(staged):
+            os.unlink(staged)
+    return session.received
+
+
+def _check_chunk(session, offset, length):
+    if session.status != UploadSession.Status.OPEN:
+        raise UploadError("La subida ya no esta abierta.")
+    if offset != session.received:
+        raise UploadOffsetError(session.received)
+    if offset + length > session.size:
+        raise UploadError("La parte excede el tamano declarado.")
+
+
+def _file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(STREAM_BLOCK_SIZE * 16), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def finish_upload(session_id, *, sha256=""):
+    """Verifica y convierte la subida en ``Attachment``; regresa ``(attachment, created)``."""
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().select_related("order").get(pk=session_id)
+        if session.status == UploadSession.Status.DONE and session.attachment_id:
+            return session.attachment, False
+        if session.status != UploadSession.Status.OPEN:
+            raise UploadError("La subida ya no esta abierta.")
+        if session.received != session.size:
+            raise UploadError(f"Faltan bytes: recibidos {session.received} de {session.size}.")
+        path = part_path(session)
+        if not path.exists():
+            raise UploadError("No se encontro el archivo de la subida; vuelve a subirlo.")
+        digest = _file_sha256(path)
+        expected = (sha256 or session.sha256 or "").strip().lower()
+        if expected and digest != expected:
+            raise UploadError("El SHA-256 del archivo no coincide; vuelve a subirlo.")
+
+        storage = Attachment._meta.get_field("file").storage
+        # Se enlaza sin mover la parte: si la transaccion se revierte, la
+        # sesion sigue abierta con su archivo y se puede reintentar.
+        blob = storage.adopt_file(str(path), digest, Path(session.filename).suffix, keep=True)
+        attachment = session.order.attachments.filter(file=blob).first()
+        created = attachment is None
+        if created:
+            attachment = Attachment.objects.create(
+                service_order=session.order,
+                file=blob,
+                original_name=session.filename,
+                caption=session.caption,
+                **attachment_metadata(session.filename, blob, session.size),
+            )
+        session.status = UploadSession.Status.DONE
+        session.attachment = attachment
+        session.sha256 = digest
+        session.save(update_fields=["status", "attachment", "sha256", "updated_at"])
+        transaction.on_commit(lambda: path.unlink(missing_ok=True))
+    return attachment, created
+
+
+def abort_upload(session_id):
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session_id)
+        if session.status == UploadSession.Status.OPEN:
+            session.status = UploadSession.Status.ABORTED
+            session.save(update_fields=["status", "updated_at"])
+    path = part_path(session)
+    if path.exists():
+        os.unlink(path)
+    return session
+
+
+def expire_uploads(*, hours=None, dry_run=False):
+    """Cancela sesiones abiertas sin actividad en ``hours`` y borra archivos huerfanos.
+
+    Regresa ``(sesiones, archivos)`` con lo que se cancelo y borro.
+    """
+    hours = hours if hours is not None else int(getattr(settings, "CHUNKED_UPLOAD_EXPIRE_HOURS", 24))
+    cutoff = timezone.now() - timedelta(hours=hours)
+    stale = UploadSession.objects.filter(status=UploadSession.Status.OPEN, updated_at__lt=cutoff)
+    expired = list(stale.values_list("pk", flat=True))
+    if not dry_run and expired:
+        stale.filter(pk__in=expired).update(status=UploadSession.Status.ABORTED, updated_at=timezone.now())
+
+    removed = []
+    directory = upload_dir()
+    if directory.is_dir():
+        open_ids = {
+            str(pk)
+            for pk in UploadSession.objects.filter(status=UploadSession.Status.OPEN).values_list("pk", flat=True)
+        }
+        if dry_run:
+            open_ids -= {str(pk) for pk in expired}
+        for path in directory.iterdir():
+            # Solo archivos viejos: una sesion recien creada puede no estar en open_ids.
+            if not path.is_file() or time.time() - path.stat().st_mtime < hours * 3600:
+                continue
+            # Partes de sesiones cerradas, o temporales de una peticion que murio.
+            if path.suffix == ".chunk" or path.name.split(".", 1)[0] not in open_ids:
+                removed.append(path.name)
+                if not dry_run:
+                    path.unlink(missing_ok=True)
+    return expired, sorted(removed)
@@ -4,10 +4,19 @@ import logging
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.core.mail import send_mail
+from django.db import transaction
 from django.utils import timezone
 
-from core.models import InventoryMovement, ServiceOrder, StatusHistory
+from core.models import (
+    EstimateItem,
+    InventoryItem,
+    InventoryMovement,
+    ServiceOrder,
+    StatusHistory,
+    StockReservation,
+)
 from core.permissions import is_gerencia, is_recepcion, is_tecnico
+from core.reservations import available_qty
 
 logger = logging.getLogger(__name__)
 
@@ -184,37 +193,61 @@ def send_order_status_email(
 
 
 def apply_estimate_inventory(order, *, author=None):
+    """Descuenta del stock las partidas con inventario al pasar a READY.
+
+    Las reservas activas de la orden se convierten en movimientos; para el
+    resto solo se usa lo disponible (sin tocar lo apartado por otras ordenes).
+    """
     try:
         estimate = order.estimate
     except ServiceOrder.estimate.RelatedObjectDoesNotExist:
         return True, None
     if getattr(estimate, "inventory_applied", False):
         return True, None
-    consumables = list(estimate.items.select_related("inventory_item").filter(inventory_item__isnull=False))
+    consumables = list(
+        estimate.items.filter(inventory_item__isnull=False)
+        .exclude(status=EstimateItem.Status.REJECTED)
+        .order_by("id")
+    )
     if not consumables:
         estimate.inventory_applied = True
         estimate.save(update_fields=["inventory_applied"])
         return True, None
-    insufficient = []
-    for item in consumables:
-        stock_item = item.inventory_item
-        if stock_item.qty < item.qty:
-            insufficient.append(stock_item.sku or stock_item.name)
-    if insufficient:
-        return False, f"Stock insuficiente para: {', '.join(insufficient)}"
-    for item in consumables:
-        stock_item = item.inventory_item
-        InventoryMovement.objects.create(
-            item=stock_item,
-            delta=-item.qty,
-            reason=f"Consumo cotizacion {order.folio}",
+    with transaction.atomic():
+        stock_items = {
+            stock.pk: stock
+            for stock in InventoryItem.objects.select_for_update()
+            .filter(pk__in={item.inventory_item_id for item in consumables})
+            .order_by("pk")
+        }
+        needed = {}
+        for item in consumables:
+            needed[item.inventory_item_id] = needed.get(item.inventory_item_id, 0) + item.qty
+        insufficient = []
+        for item_id, qty in needed.items():
+            stock_item = stock_items[item_id]
+            if available_qty(stock_item, exclude_order=order) < qty:
+                insufficient.append(stock_item.sku or stock_item.name)
+        if insufficient:
+            return False, f"Stock insuficiente para: {', '.join(insufficient)}"
+        for item in consumables:
+            stock_item = stock_items[item.inventory_item_id]
+            InventoryMovement.objects.create(
+                item=stock_item,
+                delta=-item.qty,
+                reason=f"Consumo cotizacion {order.folio}",
+                order=order,
+                author=author,
+            )
+            stock_item.qty -= item.qty
+            stock_item.save(update_fields=["qty"])
+        StockReservation.objects.filter(
             order=order,
-            author=author,
-        )
-        stock_item.qty -= item.qty
-        stock_item.save(update_fields=["qty"])
-    estimate.inventory_applied = True
-    estimate.save(update_fields=["inventory_applied"])
+            estimate_item__in=consumables,
+            status=StockReservation.Status.ACTIVE,
+        ).update(status=StockReservation.Status.CONSUMED, updated_at=timezone.now())
+        estimate.inventory_applied = True
+        estimate.save(update_fields=["inventory_applied"])
     return True, None
 
 
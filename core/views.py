@@ -1,4 +1,4 @@
-from django.http import HttpResponse, Http404, JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
@@ -22,10 +22,10 @@ import qrcode
 from datetime import datetime, timedelta, time
 import csv
 import re
-import mimetypes
 from pathlib import Path
 from urllib.parse import quote, urlencode
 import logging
+import uuid
 
 from .forms import ReceptionForm, ReceptionDeviceFormSet, InventoryItemForm, AttachmentForm, CustomerForm
 from .models import (
@@ -45,6 +45,7 @@ from .permissions import (
     ROLE_RECEPCION,
     ROLE_GERENCIA,
     ROLE_TECNICO,
+    can_view_order_attachments,
     group_required,
     is_manager,
     is_gerencia,
@@ -62,6 +63,31 @@ from .utils import (
     format_csv_datetime,
     notify_estimate_item_decision,
 )
+from .attachment_zip import iter_attachments_zip
+from .media import VERSION_LENGTH, file_version, serve_media_file
+from .image_ingest import schedule_ingest
+from .metrics import pdf_render_timer
+from .querybudget import query_budget
+from .thumbnails import ensure_thumbnail
+from .uploads import (
+    ATTACHMENT_ALLOWED_EXTENSIONS,
+    ATTACHMENT_IMAGE_EXTENSIONS,
+    attachment_allowed,
+    attachment_is_image,
+    attachment_metadata,
+    chunked_max_bytes,
+)
+from .inventory_import import (
+    IMPORT_COLUMNS,
+    IMPORT_MODES,
+    MODE_DELTA,
+    drop_stash,
+    import_inventory_csv,
+    load_stash,
+    stash_upload,
+)
+from .payments import PaymentError, device_balances, record_payment
+from .reservations import available_qty, sync_estimate_reservations, with_availability
 
 
 
@@ -116,6 +142,7 @@ def _build_estimate_form_context(request, order, estimate, *, form_items=None, n
                 "qty": str(item.qty),
                 "unit_price": f"{item.unit_price.quantize(TWO_PLACES)}",
                 "inventory_sku": item.inventory_item.sku if item.inventory_item else "",
+                "device_id": str(item.device_id or ""),
             }
             for item in items_qs
         ]
@@ -136,6 +163,7 @@ def _build_estimate_form_context(request, order, estimate, *, form_items=None, n
         "has_saved_items": has_saved_items,
         "public_estimate_url": public_url,
         "inventory_items": inventory_catalog,
+        "order_devices": _order_devices(order),
     }
 
 
@@ -341,7 +369,8 @@ def receipt_pdf(request, token):
 
     pdf_io = BytesIO()
     try:
-        result = pisa.CreatePDF(html, dest=pdf_io, encoding="utf-8")
+        with pdf_render_timer("receipt"):
+            result = pisa.CreatePDF(html, dest=pdf_io, encoding="utf-8")
         if result.err:
             return HttpResponse(html, content_type="text/html", status=500)
         resp = HttpResponse(pdf_io.getvalue(), content_type="application/pdf")
@@ -384,8 +413,36 @@ def order_ticket_view(request, pk):
     return render(request, "tickets/order_ticket.html", context)
 
 
+def _dashboard_queryset(*, q="", status="", assignee="", start=None, end=None):
+    """Ordenes del tablero con sus filtros; ``start``/``end`` ya como datetimes."""
+    qs = ServiceOrder.objects.select_related("device", "device__customer").order_by("-checkin_at")
+
+    if q:
+        search = (
+            Q(folio__icontains=q)
+            | Q(device__serial__icontains=q)
+            | Q(device__model__icontains=q)
+            | Q(device__customer__name__icontains=q)
+        )
+        qs = qs.filter(search)
+
+    if status:
+        qs = qs.filter(status=status)
+
+    if assignee:
+        qs = qs.filter(assigned_to_id=assignee)
+
+    if start:
+        qs = qs.filter(checkin_at__gte=start)
+
+    if end:
+        qs = qs.filter(checkin_at__lt=end)
+    return qs
+
+
 @login_required(login_url="/admin/login/")
 @require_manager
+@query_budget(max_queries=20)
 def dashboard(request):
     q = (request.GET.get("q", "") or "").strip()
     status = (request.GET.get("status", "") or "").strip()
@@ -421,28 +478,7 @@ def dashboard(request):
             to_date = None
             to_dt = None
 
-    qs = ServiceOrder.objects.select_related("device", "device__customer").order_by("-checkin_at")
-
-    if q:
-        search = (
-            Q(folio__icontains=q)
-            | Q(device__serial__icontains=q)
-            | Q(device__model__icontains=q)
-            | Q(device__customer__name__icontains=q)
-        )
-        qs = qs.filter(search)
-
-    if status:
-        qs = qs.filter(status=status)
-
-    if assignee:
-        qs = qs.filter(assigned_to_id=assignee)
-
-    if from_dt:
-        qs = qs.filter(checkin_at__gte=from_dt)
-
-    if to_dt:
-        qs = qs.filter(checkin_at__lt=to_dt)
+    qs = _dashboard_queryset(q=q, status=status, assignee=assignee, start=from_dt, end=to_dt)
 
     counts = {code: 0 for code, _ in ServiceOrder.Status.choices}
     for entry in qs.values("status").annotate(total=Count("id")):
@@ -601,7 +637,7 @@ def dashboard(request):
 def inventory_list(request):
     q = (request.GET.get("q", "") or "").strip()
     low = request.GET.get("low") == "1"
-    items = InventoryItem.objects.all().order_by("sku")
+    items = with_availability(InventoryItem.objects.all()).order_by("sku")
     if q:
         search = Q(sku__icontains=q) | Q(name__icontains=q) | Q(location__icontains=q)
         items = items.filter(search)
@@ -638,8 +674,8 @@ def receive_stock(request):
         return redirect("inventory_list")
 
     delta = qty if movement_type != "OUT" else -qty
-    if movement_type == "OUT" and item.qty + delta < 0:
-        messages.error(request, "No hay suficiente inventario para registrar esta salida.")
+    if movement_type == "OUT" and available_qty(item) + delta < 0:
+        messages.error(request, "No hay suficiente inventario disponible (sin apartar) para registrar esta salida.")
         return redirect("inventory_list")
 
     InventoryMovement.objects.create(item=item, delta=delta, reason=reason, author=request.user)
@@ -717,6 +753,54 @@ def inventory_delete(request, pk):
     return render(request, "inventory_confirm_delete.html", context)
 
 
+@login_required(login_url="/admin/login/")
+@group_required(ROLE_RECEPCION, ROLE_GERENCIA)
+def inventory_import(request):
+    mode = (request.POST.get("mode") or MODE_DELTA).strip()
+    result = None
+    token = ""
+    if request.method == "POST":
+        uploaded = request.FILES.get("file")
+        token = (request.POST.get("token") or "").strip()
+        if uploaded:
+            data = uploaded.read()
+            token = ""
+        elif token:
+            # Aplicar la vista previa sin volver a subir el archivo.
+            stashed = load_stash(token, user_id=request.user.pk)
+            if stashed is None:
+                messages.error(request, "La vista previa expiro; vuelve a seleccionar el archivo.")
+                return redirect("inventory_import")
+            data, mode = stashed
+        else:
+            messages.error(request, "Selecciona un archivo CSV.")
+            return redirect("inventory_import")
+        dry_run = request.POST.get("action") != "apply"
+        result = import_inventory_csv(BytesIO(data), mode=mode, author=request.user, dry_run=dry_run)
+        for error in result["errors"]:
+            messages.error(request, error)
+        if result["applied"]:
+            if token:
+                drop_stash(token)
+            summary = result["summary"]
+            messages.success(
+                request,
+                f"Importacion aplicada: {summary['create']} nuevos, {summary['update']} actualizados, "
+                f"{summary['movements']} movimientos.",
+            )
+            return redirect("inventory_list")
+        if dry_run and not result["errors"] and not token:
+            token = stash_upload(data, mode=mode, user_id=request.user.pk)
+    context = {
+        "result": result,
+        "token": token,
+        "mode": mode,
+        "modes": IMPORT_MODES,
+        "columns": ", ".join(IMPORT_COLUMNS),
+    }
+    return render(request, "inventory_import.html", context)
+
+
 @login_required(login_url="/admin/login/")
 @group_required(ROLE_RECEPCION, ROLE_GERENCIA)
 def customer_list(request):
@@ -761,8 +845,42 @@ def customer_edit(request, pk):
     )
 
 
+def _order_list_queryset(user, *, q="", status="", assignee="", start=None, end=None):
+    """Ordenes de ``list_orders`` y su CSV; un tecnico solo ve las suyas."""
+    is_technician = is_tecnico(user)
+    qs = (
+        ServiceOrder.objects.select_related("customer", "device", "assigned_to")
+        .prefetch_related("devices")
+        .order_by("-checkin_at")
+    )
+    if is_technician:
+        qs = qs.filter(assigned_to=user)
+
+    if q:
+        qs = qs.filter(
+            Q(folio__icontains=q)
+            | Q(devices__serial__icontains=q)
+            | Q(devices__model__icontains=q)
+            | Q(customer__name__icontains=q)
+        ).distinct()
+    if status:
+        qs = qs.filter(status=status)
+    if assignee:
+        if is_technician:
+            if str(user.pk) == assignee:
+                qs = qs.filter(assigned_to=user)
+        else:
+            qs = qs.filter(assigned_to_id=assignee)
+    if start:
+        qs = qs.filter(checkin_at__gte=start)
+    if end:
+        qs = qs.filter(checkin_at__lt=end)
+    return qs
+
+
 @login_required(login_url="/admin/login/")
 @group_required(ROLE_RECEPCION, ROLE_GERENCIA)
+@query_budget(max_queries=15)
 def list_orders(request):
     q = (request.GET.get("q", "") or "").strip()
     status = (request.GET.get("status", "") or "").strip()
@@ -785,30 +903,6 @@ def list_orders(request):
     can_send_estimate = is_reception
     can_export = is_gerencia(request.user)
 
-    qs = (
-        ServiceOrder.objects.select_related("customer")
-        .prefetch_related("devices")
-        .order_by("-checkin_at")
-    )
-    if is_technician:
-        qs = qs.filter(assigned_to=request.user)
-
-    if q:
-        qs = qs.filter(
-            Q(folio__icontains=q)
-            | Q(devices__serial__icontains=q)
-            | Q(devices__model__icontains=q)
-            | Q(customer__name__icontains=q)
-        ).distinct()
-    if status:
-        qs = qs.filter(status=status)
-    if assignee:
-        if is_technician:
-            if str(request.user.pk) == assignee:
-                qs = qs.filter(assigned_to=request.user)
-        else:
-            qs = qs.filter(assigned_to_id=assignee)
-
     tz = timezone.get_current_timezone()
 
     def _make_boundary(value, *, end=False):
@@ -825,13 +919,14 @@ def list_orders(request):
             return timezone.make_aware(base, tz)
         return base
 
-    start_dt = _make_boundary(dfrom)
-    if start_dt:
-        qs = qs.filter(checkin_at__gte=start_dt)
-
-    end_dt = _make_boundary(dto, end=True)
-    if end_dt:
-        qs = qs.filter(checkin_at__lt=end_dt)
+    qs = _order_list_queryset(
+        request.user,
+        q=q,
+        status=status,
+        assignee=assignee,
+        start=_make_boundary(dfrom),
+        end=_make_boundary(dto, end=True),
+    )
 
     base_params = [
         ("q", q),
@@ -859,7 +954,7 @@ def list_orders(request):
         writer.writerow(
             ["Folio", "Cliente", "Equipo", "Estado", "Tecnico", "Total", "FechaEntrada", "FechaSalida"]
         )
-        for order in qs:
+        for order in qs.select_related("estimate").prefetch_related("estimate__items"):
             customer = order.get_customer()
             tech_name = order.assigned_to.get_username() if order.assigned_to_id else ""
             equipment = build_device_label(order)
@@ -877,7 +972,8 @@ def list_orders(request):
             )
         return resp
 
-    paginator = Paginator(qs, 20)
+    # Subquery correlacionada: sin GROUP BY en la pagina, y ni el conteo ni el CSV la calculan.
+    paginator = Paginator(qs.annotate(attachment_count=Attachment.count_subquery()), 20)
     page_obj = paginator.get_page(request.GET.get("page"))
 
     restricted_statuses = {"REV", "WAI", "READY"}
@@ -936,12 +1032,13 @@ def list_orders(request):
 
 @login_required(login_url="/admin/login/")
 @group_required(ROLE_RECEPCION, ROLE_GERENCIA)
+@query_budget(max_queries=25)
 def order_detail(request, pk):
     order = get_object_or_404(
-        ServiceOrder.objects.select_related("customer").prefetch_related("devices"),
+        ServiceOrder.objects.select_related("customer", "assigned_to").prefetch_related("devices"),
         pk=pk,
     )
-    history = order.history.order_by("-created_at")
+    history = order.history.select_related("author").order_by("-created_at")
     parts = InventoryMovement.objects.filter(order=order).select_related("item").order_by("-created_at")
     allowed_next = order.allowed_next_statuses()
 
@@ -995,6 +1092,7 @@ def order_detail(request, pk):
     balance = order.balance
     can_charge = is_reception and balance > Decimal("0.00")
     order_devices = _order_devices(order)
+    device_rows = device_balances(order, order_devices) if len(order_devices) > 1 else []
 
     return render(
         request,
@@ -1020,11 +1118,13 @@ def order_detail(request, pk):
             "paid_total": paid_total,
             "balance": balance,
             "can_charge": can_charge,
+            "payment_idempotency_key": uuid.uuid4().hex if can_charge else "",
             "is_technician": is_technician,
             "is_superuser": is_superuser,
             "is_manager_user": is_manager_user,
             "order_customer": customer,
             "order_devices": order_devices,
+            "device_balances": device_rows,
             "status_colors": status_colors,
         },
     )
@@ -1145,42 +1245,35 @@ def add_payment(request, pk):
         return redirect("order_detail", pk=pk)
 
     device_id = (request.POST.get("device_id") or "").strip()
-    order_devices = _order_devices(order)
-    payment_device = None
-    if device_id:
-        payment_device = next((dev for dev in order_devices if str(dev.pk) == device_id), None)
-        if not payment_device:
-            messages.error(request, "Selecciona un dispositivo valido.")
-            return redirect("order_detail", pk=pk)
+    idempotency_key = (request.POST.get("idempotency_key") or "").strip()[:64]
 
-    balance = order.balance
-    if balance <= Decimal("0.00"):
-        messages.error(request, "La orden no tiene saldo por cobrar.")
+    try:
+        payment, created, new_balance = record_payment(
+            order.pk,
+            amount=amount,
+            method=method,
+            reference=reference,
+            device_id=device_id or None,
+            author=request.user,
+            idempotency_key=idempotency_key,
+        )
+    except PaymentError as exc:
+        messages.error(request, str(exc))
+        return redirect("order_detail", pk=pk)
+    except Exception as exc:
+        logger.exception("Error registrando pago")
+        messages.error(request, f"No se pudo registrar el pago: {exc}")
         return redirect("order_detail", pk=pk)
 
-    if amount > balance:
-        messages.error(request, "El monto excede el saldo por cobrar.")
+    if not created:
+        messages.info(request, "Este pago ya estaba registrado; no se duplico.")
         return redirect("order_detail", pk=pk)
 
-    amount_display = ""
-    balance_display = ""
-    new_balance = None
-    payment = None
+    order.paid_amount = payment.order.paid_amount
+    payment_device = payment.device
+    amount_display = format(payment.amount, ".2f")
+    balance_display = format(new_balance, ".2f")
     try:
-        with transaction.atomic():
-            payment = Payment.objects.create(
-                order=order,
-                device=payment_device,
-                amount=amount,
-                method=method,
-                reference=reference,
-                author=request.user,
-            )
-
-        amount_display = format(amount, ".2f")
-        new_balance = order.balance
-        balance_display = format(new_balance, ".2f")
-
         Status = ServiceOrder.Status
         done_value = Status.DELIVERED
         try:
@@ -1263,10 +1356,9 @@ def add_payment(request, pk):
                 logger.exception("Error enviando correo de pago")
         elif not customer_email:
             messages.info(request, "Pago registrado, pero el cliente no tiene correo para notificar.")
-    except Exception as exc:
-        logger.exception("Error registrando pago")
-        messages.error(request, f"No se pudo registrar el pago: {exc}")
-        return redirect("order_detail", pk=pk)
+    except Exception:
+        logger.exception("Error procesando avisos del pago")
+        messages.warning(request, "Pago registrado, pero fallo el envio de avisos.")
 
     messages.success(request, "Pago registrado correctamente.")
 
@@ -1482,6 +1574,7 @@ def payment_receipt_pdf(request, payment_id):
     company_name = getattr(settings, "DEFAULT_FROM_EMAIL", "") or "Taller"
     public_url = request.build_absolute_uri(reverse("public_status", args=[order.token]))
     order_devices = _order_devices(order)
+    device_rows = device_balances(order, order_devices) if len(order_devices) > 1 else []
 
     context = {
         "payment": payment,
@@ -1490,13 +1583,15 @@ def payment_receipt_pdf(request, payment_id):
         "company_name": company_name,
         "public_url": public_url,
         "order_devices": order_devices,
+        "device_balances": device_rows,
         "logo_b64": _get_pdf_logo(),
     }
     html = render_to_string("payment_receipt.html", context)
 
     pdf_io = BytesIO()
     try:
-        result = pisa.CreatePDF(html, dest=pdf_io, encoding="utf-8")
+        with pdf_render_timer("payment_receipt"):
+            result = pisa.CreatePDF(html, dest=pdf_io, encoding="utf-8")
     except Exception:
         return HttpResponse(html, content_type="text/html", status=500)
     if result.err:
@@ -1596,8 +1691,9 @@ def add_part(request, pk):
     if not item:
         messages.error(request, f"SKU {sku} no existe.")
         return redirect("list_orders")
-    if item.qty < qty:
-        messages.error(request, f"Stock insuficiente ({item.qty} disponibles).")
+    available = available_qty(item, exclude_order=order)
+    if available < qty:
+        messages.error(request, f"Stock insuficiente ({available} disponibles).")
         return redirect("list_orders")
 
     InventoryMovement.objects.create(
@@ -1965,7 +2061,9 @@ def estimate_edit(request, pk):
         qtys = request.POST.getlist("qty")
         unit_prices = request.POST.getlist("unit_price")
         skus = request.POST.getlist("inventory_sku")
+        item_devices = request.POST.getlist("item_device")
         note = (request.POST.get("note") or "").strip()
+        devices_by_id = {str(device.pk): device for device in _order_devices(order)}
 
         rows_for_context = []
         parsed_rows = []
@@ -1977,6 +2075,7 @@ def estimate_edit(request, pk):
             qty_raw = (qtys[idx] if idx < len(qtys) else "").strip()
             price_raw = (unit_prices[idx] if idx < len(unit_prices) else "").strip()
             sku_raw = (skus[idx] if idx < len(skus) else "").strip()
+            device_raw = (item_devices[idx] if idx < len(item_devices) else "").strip()
 
             if not desc and not qty_raw and not price_raw and not sku_raw:
                 continue
@@ -1987,6 +2086,7 @@ def estimate_edit(request, pk):
                     "qty": qty_raw or "",
                     "unit_price": price_raw or "",
                     "inventory_sku": sku_raw,
+                    "device_id": device_raw,
                 }
             )
 
@@ -2020,6 +2120,9 @@ def estimate_edit(request, pk):
                 if not inventory_item:
                     errors.append(f"Fila {idx + 1}: SKU {sku_raw} no existe.")
                     continue
+            if device_raw and device_raw not in devices_by_id:
+                errors.append(f"Fila {idx + 1}: dispositivo invalido.")
+                continue
 
             rows_for_context[-1]["qty"] = str(qty)
             rows_for_context[-1]["unit_price"] = f"{unit_price}"
@@ -2029,6 +2132,7 @@ def estimate_edit(request, pk):
                     "qty": qty,
                     "unit_price": unit_price,
                     "inventory_item": inventory_item,
+                    "device": devices_by_id.get(device_raw),
                 }
             )
 
@@ -2065,6 +2169,7 @@ def estimate_edit(request, pk):
                     qty=row["qty"],
                     unit_price=row["unit_price"],
                     inventory_item=row["inventory_item"],
+                    device=row["device"],
                 )
                 subtotal += row["unit_price"] * row["qty"]
             subtotal = subtotal.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
@@ -2279,6 +2384,13 @@ def estimate_public(request, token):
     return render(request, "estimate_public.html", context)
 
 
+def _warn_reservation_shortages(request, shortages):
+    if shortages:
+        messages.warning(
+            request,
+            f"Sin stock suficiente para apartar: {', '.join(shortages)}. El taller confirmara la disponibilidad.",
+        )
+
 
 @require_POST
 def estimate_update_items(request, token):
@@ -2313,6 +2425,7 @@ def estimate_update_items(request, token):
                 item.save(update_fields=["status", "decided_at"])
                 notify_estimate_item_decision(item)
             estimate.recompute_status_from_items(save=True)
+        _warn_reservation_shortages(request, sync_estimate_reservations(estimate))
 
     pending_ids = list(
         estimate.items.filter(status=EstimateItem.Status.PENDING).values_list("id", flat=True)
@@ -2349,6 +2462,7 @@ def estimate_approve(request, token):
         estimate.declined_at = None
         estimate.status = Estimate.Status.CLOSED_ACCEPTED
         estimate.save(update_fields=["approved_at", "declined_at", "status"])
+        shortages = sync_estimate_reservations(estimate)
         actor_role = resolve_actor_role(None)
         target_status = ServiceOrder.Status.WAITING_PARTS
         fallback_status = ServiceOrder.Status.IN_REVIEW
@@ -2394,6 +2508,7 @@ def estimate_approve(request, token):
             "approved_at": timezone.localtime(now).isoformat(),
         },
     )
+    _warn_reservation_shortages(request, shortages)
 
     return redirect("estimate_public", token=token)
 
@@ -2418,6 +2533,7 @@ def estimate_decline(request, token):
         estimate.approved_at = None
         estimate.status = Estimate.Status.CLOSED_REJECTED
         estimate.save(update_fields=["approved_at", "declined_at", "status"])
+        sync_estimate_reservations(estimate)
         actor_role = resolve_actor_role(None)
         if order.can_transition_to(ServiceOrder.Status.IN_REVIEW):
             order.transition_to(ServiceOrder.Status.IN_REVIEW, author=None, author_role=actor_role)
@@ -2495,45 +2611,13 @@ def _attachment_max_bytes():
     return _max_file_mb() * 1024 * 1024
 
 
-ATTACHMENT_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
-ATTACHMENT_ALLOWED_EXTENSIONS = ATTACHMENT_IMAGE_EXTENSIONS | {
-    ".pdf",
-    ".doc",
-    ".docx",
-    ".xls",
-    ".xlsx",
-    ".txt",
-    ".csv",
-}
-ATTACHMENT_ALLOWED_MIME_TYPES = {
-    "application/pdf",
-    "application/msword",
-    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-    "application/vnd.ms-excel",
-    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    "text/plain",
-    "text/csv",
-}
-ATTACHMENT_IMAGE_PREFIXES = ("image/",)
-
-
 def _attachment_allowed(uploaded):
     name = (getattr(uploaded, "name", "") or "").strip()
-    ext = Path(name).suffix.lower()
-    content_type = (getattr(uploaded, "content_type", "") or "").lower()
-    guessed, _ = mimetypes.guess_type(name)
-    candidates = [content_type, (guessed or "").lower()]
-    if any(ct.startswith(ATTACHMENT_IMAGE_PREFIXES) for ct in candidates if ct):
-        return True
-    if any(ct in ATTACHMENT_ALLOWED_MIME_TYPES for ct in candidates if ct):
-        return True
-    if ext in ATTACHMENT_ALLOWED_EXTENSIONS:
-        return True
-    return False
+    return attachment_allowed(name, getattr(uploaded, "content_type", ""))
 
 
 def _attachment_is_image(name):
-    return Path(name or "").suffix.lower() in ATTACHMENT_IMAGE_EXTENSIONS
+    return attachment_is_image(name)
 
 
 def _format_bytes(total):
@@ -2555,10 +2639,11 @@ def _format_bytes(total):
 @group_required(ROLE_RECEPCION, ROLE_GERENCIA, ROLE_TECNICO)
 def order_attachments(request, pk):
     order = get_object_or_404(ServiceOrder, pk=pk)
-    existing_filenames = set(
-        Path(att.file.name).name.lower()
-        for att in Attachment.objects.filter(service_order=order)
-    )
+    if not can_view_order_attachments(request.user, order):
+        return HttpResponseForbidden("Solo puedes ver adjuntos de tus ordenes asignadas.")
+    existing_attachments = list(Attachment.objects.filter(service_order=order))
+    existing_filenames = {att.display_name.lower() for att in existing_attachments}
+    existing_blobs = {att.file.name for att in existing_attachments}
     caption_value = (request.POST.get("caption") or "").strip()
     if request.method == "POST":
         files = request.FILES.getlist("file")
@@ -2591,16 +2676,23 @@ def order_attachments(request, pk):
             return redirect("order_attachments", pk=order.pk)
         created = 0
         file_field = Attachment._meta.get_field("file")
-        storage = file_field.storage
         for uploaded, base_name in valid_files:
-            temp_instance = Attachment(service_order=order)
-            target_name = file_field.generate_filename(temp_instance, base_name)
-            if storage.exists(target_name):
-                storage.delete(target_name)
-            data = {"service_order": order, "file": uploaded}
-            if hasattr(Attachment, "caption"):
-                data["caption"] = caption_value
-            Attachment.objects.create(**data)
+            # El storage guarda por SHA-256: un contenido repetido reusa el blob.
+            blob = file_field.storage.save(file_field.generate_filename(None, base_name), uploaded)
+            if blob in existing_blobs:
+                rejected.append(f"{base_name}: el mismo archivo ya existe en la orden.")
+                continue
+            existing_blobs.add(blob)
+            attachment = Attachment.objects.create(
+                service_order=order,
+                file=blob,
+                original_name=base_name,
+                caption=caption_value,
+                **attachment_metadata(base_name, blob, uploaded.size),
+            )
+            # Con recompresion activa la miniatura se genera en el worker.
+            if not schedule_ingest(attachment) and _attachment_is_image(base_name):
+                ensure_thumbnail(attachment.file)
             created += 1
         if rejected:
             for msg_text in rejected:
@@ -2610,13 +2702,11 @@ def order_attachments(request, pk):
 
     attachments = list(Attachment.objects.filter(service_order=order).order_by("-id"))
     for att in attachments:
-        file_obj = getattr(att, "file", None)
-        raw_name = getattr(file_obj, "name", "") if file_obj else ""
-        name = Path(raw_name or "").name
-        size_value = getattr(file_obj, "size", 0) if file_obj else 0
-        att.filename = name or raw_name
-        att.size_display = _format_bytes(size_value)
-        att.is_image = _attachment_is_image(name)
+        att.filename = att.display_name
+        att.size_display = _format_bytes(att.size or 0)
+        att.url = _attachment_url(order, att)
+        if att.is_image:
+            att.thumb_url = _attachment_url(order, att, "attachment_thumbnail")
 
     max_file_mb = _max_file_mb()
     non_image_exts = sorted(ATTACHMENT_ALLOWED_EXTENSIONS - ATTACHMENT_IMAGE_EXTENSIONS)
@@ -2631,19 +2721,100 @@ def order_attachments(request, pk):
         "total_limit_hint": f"No subas mas de {max_file_mb} MB totales por envio.",
         "allowed_extensions": ", ".join(sorted(e.lstrip(".").upper() for e in ATTACHMENT_ALLOWED_EXTENSIONS)),
         "accept_attr": accept_attr,
+        "upload_start_url": reverse("attachment_upload_start", args=[order.pk]),
+        "chunked_max_mb": chunked_max_bytes() // (1024 * 1024),
     }
     return render(request, "recepcion/order_attachments.html", context)
 
 
+def _attachment_version(attachment):
+    # El hash guardado evita leer el archivo; los adjuntos viejos sin hash lo calculan.
+    if attachment.sha256:
+        return attachment.sha256[:VERSION_LENGTH]
+    return file_version(attachment.file)
+
+
+def _attachment_url(order, attachment, view_name="attachment_file"):
+    url = reverse(view_name, args=[order.pk, attachment.pk])
+    try:
+        return f"{url}?v={_attachment_version(attachment)}"
+    except OSError:
+        return url
+
+
+def _get_viewable_attachment(request, pk, att_id):
+    attachment = get_object_or_404(
+        Attachment.objects.select_related("service_order"), pk=att_id, service_order_id=pk
+    )
+    if not can_view_order_attachments(request.user, attachment.service_order):
+        return None
+    if not attachment.file:
+        raise Http404("Adjunto sin archivo.")
+    return attachment
+
+
+@login_required(login_url="/admin/login/")
+@group_required(ROLE_RECEPCION, ROLE_GERENCIA, ROLE_TECNICO)
+def order_attachments_zip(request, pk):
+    order = get_object_or_404(ServiceOrder, pk=pk)
+    if not can_view_order_attachments(request.user, order):
+        return HttpResponseForbidden("Solo puedes ver adjuntos de tus ordenes asignadas.")
+    attachments = Attachment.objects.filter(service_order=order).exclude(file="").select_related("service_order")
+    if not attachments.exists():
+        raise Http404("La orden no tiene adjuntos.")
+    response = StreamingHttpResponse(
+        iter_attachments_zip(attachments.order_by("id")), content_type="application/zip"
+    )
+    response["Content-Disposition"] = f'attachment; filename="adjuntos_{order.folio or order.pk}.zip"'
+    return response
+
+
+@login_required(login_url="/admin/login/")
+@group_required(ROLE_RECEPCION, ROLE_GERENCIA, ROLE_TECNICO)
+def attachment_file(request, pk, att_id):
+    attachment = _get_viewable_attachment(request, pk, att_id)
+    if attachment is None:
+        return HttpResponseForbidden("Solo puedes ver adjuntos de tus ordenes asignadas.")
+    try:
+        return serve_media_file(
+            request,
+            attachment.file,
+            filename=attachment.display_name,
+            as_attachment=request.GET.get("download") == "1",
+        )
+    except (FileNotFoundError, OSError):
+        raise Http404("Archivo no encontrado.")
+
+
+@login_required(login_url="/admin/login/")
+@group_required(ROLE_RECEPCION, ROLE_GERENCIA, ROLE_TECNICO)
+def attachment_thumbnail(request, pk, att_id):
+    attachment = _get_viewable_attachment(request, pk, att_id)
+    if attachment is None:
+        return HttpResponseForbidden("Solo puedes ver adjuntos de tus ordenes asignadas.")
+    if not _attachment_is_image(attachment.file.name):
+        raise Http404("El adjunto no es una imagen.")
+    try:
+        thumbnail = ensure_thumbnail(attachment.file)
+        if thumbnail is None:
+            raise Http404("No hay miniatura para este adjunto.")
+        return serve_media_file(
+            request,
+            thumbnail,
+            filename=Path(thumbnail.name).name,
+            version=_attachment_version(attachment),
+        )
+    except (FileNotFoundError, OSError):
+        raise Http404("Archivo no encontrado.")
+
+
 @login_required(login_url="/admin/login/")
 @require_manager
 @require_POST
 def delete_attachment(request, pk, att_id):
     order = get_object_or_404(ServiceOrder, pk=pk)
     attachment = get_object_or_404(Attachment, pk=att_id, service_order=order)
-    stored_file = attachment.file
-    if stored_file:
-        stored_file.delete(save=False)
+    # El blob se suelta al confirmar (core.models._release_attachment_blob).
     attachment.delete()
     messages.success(request, "Adjunto eliminado.")
     return redirect("order_attachments", pk=order.pk)
@@ -1,15 +1,19 @@
 from datetime import datetime, timedelta, time
 import csv
+import os
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import StreamingHttpResponse
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.shortcuts import render
 from django.urls import reverse
 from django.utils import timezone
 
-from .models import Payment, ServiceOrder
-from .permissions import require_manager
+from .attachment_zip import iter_attachments_zip
+from . import perf, profiling
+from .models import Attachment, Payment, ServiceOrder
+from .permissions import ROLE_GERENCIA, ROLE_RECEPCION, group_required, require_manager, require_superuser
+from .reports import cash_close, monthly_revenue
 from .utils import build_device_label, build_single_device_label, format_csv_datetime
 
 
@@ -49,6 +53,7 @@ def _render_form(request, *, errors=None, initial=None, status=200):
         "end": end,
         "orders_url": reverse("panel_export_orders"),
         "payments_url": reverse("panel_export_payments"),
+        "attachments_url": reverse("panel_export_attachments"),
     }
     return render(request, "panel/exports.html", context, status=status)
 
@@ -97,8 +102,8 @@ def export_orders_csv(request):
 
     start_dt, end_dt = _build_range(start, end)
     orders = (
-        ServiceOrder.objects.select_related("customer", "assigned_to")
-        .prefetch_related("devices")
+        ServiceOrder.objects.select_related("customer", "device", "assigned_to", "estimate")
+        .prefetch_related("devices", "estimate__items")
         .filter(checkin_at__gte=start_dt, checkin_at__lt=end_dt)
         .order_by("checkin_at")
     )
@@ -192,3 +197,104 @@ def export_payments_csv(request):
 
     filename = f"pagos_{start.isoformat()}_{end.isoformat()}.csv"
     return _stream_csv(iter_rows(), filename=filename)
+
+
+@login_required(login_url="/admin/login/")
+@require_manager
+def export_attachments_zip(request):
+    start = _parse_date(request.GET.get("start"))
+    end = _parse_date(request.GET.get("end"))
+    if not start or not end:
+        errors = ["Debes indicar fecha inicial y final en formato YYYY-MM-DD."]
+        return _render_form(request, errors=errors, status=400)
+    if start > end:
+        errors = ["La fecha inicial no puede ser posterior a la final."]
+        return _render_form(request, errors=errors, status=400)
+
+    start_dt, end_dt = _build_range(start, end)
+    attachments = (
+        Attachment.objects.select_related("service_order")
+        .filter(service_order__checkin_at__gte=start_dt, service_order__checkin_at__lt=end_dt)
+        .exclude(file="")
+        .order_by("service_order__checkin_at", "service_order_id", "id")
+    )
+    response = StreamingHttpResponse(
+        iter_attachments_zip(attachments.iterator(chunk_size=200), folder_per_order=True),
+        content_type="application/zip",
+    )
+    response["Content-Disposition"] = f'attachment; filename="adjuntos_{start.isoformat()}_{end.isoformat()}.zip"'
+    return response
+
+
+@login_required(login_url="/admin/login/")
+@group_required(ROLE_RECEPCION, ROLE_GERENCIA)
+def cash_close_report(request):
+    today = timezone.localdate()
+    raw_day = request.GET.get("day")
+    day = _parse_date(raw_day) or today
+    errors = []
+    if raw_day and _parse_date(raw_day) is None:
+        errors.append("Fecha invalida; se muestra el dia de hoy.")
+    if day > today:
+        errors.append("No puedes consultar un corte futuro; se muestra el dia de hoy.")
+        day = today
+    context = {
+        "report": cash_close(day),
+        "day": day.isoformat(),
+        "errors": errors,
+    }
+    return render(request, "panel/cash_close.html", context)
+
+
+@login_required(login_url="/admin/login/")
+@require_manager
+def revenue_report(request):
+    current_year = timezone.localdate().year
+    try:
+        year = int(request.GET.get("year") or current_year)
+    except (TypeError, ValueError):
+        year = current_year
+    year = min(max(year, 2000), current_year)
+    context = {
+        "report": monthly_revenue(year),
+        "year": year,
+        "years": range(current_year, current_year - 6, -1),
+    }
+    return render(request, "panel/revenue.html", context)
+
+
+@login_required(login_url="/admin/login/")
+@require_manager
+def perf_report(request):
+    if request.method == "POST" and request.POST.get("reset"):
+        perf.store.reset()
+    context = {
+        "rows": perf.store.summary(),
+        "started_at": perf.store.started_at,
+        "window": perf.store.window,
+        "pid": os.getpid(),
+        "can_profile": request.user.is_superuser,
+    }
+    return render(request, "panel/perf.html", context)
+
+
+@login_required(login_url="/admin/login/")
+@require_superuser
+def profiles_list(request):
+    context = {
+        "profiles": profiling.list_profiles(),
+        "query_flag": profiling.QUERY_FLAG,
+        "header_flag": profiling.HEADER_FLAG,
+    }
+    return render(request, "panel/profiles.html", context)
+
+
+@login_required(login_url="/admin/login/")
+@require_superuser
+def profile_download(request, name):
+    if not name.endswith(profiling.PROFILE_SUFFIXES) or "/" in name or name.startswith("."):
+        raise Http404("Perfil no encontrado.")
+    path = profiling.profiles_dir() / name
+    if not path.is_file():
+        raise Http404("Perfil no encontrado.")
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=name, content_type="text/plain")
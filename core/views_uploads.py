@@ -0,0 +1,133 @@
+import json
+
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods, require_POST
+
+from .image_ingest import schedule_ingest
+from .models import ServiceOrder, UploadSession
+from .permissions import ROLE_GERENCIA, ROLE_RECEPCION, ROLE_TECNICO, can_view_order_attachments, group_required
+from .thumbnails import ensure_thumbnail
+from .uploads import (
+    UploadError,
+    UploadOffsetError,
+    abort_upload,
+    append_chunk,
+    attachment_is_image,
+    chunk_max_bytes,
+    finish_upload,
+    start_upload,
+)
+
+
+def _payload(request):
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError:
+            return {}
+    return request.POST
+
+
+def _session_state(session):
+    return {
+        "id": str(session.pk),
+        "filename": session.filename,
+        "size": session.size,
+        "offset": session.received,
+        "status": session.status,
+        "chunk_size": chunk_max_bytes(),
+        "url": reverse("attachment_upload_chunk", args=[session.order_id, session.pk]),
+        "finish_url": reverse("attachment_upload_finish", args=[session.order_id, session.pk]),
+    }
+
+
+def _check_order_access(user, order):
+    if not can_view_order_attachments(user, order):
+        raise PermissionDenied("Solo puedes ver adjuntos de tus ordenes asignadas.")
+
+
+def _get_session(request, pk, upload_id):
+    session = UploadSession.objects.select_related("order").filter(pk=upload_id, order_id=pk).first()
+    if session is None:
+        raise Http404("Subida no encontrada.")
+    _check_order_access(request.user, session.order)
+    return session
+
+
+@login_required(login_url="/admin/login/")
+@group_required(ROLE_RECEPCION, ROLE_GERENCIA, ROLE_TECNICO)
+@require_POST
+def attachment_upload_start(request, pk):
+    order = get_object_or_404(ServiceOrder, pk=pk)
+    _check_order_access(request.user, order)
+    data = _payload(request)
+    try:
+        session = start_upload(
+            order,
+            filename=data.get("filename"),
+            size=data.get("size"),
+            sha256=data.get("sha256", ""),
+            caption=data.get("caption", ""),
+            user=request.user,
+        )
+    except UploadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse(_session_state(session), status=201)
+
+
+@login_required(login_url="/admin/login/")
+@group_required(ROLE_RECEPCION, ROLE_GERENCIA, ROLE_TECNICO)
+@require_http_methods(["GET", "PUT", "DELETE"])
+def attachment_upload_chunk(request, pk, upload_id):
+    session = _get_session(request, pk, upload_id)
+    if request.method == "GET":
+        return JsonResponse(_session_state(session))
+    if request.method == "DELETE":
+        session = abort_upload(session.pk)
+        return JsonResponse(_session_state(session))
+
+    try:
+        offset = int(request.headers.get("Upload-Offset", request.GET.get("offset", "")))
+        length = int(request.headers.get("Content-Length") or 0)
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "Upload-Offset y Content-Length son requeridos."}, status=400)
+    try:
+        # Se lee del stream por bloques; no se usa request.body.
+        received = append_chunk(
+            session.pk,
+            offset=offset,
+            stream=request,
+            length=length,
+            checksum=request.headers.get("Upload-Checksum", ""),
+        )
+    except UploadOffsetError as exc:
+        return JsonResponse({"error": str(exc), "offset": exc.expected}, status=409)
+    except UploadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse({"offset": received, "size": session.size})
+
+
+@login_required(login_url="/admin/login/")
+@group_required(ROLE_RECEPCION, ROLE_GERENCIA, ROLE_TECNICO)
+@require_POST
+def attachment_upload_finish(request, pk, upload_id):
+    session = _get_session(request, pk, upload_id)
+    data = _payload(request)
+    try:
+        attachment, created = finish_upload(session.pk, sha256=data.get("sha256", ""))
+    except UploadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    if created and not schedule_ingest(attachment) and attachment_is_image(attachment.original_name):
+        ensure_thumbnail(attachment.file)
+    return JsonResponse(
+        {
+            "attachment_id": attachment.pk,
+            "created": created,
+            "url": reverse("attachment_file", args=[pk, attachment.pk]),
+        },
+        status=201 if created else 200,
+    )
@@ -0,0 +1,7 @@
+"""Hooks de Gunicorn para el modo multiproceso de prometheus_client."""
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,27 @@
+#!/usr/bin/env bash
+# Watchdog para cron (cada 5 min). Distingue "caido" de "lento":
+# - /healthz no responde en HEALTHZ_TIMEOUT s -> se reinicia Gunicorn.
+# - /readyz responde pero tarda o marca degraded/fail -> solo se registra.
+set -u
+
+BASE_URL=${BASE_URL:-http://127.0.0.1}
+HEALTHZ_TIMEOUT=${HEALTHZ_TIMEOUT:-10}
+SLOW_MS=${SLOW_MS:-500}
+SERVICE=${SERVICE:-gunicorn.integrasys}
+TAG=integrasys-healthz
+
+if ! curl -fsS -m "$HEALTHZ_TIMEOUT" -o /dev/null "$BASE_URL/healthz"; then
+  logger -t "$TAG" "healthz sin respuesta en ${HEALTHZ_TIMEOUT}s; reiniciando $SERVICE"
+  systemctl restart "$SERVICE"
+  exit 1
+fi
+
+body=$(curl -sS -m 30 -w '\n%{http_code} %{time_total}' "$BASE_URL/readyz") || {
+  logger -t "$TAG" "readyz sin respuesta"
+  exit 0
+}
+read -r code seconds <<<"$(tail -n1 <<<"$body")"
+ms=$(awk -v s="$seconds" 'BEGIN { printf "%d", s * 1000 }')
+if [ "$code" != "200" ] || ! grep -q '"status": "ok"' <<<"$body" || [ "$ms" -gt "$SLOW_MS" ]; then
+  logger -t "$TAG" "readyz ${code} en ${ms}ms: $(head -n1 <<<"$body")"
+fi